@@ -0,0 +1,124 @@
+"""
+Load test: /api/chat throughput in sync mode vs async mode (JARVIS_ASYNC_MODE).
+
+The DB and LLM are stubbed with fixed delays so the numbers only reflect
+how many requests each mode can keep in flight. Sync endpoints are capped
+by Starlette's threadpool (~40 threads); async endpoints are not.
+
+Usage:
+    python benchmarks/async_load_bench.py [concurrency] [requests]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import subprocess
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+DB_DELAY = float(os.getenv("BENCH_DB_DELAY", "0.005"))
+LLM_DELAY = float(os.getenv("BENCH_LLM_DELAY", "0.5"))
+
+
+def install_stubs(main):
+    """Swaps the DB and LLM layers for fixed-latency fakes."""
+    from services.memory_service import MemoryService
+
+    context = {
+        "member": {"name": "Bench", "role": "Dev", "team_name": "Bench Team"},
+        "team": {"team_name": "Bench Team", "problem_statement": "Benchmarks"},
+        "chat_history": [], "active_goals": [], "instructions": [],
+        "latest_summary": "No previous summary.", "insights": []
+    }
+
+    def get_user_context(token):
+        time.sleep(DB_DELAY)
+        return context
+
+    async def aget_user_context(token):
+        await asyncio.sleep(DB_DELAY)
+        return context
+
+    def append_chat_history(token, user_msg, ai_msg, ai_service=None):
+        time.sleep(DB_DELAY)
+        return []
+
+    async def aappend_chat_history(token, user_msg, ai_msg, ai_service=None):
+        await asyncio.sleep(DB_DELAY)
+        return []
+
+    def generate_response(user_message, ctx):
+        time.sleep(LLM_DELAY)
+        return "stub reply"
+
+    async def agenerate_response(user_message, ctx):
+        await asyncio.sleep(LLM_DELAY)
+        return "stub reply"
+
+    MemoryService.get_user_context = staticmethod(get_user_context)
+    MemoryService.aget_user_context = staticmethod(aget_user_context)
+    MemoryService.append_chat_history = staticmethod(append_chat_history)
+    MemoryService.aappend_chat_history = staticmethod(aappend_chat_history)
+    main.ai_service.generate_response = generate_response
+    main.ai_service.agenerate_response = agenerate_response
+    # Insight loop is background work; keep it out of the measurement
+    main.process_user_insight = lambda *args: None
+
+
+async def drive(app, concurrency: int, total: int) -> dict:
+    import httpx
+
+    sem = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def one(i):
+            async with sem:
+                start = time.perf_counter()
+                r = await client.post("/api/chat", json={"token": f"t{i}", "message": "hi"})
+                r.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 1)
+    }
+
+
+def run_mode(concurrency: int, total: int):
+    """Runs inside a subprocess so JARVIS_ASYNC_MODE is read at import time."""
+    import main
+    install_stubs(main)
+    print(json.dumps(asyncio.run(drive(main.app, concurrency, total))))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        run_mode(int(sys.argv[2]), int(sys.argv[3]))
+        sys.exit(0)
+
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    total = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+    for mode in ("0", "1"):
+        env = dict(os.environ, JARVIS_ASYNC_MODE=mode, GROQ_API_KEY=os.getenv("GROQ_API_KEY", "bench"),
+                   MONGO_URI=os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", str(concurrency), str(total)],
+            env=env, capture_output=True, text=True, cwd=os.path.join(os.path.dirname(__file__), '..')
+        )
+        if out.returncode != 0:
+            print(out.stderr)
+            sys.exit(out.returncode)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{'async' if mode == '1' else 'sync ':<5}  {result}")
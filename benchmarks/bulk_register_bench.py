@@ -0,0 +1,64 @@
+"""
+Benchmark: registering 1,000 six-person teams.
+
+before: save_memory per team/member (13 round trips per team)
+after:  save_teams_bulk (one insert_many per collection)
+
+Usage:
+    MONGO_URI=mongodb://localhost:27017 python benchmarks/bulk_register_bench.py [teams]
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import mongo_client
+from memory_store import save_memory, save_teams_bulk
+
+BENCH_DB = "jarvis_bench"
+MEMBERS_PER_TEAM = 6
+
+
+def registrations(count: int, prefix: str) -> list:
+    return [{
+        "team_name": f"{prefix} Team {i}",
+        "problem_statement": "Benchmarks",
+        "duration_hours": 24,
+        "members": [
+            {"name": f"Member {i}-{j}", "email": f"m{i}-{j}@example.com", "role": "Dev", "skills": ["python"]}
+            for j in range(MEMBERS_PER_TEAM)
+        ]
+    } for i in range(count)]
+
+
+def legacy_register(reg: dict):
+    """The original /api/register flow."""
+    save_memory(reg["team_name"], "TEAM", reg)
+    for member in reg["members"]:
+        save_memory(reg["team_name"], "MEMBER", member)
+
+
+if __name__ == "__main__":
+    teams = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+
+    # Every module (memory_store, team_status, member_directory...) writes to the benchmark database
+    mongo_client.DB_NAME = BENCH_DB
+    client = mongo_client.get_client()
+    client.drop_database(BENCH_DB)
+
+    start = time.perf_counter()
+    for reg in registrations(teams, "Legacy"):
+        legacy_register(reg)
+    legacy_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = save_teams_bulk(registrations(teams, "Bulk"))
+    bulk_s = time.perf_counter() - start
+
+    assert sum(len(r["members"]) for r in results) == teams * MEMBERS_PER_TEAM
+    print(f"teams={teams} members/team={MEMBERS_PER_TEAM}")
+    print(f"before (save_memory loop) {legacy_s:8.2f}s  {teams / legacy_s:8.1f} teams/s")
+    print(f"after  (save_teams_bulk)  {bulk_s:8.2f}s  {teams / bulk_s:8.1f} teams/s")
+    client.drop_database(BENCH_DB)
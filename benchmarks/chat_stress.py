@@ -0,0 +1,107 @@
+"""
+Stress test: many concurrent appends to one member chat, with compaction
+running on the worker threads.
+
+Checks that no message is lost or summarized twice:
+    appended == 10 * compacted windows + messages left in member_chat
+    rolling mode: every window folded into the rollup exactly once
+    window mode: every window_seq has exactly one summary doc
+Set JARVIS_SUMMARY_MODE=window to stress the per-window mode.
+
+Usage:
+    MONGO_URI=mongodb://localhost:27017 python benchmarks/chat_stress.py [threads] [turns_per_thread]
+"""
+import os
+import sys
+import time
+import threading
+from collections import Counter
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import services.memory_service as memory_service
+from services.memory_service import MemoryService, COMPACTION_WINDOW
+from services.compaction_worker import compaction_worker
+from services.indexes import ensure_indexes
+from pymongo import MongoClient
+
+STRESS_DB = "jarvis_stress"
+TOKEN = "stress-token"
+
+
+class FakeIntelligence:
+    """Counts summaries and sleeps like a slow LLM call, to widen race windows."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.summaries = 0
+
+    def summarize_chat(self, messages: list, team_name: str = None) -> str:
+        time.sleep(0.05)
+        with self._lock:
+            self.summaries += 1
+        return f"{messages[0]['message']} .. {messages[-1]['message']}"
+
+    def fold_summary(self, previous_summary: str, new_material: list, team_name: str = None) -> str:
+        time.sleep(0.05)
+        with self._lock:
+            self.summaries += 1
+        return f"{new_material[0]} .. {new_material[-1]}"
+
+
+if __name__ == "__main__":
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    per_thread = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    uri = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+    client = MongoClient(uri, serverSelectionTimeoutMS=5000)
+    client.drop_database(STRESS_DB)
+    database = client[STRESS_DB]
+
+    # Point the memory service at the stress database
+    memory_service.db = database
+    ensure_indexes(database)
+    database.members.insert_one({"token": TOKEN, "name": "Stress"})
+    database.member_chat.insert_one({"token": TOKEN, "messages": [], "message_count": 0, "compaction_seq": 0})
+
+    ai = FakeIntelligence()
+
+    def writer(n: int):
+        for i in range(per_thread):
+            MemoryService.append_chat_history(TOKEN, f"t{n}-q{i}", f"t{n}-a{i}", ai_service=ai)
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=writer, args=(n,)) for n in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    append_s = time.perf_counter() - start
+
+    # Final pass: catch anything that crossed the threshold while a job was running
+    compaction_worker.join()
+    MemoryService.compact_chat(TOKEN, ai)
+
+    appended = 2 * threads * per_thread  # user + jarvis per turn
+    chat = database.member_chat.find_one({"token": TOKEN})
+    remaining = len(chat["messages"])
+    windows = chat["compaction_seq"]
+    print(f"mode={memory_service.SUMMARY_MODE} threads={threads} turns/thread={per_thread} "
+          f"appended={appended} in {append_s:.2f}s")
+    print(f"windows={windows} remaining={remaining} message_count={chat['message_count']} "
+          f"summarize_calls={ai.summaries}")
+
+    assert appended == COMPACTION_WINDOW * windows + remaining, "messages lost or duplicated"
+    assert chat["message_count"] == remaining, "message_count out of sync"
+
+    if memory_service.SUMMARY_MODE == "rolling":
+        rollup = database.member_summary_rollup.find_one({"token": TOKEN})
+        assert windows == 0 or rollup["window_seq"] == windows - 1, "window not folded into the rollup"
+        # One fold per window (plus one per day boundary crossed during the run)
+        assert ai.summaries in (windows, windows + 1), "window folded more than once"
+    else:
+        summaries = list(database.member_chat_summery.find({"token": TOKEN}))
+        seqs = Counter(s["window_seq"] for s in summaries)
+        assert all(c == 1 for c in seqs.values()), "window summarized more than once"
+        assert sorted(seqs) == list(range(windows)), "gap in compacted windows"
+        assert ai.summaries == len(summaries), "duplicate summarize_chat calls"
+    print("OK")
+    client.drop_database(STRESS_DB)
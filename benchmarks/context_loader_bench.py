@@ -0,0 +1,105 @@
+"""
+Benchmark: get_user_context before (six sequential queries) vs after (one aggregation).
+
+Usage:
+    MONGO_URI=mongodb://localhost:27017 python benchmarks/context_loader_bench.py
+
+Needs a real mongod (database jarvis_bench, dropped before and after): the
+loader's $lookup sub-pipelines are not supported by in-memory stand-ins.
+"""
+import os
+import sys
+import time
+import secrets
+from datetime import datetime, timezone
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from services.context_loader import load_user_context
+
+ITERATIONS = int(os.getenv("BENCH_ITERATIONS", "500"))
+BENCH_DB = "jarvis_bench"
+
+
+def get_client():
+    uri = os.getenv("MONGO_URI")
+    if not uri:
+        sys.exit("MONGO_URI is required (e.g. mongodb://localhost:27017)")
+    from pymongo import MongoClient
+    client = MongoClient(uri, serverSelectionTimeoutMS=5000)
+    print(f"Using mongod at {uri}")
+    client.drop_database(BENCH_DB)
+    return client
+
+
+def seed(db, members: int = 50) -> list:
+    now = datetime.now(timezone.utc)
+    db.teams.insert_one({"team_name": "Bench Team", "problem_statement": "Benchmarks", "created_at": now})
+    tokens = []
+    for i in range(members):
+        token = secrets.token_urlsafe(16)
+        tokens.append(token)
+        db.members.insert_one({"token": token, "team_name": "Bench Team", "name": f"Member {i}", "role": "Dev"})
+        db.member_chat.insert_one({
+            "token": token,
+            "messages": [{"role": "user", "message": f"msg {j}", "timestamp": now} for j in range(18)]
+        })
+        db.Active_goals.insert_one({"token": token, "goal_text": "Ship it", "status": "active"})
+        db.member_chat_summery.insert_one({"token": token, "summary_text": "Earlier work.", "timestamp": now})
+    db.instruction_team.insert_one({"target_member_token": "all", "instruction_text": "Commit often", "active": True})
+    for field, coll in [("token", "members"), ("token", "member_chat"), ("token", "Active_goals"),
+                        ("target_member_token", "instruction_team"), ("token", "member_chat_summery"),
+                        ("team_name", "teams")]:
+        db[coll].create_index(field)
+    return tokens
+
+
+def legacy_get_user_context(db, token: str):
+    """The original sequential implementation, kept here for comparison."""
+    member = db.members.find_one({"token": token})
+    if not member: return None
+    team = db.teams.find_one({"team_name": member["team_name"]})
+    if not team: team = {"team_name": "Unknown", "problem_statement": "Unknown"}
+    chat_doc = db.member_chat.find_one({"token": token})
+    recent_chat = chat_doc.get("messages", [])[-10:] if chat_doc else []
+    active_goals = [g["goal_text"] for g in db.Active_goals.find({"token": token, "status": "active"})]
+    instructions = [i["instruction_text"] for i in db.instruction_team.find({
+        "$or": [{"target_member_token": token}, {"target_member_token": "all"}],
+        "active": True
+    })]
+    summary_doc = db.member_chat_summery.find_one({"token": token}, sort=[("timestamp", -1)])
+    latest_summary = summary_doc["summary_text"] if summary_doc else "No previous summary."
+    return {
+        "member": member, "team": team, "chat_history": recent_chat,
+        "active_goals": active_goals, "instructions": instructions,
+        "latest_summary": latest_summary, "insights": []
+    }
+
+
+def percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def run(label: str, fn, db, tokens: list):
+    samples = []
+    for i in range(ITERATIONS):
+        start = time.perf_counter()
+        fn(db, tokens[i % len(tokens)])
+        samples.append((time.perf_counter() - start) * 1000)
+    print(f"{label:<22} p50={percentile(samples, 50):7.3f}ms  p99={percentile(samples, 99):7.3f}ms")
+
+
+if __name__ == "__main__":
+    client = get_client()
+    db = client[BENCH_DB]
+    tokens = seed(db)
+
+    # Sanity check: same values for everything the legacy implementation returned
+    old, new = legacy_get_user_context(db, tokens[0]), load_user_context(db, tokens[0])
+    assert old == {k: new[k] for k in old}, "context loader output differs from legacy implementation"
+
+    run("before (6 queries)", legacy_get_user_context, db, tokens)
+    run("after (1 aggregation)", load_user_context, db, tokens)
+    client.drop_database(BENCH_DB)
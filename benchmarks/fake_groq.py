@@ -0,0 +1,124 @@
+"""
+Fake Groq server for benchmarks (OpenAI-compatible chat completions).
+
+Serves POST /openai/v1/chat/completions with a configurable latency and a
+per-minute request limit: requests over the limit get 429 with Retry-After,
+like the real API. Supports stream=True (SSE chunks). Point the app at it
+with GROQ_BASE_URL=http://127.0.0.1:<port>.
+
+Usage:
+    python benchmarks/fake_groq.py [--port 8900] [--rpm 30] [--latency 0.3]
+"""
+import sys
+import json
+import time
+import threading
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class FakeGroq:
+    def __init__(self, rpm: int = 30, latency: float = 0.3, token_delay: float = 0.02):
+        self.rpm = rpm
+        self.latency = latency
+        self.token_delay = token_delay
+        self._recent = deque()  # arrival times within the last minute
+        self._lock = threading.Lock()
+        self.served = 0
+        self.rejected = 0
+
+    def admit(self):
+        """Returns None if the request is within the limit, else seconds until it would be."""
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and now - self._recent[0] >= 60:
+                self._recent.popleft()
+            if self.rpm and len(self._recent) >= self.rpm:
+                self.rejected += 1
+                return 60 - (now - self._recent[0])
+            self._recent.append(now)
+            self.served += 1
+            return None
+
+    def reply_text(self, body: dict) -> str:
+        if body.get("response_format", {}).get("type") == "json_object":
+            return json.dumps({"insights": {}, "needs_members": True, "needs_active_goals": True,
+                               "needs_team_details": True, "needs_chat_logs": False,
+                               "needs_summaries": False, "target_member_name": None})
+        return "Keep going, you are on track. Ship the smallest working slice first."
+
+    def handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _json(self, status: int, payload: dict, headers: dict = None):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not self.path.endswith("/chat/completions"):
+                    return self._json(404, {"error": {"message": "not found"}})
+
+                wait = fake.admit()
+                if wait is not None:
+                    return self._json(429, {"error": {"message": "Rate limit reached", "type": "tokens"}},
+                                      {"retry-after": f"{wait:.2f}"})
+
+                time.sleep(fake.latency)
+                text = fake.reply_text(body)
+                base = {"id": "chatcmpl-fake", "created": int(time.time()), "model": body.get("model", "")}
+
+                if not body.get("stream"):
+                    return self._json(200, dict(base, object="chat.completion", choices=[{
+                        "index": 0, "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": text}
+                    }], usage={"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}))
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for word in text.split(" "):
+                    chunk = dict(base, object="chat.completion.chunk", choices=[{
+                        "index": 0, "finish_reason": None, "delta": {"content": word + " "}
+                    }])
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                    time.sleep(fake.token_delay)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.close_connection = True
+
+        return Handler
+
+    def serve(self, port: int = 0) -> ThreadingHTTPServer:
+        """Starts the server on a daemon thread and returns it (server_address has the port)."""
+        server = ThreadingHTTPServer(("127.0.0.1", port), self.handler())
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="fake-groq", daemon=True).start()
+        return server
+
+
+def arg(name: str, default: str) -> str:
+    return sys.argv[sys.argv.index(name) + 1] if name in sys.argv else default
+
+
+if __name__ == "__main__":
+    fake = FakeGroq(rpm=int(arg("--rpm", "30")), latency=float(arg("--latency", "0.3")))
+    server = fake.serve(int(arg("--port", "8900")))
+    print(f"fake Groq on http://127.0.0.1:{server.server_address[1]} (rpm={fake.rpm}, latency={fake.latency}s)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,102 @@
+"""
+Benchmark: interactive replies vs background LLM work on one rate-limited key.
+
+Runs chat replies (interactive) and insight extraction (background) against
+the fake Groq server (benchmarks/fake_groq.py), which returns 429 above its
+per-minute limit. Reports how many user-facing replies failed, their
+latency, and what the scheduler shed.
+
+    --no-scheduler   disables the token buckets (JARVIS_LLM_RPM=0), i.e. the old behavior
+
+Usage:
+    python benchmarks/llm_scheduler_bench.py [--seconds 30] [--rpm 30] [--users 4] [--background 8] [--no-scheduler]
+"""
+import os
+import sys
+import time
+import threading
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from fake_groq import FakeGroq, arg
+
+SECONDS = float(arg("--seconds", "30"))
+RPM = int(arg("--rpm", "30"))
+USERS = int(arg("--users", "4"))
+BACKGROUND = int(arg("--background", "8"))
+FALLBACK = "I'm having trouble connecting"
+
+fake = FakeGroq(rpm=RPM, latency=0.2)
+server = fake.serve()
+
+# Configure the app before importing it
+os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+os.environ.setdefault("GROQ_API_KEY", "fake-key")
+os.environ["JARVIS_RESPONSE_CACHE_SIZE"] = "0"
+if "--no-scheduler" in sys.argv:
+    os.environ["JARVIS_LLM_RPM"] = "0"
+    os.environ["JARVIS_LLM_TEAM_RPM"] = "0"
+else:
+    # Stay just under the provider limit
+    os.environ.setdefault("JARVIS_LLM_RPM", str(int(RPM * 0.9)))
+
+from services.intelligence_service import IntelligenceService
+from services.llm_scheduler import llm_scheduler
+from services.metrics import metrics
+
+CONTEXT = {
+    "member": {"name": "Ada", "role": "Backend"},
+    "team": {"team_name": "Bench Team", "problem_statement": "Benchmarks", "hackathon": {"duration_hours": 24}},
+    "chat_history": [], "active_goals": [], "instructions": [], "insights": [], "latest_summary": None
+}
+
+
+def run():
+    ai = IntelligenceService()
+    lock = threading.Lock()
+    results = {"ok": 0, "failed": 0, "latencies": [], "insights": 0, "insights_dropped": 0}
+    deadline = time.monotonic() + SECONDS
+
+    def user(n: int):
+        i = 0
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            reply = ai.generate_response(f"how do I fix bug {n}-{i}", CONTEXT)
+            elapsed = time.perf_counter() - started
+            with lock:
+                results["failed" if reply.startswith(FALLBACK) else "ok"] += 1
+                results["latencies"].append(elapsed)
+            i += 1
+            time.sleep(2.0)  # think time
+
+    def background(n: int):
+        while time.monotonic() < deadline:
+            insight = ai.analyze_behavior(f"working on task {n}", "nice", CONTEXT)
+            with lock:
+                results["insights" if insight else "insights_dropped"] += 1
+            time.sleep(0.1)
+
+    threads = [threading.Thread(target=user, args=(n,)) for n in range(USERS)]
+    threads += [threading.Thread(target=background, args=(n,)) for n in range(BACKGROUND)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+if __name__ == "__main__":
+    results = run()
+    latencies = sorted(results["latencies"]) or [0.0]
+    total = results["ok"] + results["failed"]
+    mode = "without scheduler" if "--no-scheduler" in sys.argv else "with scheduler"
+    print(f"=== {mode}: {SECONDS:.0f}s, provider limit {RPM} rpm, {USERS} users, {BACKGROUND} background workers ===")
+    print(f"interactive replies  ok={results['ok']} failed={results['failed']} "
+          f"({results['failed'] / total:.1%} failed)" if total else "interactive replies  none")
+    print(f"interactive latency  p50={latencies[len(latencies) // 2]:.2f}s "
+          f"p99={latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]:.2f}s")
+    print(f"background insights  ok={results['insights']} dropped={results['insights_dropped']}")
+    print(f"provider             served={fake.served} rejected_429={fake.rejected}")
+    print(f"scheduler            {llm_scheduler.stats()}")
+    print(f"wait histograms      { {k: v for k, v in metrics.snapshot().items() if k.startswith('llm_wait')} }")
+    server.shutdown()
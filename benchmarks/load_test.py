@@ -0,0 +1,321 @@
+"""
+Offline load test: the FastAPI app against a fake Groq server and a local
+Mongo, driven through realistic scenarios.
+
+Backends:
+- LLM: benchmarks/fake_groq.py in-process (latency, streaming, 429 over --llm-rpm)
+- DB:  a local mongod (MONGO_URI, default mongodb://localhost:27017, database
+       jarvis_loadtest, dropped before and after). An in-memory stand-in is
+       not enough: the context loader's $lookup sub-pipelines, pipeline
+       updates and registration sessions need a real server.
+
+Scenarios (in order, each on the same data):
+- register: --teams teams through /api/register, --concurrency at a time
+- chat:     every member sends --turns messages to /api/chat with think
+            time; every 10 turns a member crosses the compaction threshold
+- welcome:  every member opens /api/chat/stream with is_welcome at once
+- manager:  MemorySelector.get_relevant_context for each team (no HTTP route;
+            called in-process)
+
+Per scenario: throughput, p50/p95/p99, error count, DB commands and LLM calls
+per request. Results are compared to benchmarks/baseline.json; a scenario
+whose p95 or DB ops/request grew, or whose throughput dropped, by more than
+--tolerance fails the run (exit 1). The baseline depends on the machine, so
+it is not committed: record one with --save-baseline on the machine that
+runs the comparison. Without a baseline for the same configuration the run
+exits 2 instead of passing silently.
+
+Usage:
+    python benchmarks/load_test.py [--teams 20] [--members 5] [--turns 12] [--concurrency 16]
+        [--llm-latency 0.3] [--llm-rpm 0] [--tolerance 0.25] [--save-baseline]
+"""
+import os
+import sys
+import json
+import time
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.dirname(__file__))
+
+from fake_groq import FakeGroq, arg
+
+TEAMS = int(arg("--teams", "20"))
+MEMBERS = int(arg("--members", "5"))
+TURNS = int(arg("--turns", "12"))
+CONCURRENCY = int(arg("--concurrency", "16"))
+LLM_LATENCY = float(arg("--llm-latency", "0.3"))
+LLM_RPM = int(arg("--llm-rpm", "0"))  # 0: no provider limit
+TOLERANCE = float(arg("--tolerance", "0.25"))
+THINK_SECONDS = 0.2
+LOADTEST_DB = "jarvis_loadtest"
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+class CommandCounter:
+    """pymongo CommandListener counting every command sent to the server."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def listener(self):
+        from pymongo import monitoring
+
+        counter = self
+
+        class Listener(monitoring.CommandListener):
+            def started(self, event):
+                with counter._lock:
+                    counter.count += 1
+            def succeeded(self, event): pass
+            def failed(self, event): pass
+
+        return Listener()
+
+
+def configure_backends():
+    """Fake Groq + database, wired in before the app is imported."""
+    fake = FakeGroq(rpm=LLM_RPM, latency=LLM_LATENCY)
+    server = fake.serve()
+    os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ["GROQ_API_KEY"] = "load-test"
+    os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+    # Measure the real pipeline, not cache hits on repeated bench messages
+    os.environ.setdefault("JARVIS_RESPONSE_CACHE_SIZE", "0")
+    if not LLM_RPM:
+        os.environ.setdefault("JARVIS_LLM_RPM", "0")
+        os.environ.setdefault("JARVIS_LLM_TEAM_RPM", "0")
+
+    import mongo_client
+    from pymongo import monitoring
+    mongo_client.DB_NAME = LOADTEST_DB
+
+    commands = CommandCounter()
+    monitoring.register(commands.listener())
+    mongo_client.get_client().drop_database(LOADTEST_DB)
+    return fake, server, commands
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_app():
+    import uvicorn
+    from main import app
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="uvicorn", daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class Scenario:
+    def __init__(self, name: str, fake: FakeGroq, commands: CommandCounter):
+        self.name = name
+        self.fake = fake
+        self.commands = commands
+        self.latencies = []
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def timed(self, fn):
+        """Runs one request; fn returns True on success."""
+        started = time.perf_counter()
+        try:
+            ok = fn()
+        except Exception as e:
+            print(f"  [{self.name}] {type(e).__name__}: {e}")
+            ok = False
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.latencies.append(elapsed)
+            if not ok:
+                self.errors += 1
+
+    def run(self, jobs: list, concurrency: int = CONCURRENCY) -> dict:
+        db_before = self.commands.count
+        llm_before = self.fake.served + self.fake.rejected
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(lambda job: job(), jobs))
+        wall = time.perf_counter() - started
+
+        latencies = sorted(self.latencies)
+        requests = len(latencies)
+        result = {
+            "requests": requests,
+            "errors": self.errors,
+            "throughput_rps": round(requests / wall, 2) if wall else 0.0,
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+            "llm_calls_per_request": round((self.fake.served + self.fake.rejected - llm_before) / requests, 2)
+            if requests else 0.0,
+            "db_ops_per_request": round((self.commands.count - db_before) / requests, 2) if requests else 0.0
+        }
+        return result
+
+
+def registration(i: int) -> dict:
+    return {
+        "team_name": f"Load Team {i}",
+        "problem_statement": "Load testing",
+        "duration_hours": 24,
+        "members": [{"name": f"Member {i}-{j}", "email": f"m{i}-{j}@example.com", "role": "Dev"}
+                    for j in range(MEMBERS)]
+    }
+
+
+def run_scenarios(base_url: str, fake: FakeGroq, commands: CommandCounter) -> dict:
+    import httpx
+    from services.memory_selector import MemorySelector
+    from services.compaction_worker import compaction_worker
+
+    client = httpx.Client(base_url=base_url, timeout=60,
+                          limits=httpx.Limits(max_connections=CONCURRENCY * 2))
+    results = {}
+    tokens = []
+    tokens_lock = threading.Lock()
+
+    # 1. Mass registration
+    register = Scenario("register", fake, commands)
+
+    def register_team(i: int):
+        def send():
+            response = client.post("/api/register", json=registration(i))
+            members = response.json().get("members", [])
+            with tokens_lock:
+                tokens.extend(m["token"] for m in members)
+            return response.status_code == 200 and len(members) == MEMBERS
+        register.timed(send)
+
+    results["register"] = register.run([lambda i=i: register_team(i) for i in range(TEAMS)])
+
+    # 2. Steady chat with periodic compaction
+    chat = Scenario("chat", fake, commands)
+
+    def member_session(token: str):
+        for turn in range(TURNS):
+            message = f"I finished step {turn}, what should I do next?"
+            chat.timed(lambda: client.post("/api/chat", json={
+                "token": token, "message": message, "client_message_id": f"{token}-{turn}"
+            }).json().get("success", False))
+            time.sleep(THINK_SECONDS)
+
+    results["chat"] = chat.run([lambda t=t: member_session(t) for t in tokens])
+    compaction_worker.join()
+
+    # 3. Welcome burst over the streaming endpoint (everyone at once)
+    welcome = Scenario("welcome", fake, commands)
+
+    def open_welcome(token: str):
+        def send():
+            with client.stream("POST", "/api/chat/stream",
+                               json={"token": token, "message": "Hi", "is_welcome": True}) as response:
+                body = "".join(response.iter_text())
+            return response.status_code == 200 and '"done": true' in body
+        welcome.timed(send)
+
+    results["welcome"] = welcome.run([lambda t=t: open_welcome(t) for t in tokens], concurrency=len(tokens) or 1)
+
+    # 4. Manager queries through the MemorySelector
+    manager = Scenario("manager", fake, commands)
+    selector = MemorySelector()
+    queries = ["What is the team working on?", "What is Member {i}-1 doing?", "Show the active goals"]
+
+    def ask(i: int, query: str):
+        team_name = f"Load Team {i}"
+        manager.timed(lambda: is_team_context(selector.get_relevant_context(query.format(i=i), team_name=team_name),
+                                              team_name))
+
+    results["manager"] = manager.run([lambda i=i, q=q: ask(i, q) for i in range(TEAMS) for q in queries])
+
+    client.close()
+    return results
+
+
+def is_team_context(context: dict, team_name: str) -> bool:
+    """A manager answer counts only if it holds data of that team (not just an empty or fallback dict)."""
+    if not context or "error" in context:
+        return False
+    team = context.get("team")
+    if team is not None and not (isinstance(team, dict) and team.get("team_name") == team_name):
+        return False
+    if "members" in context and not context["members"]:
+        return False
+    return any(context.values())
+
+
+def compare_to_baseline(results: dict, config: dict):
+    """Returns human-readable regressions, or None if there is no comparable baseline."""
+    if not os.path.exists(BASELINE_PATH):
+        print(f"\nNo baseline at {BASELINE_PATH}; run with --save-baseline to record one on this machine.")
+        return None
+    with open(BASELINE_PATH) as f:
+        baseline = json.load(f)
+    if baseline.get("config") != config:
+        print(f"\nBaseline was recorded with {baseline.get('config')}; rerun with that configuration "
+              f"or record a new one with --save-baseline.")
+        return None
+
+    regressions = []
+    for scenario, current in results.items():
+        base = baseline.get("results", {}).get(scenario)
+        if not base:
+            continue
+        for metric, higher_is_worse in (("p95_ms", True), ("db_ops_per_request", True), ("throughput_rps", False)):
+            if metric not in base or metric not in current or not base[metric]:
+                continue
+            change = (current[metric] - base[metric]) / base[metric]
+            if (change if higher_is_worse else -change) > TOLERANCE:
+                regressions.append(f"{scenario}.{metric}: {base[metric]} -> {current[metric]} ({change:+.0%})")
+    return regressions
+
+
+if __name__ == "__main__":
+    fake, llm_server, commands = configure_backends()
+    app_server, base_url = start_app()
+    try:
+        results = run_scenarios(base_url, fake, commands)
+    finally:
+        app_server.should_exit = True
+        llm_server.shutdown()
+
+    config = {"teams": TEAMS, "members": MEMBERS, "turns": TURNS, "concurrency": CONCURRENCY,
+              "llm_latency": LLM_LATENCY, "llm_rpm": LLM_RPM}
+    print(f"=== load test {config} ===")
+    for scenario, r in results.items():
+        print(f"{scenario:9} {r['requests']:5} req  {r['errors']:3} err  {r['throughput_rps']:7.1f} req/s  "
+              f"p50 {r['p50_ms']:7.1f}  p95 {r['p95_ms']:7.1f}  p99 {r['p99_ms']:7.1f} ms  "
+              f"db ops/req {r['db_ops_per_request']}  llm calls/req {r['llm_calls_per_request']}")
+    print(f"fake Groq: served={fake.served} rejected_429={fake.rejected}")
+
+    import mongo_client
+    mongo_client.get_client().drop_database(LOADTEST_DB)
+
+    if "--save-baseline" in sys.argv:
+        with open(BASELINE_PATH, "w") as f:
+            json.dump({"config": config, "results": results}, f, indent=2)
+        print(f"baseline written to {BASELINE_PATH}")
+        sys.exit(0)
+
+    regressions = compare_to_baseline(results, config)
+    for line in regressions or []:
+        print(f"REGRESSION {line}")
+    if regressions or any(r["errors"] for r in results.values()):
+        sys.exit(1)
+    # Nothing to compare against is not a pass
+    sys.exit(2 if regressions is None else 0)
@@ -0,0 +1,100 @@
+"""
+Startup profiler for cold starts (Render free tier spins instances down).
+
+Reports:
+1. Import time per module for `import main` (via python -X importtime),
+   project modules plus the heaviest third-party packages.
+2. Time-to-first-200 on /health for a fresh uvicorn process.
+
+Exits non-zero if time-to-first-200 exceeds JARVIS_STARTUP_TARGET_MS.
+
+Usage:
+    python benchmarks/startup_profile.py [--top 15]
+"""
+import os
+import re
+import sys
+import time
+import socket
+import subprocess
+import urllib.request
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+TARGET_MS = float(os.getenv("JARVIS_STARTUP_TARGET_MS", "3000"))
+PROJECT_MODULES = ("main", "models", "memory_store", "mongo_client", "services")
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def child_env() -> dict:
+    # Placeholders are fine: nothing connects at import/startup time
+    env = dict(os.environ)
+    env.setdefault("MONGO_URI", "mongodb://localhost:27017")
+    env.setdefault("GROQ_API_KEY", "startup-profile")
+    return env
+
+
+def profile_imports(top: int):
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, env=child_env(), capture_output=True, text=True
+    )
+    if out.returncode != 0:
+        print(out.stderr[-2000:])
+        sys.exit(out.returncode)
+
+    rows = []
+    for line in out.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us), int(cumulative_us), len(indent)))
+
+    total_ms = sum(r[1] for r in rows) / 1000
+    print(f"=== import main: {total_ms:.1f} ms total ===")
+
+    print("\n-- project modules (cumulative ms) --")
+    for name, _, cumulative, _ in rows:
+        if name.split(".")[0] in PROJECT_MODULES:
+            print(f"{cumulative / 1000:9.1f}  {name}")
+
+    print(f"\n-- top {top} top-level third-party imports (cumulative ms) --")
+    top_level = [r for r in rows if "." not in r[0] and r[0] not in PROJECT_MODULES]
+    for name, _, cumulative, _ in sorted(top_level, key=lambda r: -r[2])[:top]:
+        print(f"{cumulative / 1000:9.1f}  {name}")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_first_200(timeout: float = 30.0) -> float:
+    port = free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)],
+        cwd=ROOT, env=child_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as r:
+                    if r.status == 200:
+                        return (time.perf_counter() - started) * 1000
+            except OSError:
+                time.sleep(0.02)
+        raise TimeoutError(f"/health did not answer within {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == "__main__":
+    top = int(sys.argv[sys.argv.index("--top") + 1]) if "--top" in sys.argv else 15
+    profile_imports(top)
+
+    elapsed_ms = time_to_first_200()
+    print(f"\n=== time to first 200 on /health: {elapsed_ms:.0f} ms (target {TARGET_MS:.0f} ms) ===")
+    sys.exit(0 if elapsed_ms <= TARGET_MS else 1)
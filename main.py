@@ -1,20 +1,80 @@
+# Load environment variables (before anything reads os.environ)
+from dotenv import load_dotenv
+load_dotenv()
+
 from fastapi import FastAPI, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from starlette.background import BackgroundTask
+from starlette.datastructures import MutableHeaders
 import sys
 import os
+import json
+import time
+import threading
+import uuid
+from contextlib import asynccontextmanager
 from fastapi import Body
 from models import RegisterRequest
-from memory_store import save_memory
+from memory_store import save_teams_bulk
+import mongo_client
+from typing import List
 
 # Import Services
 from services.memory_service import MemoryService
 from services.intelligence_service import IntelligenceService
+from services.context_cache import context_cache
+from services.compaction_worker import compaction_worker
+from services.metrics import metrics, log_event, request_id_var, METRICS_ENABLED, JSON_LOGS
+from services.query_router import query_router
+from services.response_cache import response_cache
+from services.idempotency import idempotency_cache
+from services.llm_scheduler import llm_scheduler
+from services.team_status import team_status
+from services.memory_index import memory_index
+from services.llm_client import (
+    get_groq_client, get_async_groq_client, pool_stats as llm_pool_stats, close_clients as close_llm_clients
+)
+from services.insight_batcher import (
+    InsightBatcher, INSIGHT_BATCHING, INSIGHT_BATCH_SIZE, INSIGHT_BATCH_WINDOW, INSIGHT_MAX_PENDING
+)
 
-# Load environment variables
-from dotenv import load_dotenv
-load_dotenv()
+# JARVIS_ASYNC_MODE=1 serves chat with async endpoints (Motor + AsyncGroq)
+# instead of sync endpoints on Starlette's threadpool.
+ASYNC_MODE = os.getenv("JARVIS_ASYNC_MODE", "0") == "1"
+
+# Generate welcome messages in the background right after registration
+# (one LLM call per team) instead of on each member's first chat
+PRECOMPUTE_WELCOMES = os.getenv("JARVIS_PRECOMPUTE_WELCOMES", "1") == "1"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Shared resources. Nothing here blocks startup: the DB and LLM clients
+    are created lazily, and warmed up (ping, indexes, HTTP pools) on
+    background threads so /health answers as soon as the app is imported.
+    """
+    mongo_client.warm_up()
+    threading.Thread(target=startup_indexes, name="ensure-indexes", daemon=True).start()
+    threading.Thread(target=warm_up_llm_clients, name="llm-warm-up", daemon=True).start()
+    yield
+    await close_llm_clients()
+    mongo_client.close()
+
+def warm_up_llm_clients():
+    get_groq_client()
+    if ASYNC_MODE:
+        get_async_groq_client()
 
-app = FastAPI()
+def startup_indexes():
+    try:
+        # Imported here: pulls in pymongo, which the first request may not need yet
+        from services.indexes import ensure_indexes
+        ensure_indexes()
+    except Exception as e:
+        print(f"⚠️ Index setup failed: {e}")
+
+app = FastAPI(lifespan=lifespan)
 
 # Initialize Intelligence Service (Global)
 ai_service = IntelligenceService()
@@ -28,45 +88,139 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 🔹 Request ids + per-request latency
+class RequestContextMiddleware:
+    """
+    Tags the request with an id (X-Request-ID from the client, or a new one)
+    that every span / log line of this request carries, and times it until
+    the response is fully sent. Plain ASGI rather than @app.middleware("http"),
+    so streamed (SSE) responses are passed through without an extra task per
+    request. Only installed when metrics or JSON logs are on.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1") or uuid.uuid4().hex[:16]
+        status = {"code": 500}
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                MutableHeaders(scope=message).append("X-Request-ID", request_id)
+            await send(message)
+
+        reset = request_id_var.set(request_id)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id_var.reset(reset)
+            elapsed = time.perf_counter() - started
+            if METRICS_ENABLED:
+                metrics.observe("http_request_seconds", elapsed)
+            if JSON_LOGS:
+                log_event("request", request_id=request_id, method=scope["method"], path=scope["path"],
+                          status=status["code"], duration_ms=round(elapsed * 1000, 2))
+
+if METRICS_ENABLED or JSON_LOGS:
+    app.add_middleware(RequestContextMiddleware)
+
 # 🔹 Health check
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
-# 🔹 MAIN REGISTER ENDPOINT (Unchanged)
-@app.post("/api/register")
-def register(req: RegisterRequest):
-    team = req.team_name
-
-    # 1️⃣ Save TEAM memory
-    save_memory(team, "TEAM", {
-        "team_name": team,
-        "problem_statement": req.problem_statement,
-        "duration_hours": req.duration_hours
-    })
-
-    # 2️⃣ Save MEMBERS
-    member_tokens = []
+def registration_data(req: RegisterRequest) -> dict:
+    members = []
     for i, member in enumerate(req.members):
         member_data = member.dict()
         member_data.update({
             "member_index": i + 1,
             "is_leader": (i == 0)
         })
-        token = save_memory(team, "MEMBER", member_data)
-        member_tokens.append({
-            "name": member.name,
-            "role": member.role,
-            "token": token
-        })
+        members.append(member_data)
+
+    return {
+        "team_name": req.team_name,
+        "problem_statement": req.problem_statement,
+        "duration_hours": req.duration_hours,
+        "members": members
+    }
+
+# 🔹 BACKGROUND TASK: welcome messages for new teams
+def precompute_welcomes(registrations: list, registered: list):
+    """
+    One welcome batch per team, stored on the members' chat docs so the
+    kickoff burst of is_welcome requests is served from the database.
+    """
+    with metrics.span("background_welcome_batch", teams=len(registered)):
+        for reg, team in zip(registrations, registered):
+            try:
+                welcomes = ai_service.generate_welcomes(reg, team["members"])
+                MemoryService.save_welcomes(welcomes)
+            except Exception as e:
+                log_event("welcome_batch_error", team_name=team["team_name"], error=str(e))
+
+# 🔹 MAIN REGISTER ENDPOINT
+@app.post("/api/register")
+def register(req: RegisterRequest, background_tasks: BackgroundTasks):
+    # TEAM + MEMBERS + member_chat in one insert per collection
+    registrations = [registration_data(req)]
+    registered = save_teams_bulk(registrations)
+    if registered and PRECOMPUTE_WELCOMES:
+        background_tasks.add_task(precompute_welcomes, registrations, registered)
 
     return {
         "status": "registered", 
-        "members": member_tokens
+        "members": registered[0]["members"] if registered else []
+    }
+
+# 🔹 BULK REGISTER ENDPOINT (organizer imports at kickoff)
+@app.post("/api/register/bulk")
+def register_bulk(reqs: List[RegisterRequest], background_tasks: BackgroundTasks):
+    if not reqs:
+        return {"success": False, "error": "No teams to register"}
+    registrations = [registration_data(req) for req in reqs]
+    registered = save_teams_bulk(registrations)
+    if registered and PRECOMPUTE_WELCOMES:
+        background_tasks.add_task(precompute_welcomes, registrations, registered)
+
+    return {
+        "status": "registered",
+        "teams": registered or []
+    }
+
+def chat_init_payload(context: dict) -> dict:
+    member = context["member"]
+    team = context["team"]
+
+    return {
+        "success": True,
+        "member": {
+            "name": member.get("name", ""),
+            "role": member.get("role", ""),
+            "chat_history": member.get("chat_history", [])
+        },
+        "team": {
+            "team_name": team.get("team_name", ""),
+            "problem_statement": team.get("problem_statement", "")
+        }
     }
 
+def stored_welcome(context: dict, is_welcome: bool):
+    """The precomputed welcome message, if this is a welcome and it is ready"""
+    return context.get("welcome_message") if is_welcome else None
+
+def welcome_prompt(context: dict, message: str) -> str:
+    # Simple welcome logic reusing the gen-ai but with a welcome preamble
+    return f"[SYSTEM: This is the first interaction. WELCOME the user to the team {context['team']['team_name']}. Message: {message}]"
+
 # 🔹 CHAT INITIALIZATION ENDPOINT
-@app.get("/api/chat/init")
 def chat_init(token: str):
     """Initialize chat session - get member and team data"""
     try:
@@ -74,21 +228,7 @@ def chat_init(token: str):
         if not context:
             return {"success": False, "error": "Invalid token"}
         
-        member = context["member"]
-        team = context["team"]
-
-        return {
-            "success": True,
-            "member": {
-                "name": member.get("name", ""),
-                "role": member.get("role", ""),
-                "chat_history": member.get("chat_history", [])
-            },
-            "team": {
-                "team_name": team.get("team_name", ""),
-                "problem_statement": team.get("problem_statement", "")
-            }
-        }
+        return chat_init_payload(context)
     except Exception as e:
         print(f"Init Error: {e}")
         return {"success": False, "error": str(e)}
@@ -98,7 +238,18 @@ def process_user_insight(token: str, user_msg: str, ai_msg: str):
     """
     Background task to analyze the interaction and save insights.
     Does not block the response to the user.
+    With batching on, the interaction is handed to the insight batcher;
+    otherwise (or as a fallback) it is analyzed on its own.
     """
+    if INSIGHT_BATCHING:
+        insight_batcher.submit(token, user_msg, ai_msg)
+        return
+
+    with metrics.span("background_insight"):
+        analyze_single_interaction(token, user_msg, ai_msg)
+
+def analyze_single_interaction(token: str, user_msg: str, ai_msg: str):
+    """Per-turn insight extraction (one LLM call)"""
     try:
         # Get fresh context
         context = MemoryService.get_user_context(token)
@@ -112,10 +263,34 @@ def process_user_insight(token: str, user_msg: str, ai_msg: str):
             MemoryService.save_insight(token, insight)
             
     except Exception as e:
-        print(f"Background Insight Error: {e}")
+        log_event("insight_error", token=token, error=str(e))
+
+def process_insight_batch(items: list):
+    """
+    Insight batcher handler: one LLM call for the whole batch, bulk save,
+    then per-turn fallback for any interaction the model left out of its answer.
+    A failed, shed or rate-limited batch call is dropped (the batcher counts it),
+    not retried turn by turn: that would multiply LLM calls while the key is saturated.
+    """
+    interactions = []
+    for item in items:
+        context = MemoryService.get_user_context(item["token"])
+        if context:
+            interactions.append(dict(item, context=context))
+
+    insights = ai_service.analyze_behavior_batch(interactions)
+    if insights is None:
+        raise RuntimeError(f"insight batch of {len(interactions)} interactions failed")
+    if insights:
+        MemoryService.save_insights(insights)
+
+    for item in interactions:
+        if item["token"] not in insights:
+            analyze_single_interaction(item["token"], item["user_message"], item["ai_response"])
+
+insight_batcher = InsightBatcher(process_insight_batch, INSIGHT_BATCH_SIZE, INSIGHT_BATCH_WINDOW, INSIGHT_MAX_PENDING)
 
 # 🔹 CHAT MESSAGE ENDPOINT
-@app.post("/api/chat")
 def chat(background_tasks: BackgroundTasks, message_data: dict = Body(...)):
     """
     Handle chat interactions with Dual-Loop Architecture.
@@ -129,29 +304,42 @@ def chat(background_tasks: BackgroundTasks, message_data: dict = Body(...)):
     
     if not token or not message:
         return {"success": False, "error": "Missing token or message"}
-    
+
+    # Client retries with the same client_message_id share one turn (see services/idempotency.py)
+    key = idempotency_cache.key(token, message_data.get("client_message_id"))
+    return idempotency_cache.run(
+        key, lambda: chat_turn(background_tasks, token, message, is_welcome), cacheable=is_successful_turn
+    )
+
+def is_successful_turn(result: dict) -> bool:
+    return bool(result.get("success"))
+
+def chat_turn(background_tasks: BackgroundTasks, token: str, message: str, is_welcome: bool) -> dict:
     try:
         # 1. Get Context (Includes past Insights!)
-        context = MemoryService.get_user_context(token)
+        with metrics.span("chat_get_context"):
+            context = MemoryService.get_user_context(token)
         if not context:
             return {"success": False, "error": "Invalid token"}
 
-        # 2. Generate AI Response
-        if is_welcome:
-            # Simple welcome logic reusing the gen-ai but with a welcome preamble
-            ai_response = ai_service.generate_response(
-                f"[SYSTEM: This is the first interaction. WELCOME the user to the team {context['team']['team_name']}. Message: {message}]", 
-                context
-            )
-        else:
-            ai_response = ai_service.generate_response(message, context)
+        # 2. Generate AI Response (precomputed welcomes need no LLM call)
+        welcome = stored_welcome(context, is_welcome)
+        with metrics.span("chat_generate"):
+            if welcome:
+                ai_response = welcome
+            elif is_welcome:
+                ai_response = ai_service.generate_response(welcome_prompt(context, message), context, welcome=True)
+            else:
+                ai_response = ai_service.generate_response(message, context)
             
         # 3. Save Chat Log
-        updated_history = MemoryService.append_chat_history(token, message, ai_response, ai_service)
+        with metrics.span("chat_append_history"):
+            updated_history = MemoryService.append_chat_history(token, message, ai_response, ai_service)
         
         # 4. Schedule Background Insight Extraction (The "Crazy Part")
         # We run this in the background so the user gets their answer fast!
-        background_tasks.add_task(process_user_insight, token, message, ai_response)
+        if not welcome:
+            background_tasks.add_task(process_user_insight, token, message, ai_response)
 
         return {
             "success": True,
@@ -160,9 +348,211 @@ def chat(background_tasks: BackgroundTasks, message_data: dict = Body(...)):
         }
         
     except Exception as e:
-        print(f"Chat Error: {e}")
+        log_event("chat_error", token=token, error=str(e))
         return {"success": False, "error": str(e)}
 
+def sse_event(payload: dict) -> str:
+    # default=str: chat history entries carry datetime timestamps
+    return f"data: {json.dumps(payload, default=str)}\n\n"
+
+# 🔹 STREAMING CHAT ENDPOINT (Server-Sent Events)
+def chat_stream(message_data: dict = Body(...)):
+    """
+    Same flow as /api/chat, but tokens are forwarded as they arrive:
+    - `data: {"delta": "..."}` per chunk
+    - `data: {"done": true, "chat_history": [...]}` once the reply is saved
+    The insight loop is scheduled after the stream completes.
+    """
+    started = time.perf_counter()
+    token = message_data.get("token")
+    message = message_data.get("message")
+    is_welcome = message_data.get("is_welcome", False)
+
+    if not token or not message:
+        return {"success": False, "error": "Missing token or message"}
+
+    try:
+        context = MemoryService.get_user_context(token)
+        if not context:
+            return {"success": False, "error": "Invalid token"}
+    except Exception as e:
+        log_event("chat_stream_error", token=token, error=str(e))
+        return {"success": False, "error": str(e)}
+
+    prompt = welcome_prompt(context, message) if is_welcome else message
+    welcome = stored_welcome(context, is_welcome)
+    turn = {"reply": ""}
+
+    def events():
+        parts = []
+        deltas = [welcome] if welcome else ai_service.stream_response(prompt, context, welcome=is_welcome)
+        for delta in deltas:
+            if not parts:
+                metrics.observe("chat_ttft_seconds", time.perf_counter() - started)
+            parts.append(delta)
+            yield sse_event({"delta": delta})
+        metrics.observe("chat_stream_seconds", time.perf_counter() - started)
+
+        turn["reply"] = "".join(parts)
+        updated_history = MemoryService.append_chat_history(token, message, turn["reply"], ai_service)
+        yield sse_event({"done": True, "chat_history": updated_history})
+
+    def insight_after_stream():
+        if turn["reply"] and not welcome:
+            process_user_insight(token, message, turn["reply"])
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             background=BackgroundTask(insight_after_stream))
+
+# 🔹 ASYNC VARIANTS (JARVIS_ASYNC_MODE=1)
+async def chat_init_async(token: str):
+    """Async twin of chat_init"""
+    try:
+        context = await MemoryService.aget_user_context(token)
+        if not context:
+            return {"success": False, "error": "Invalid token"}
+
+        return chat_init_payload(context)
+    except Exception as e:
+        print(f"Init Error: {e}")
+        return {"success": False, "error": str(e)}
+
+async def chat_async(background_tasks: BackgroundTasks, message_data: dict = Body(...)):
+    """Async twin of chat: DB and LLM calls are awaited instead of holding a threadpool slot"""
+    token = message_data.get("token")
+    message = message_data.get("message")
+    is_welcome = message_data.get("is_welcome", False)
+
+    if not token or not message:
+        return {"success": False, "error": "Missing token or message"}
+
+    key = idempotency_cache.key(token, message_data.get("client_message_id"))
+    return await idempotency_cache.arun(
+        key, lambda: chat_turn_async(background_tasks, token, message, is_welcome), cacheable=is_successful_turn
+    )
+
+async def chat_turn_async(background_tasks: BackgroundTasks, token: str, message: str, is_welcome: bool) -> dict:
+    try:
+        with metrics.span("chat_get_context"):
+            context = await MemoryService.aget_user_context(token)
+        if not context:
+            return {"success": False, "error": "Invalid token"}
+
+        welcome = stored_welcome(context, is_welcome)
+        with metrics.span("chat_generate"):
+            if welcome:
+                ai_response = welcome
+            elif is_welcome:
+                ai_response = await ai_service.agenerate_response(welcome_prompt(context, message), context, welcome=True)
+            else:
+                ai_response = await ai_service.agenerate_response(message, context)
+
+        with metrics.span("chat_append_history"):
+            updated_history = await MemoryService.aappend_chat_history(token, message, ai_response, ai_service)
+
+        # The insight loop stays sync; BackgroundTasks runs it on the threadpool
+        if not welcome:
+            background_tasks.add_task(process_user_insight, token, message, ai_response)
+
+        return {
+            "success": True,
+            "response": ai_response,
+            "chat_history": updated_history
+        }
+
+    except Exception as e:
+        log_event("chat_error", token=token, error=str(e))
+        return {"success": False, "error": str(e)}
+
+async def chat_stream_async(message_data: dict = Body(...)):
+    """Async twin of chat_stream"""
+    started = time.perf_counter()
+    token = message_data.get("token")
+    message = message_data.get("message")
+    is_welcome = message_data.get("is_welcome", False)
+
+    if not token or not message:
+        return {"success": False, "error": "Missing token or message"}
+
+    try:
+        context = await MemoryService.aget_user_context(token)
+        if not context:
+            return {"success": False, "error": "Invalid token"}
+    except Exception as e:
+        log_event("chat_stream_error", token=token, error=str(e))
+        return {"success": False, "error": str(e)}
+
+    prompt = welcome_prompt(context, message) if is_welcome else message
+    welcome = stored_welcome(context, is_welcome)
+    turn = {"reply": ""}
+
+    async def replay(text: str):
+        yield text
+
+    async def events():
+        parts = []
+        deltas = replay(welcome) if welcome else ai_service.astream_response(prompt, context, welcome=is_welcome)
+        async for delta in deltas:
+            if not parts:
+                metrics.observe("chat_ttft_seconds", time.perf_counter() - started)
+            parts.append(delta)
+            yield sse_event({"delta": delta})
+        metrics.observe("chat_stream_seconds", time.perf_counter() - started)
+
+        turn["reply"] = "".join(parts)
+        updated_history = await MemoryService.aappend_chat_history(token, message, turn["reply"], ai_service)
+        yield sse_event({"done": True, "chat_history": updated_history})
+
+    def insight_after_stream():
+        if turn["reply"] and not welcome:
+            process_user_insight(token, message, turn["reply"])
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             background=BackgroundTask(insight_after_stream))
+
+if ASYNC_MODE:
+    app.add_api_route("/api/chat/init", chat_init_async, methods=["GET"])
+    app.add_api_route("/api/chat", chat_async, methods=["POST"])
+    app.add_api_route("/api/chat/stream", chat_stream_async, methods=["POST"])
+else:
+    app.add_api_route("/api/chat/init", chat_init, methods=["GET"])
+    app.add_api_route("/api/chat", chat, methods=["POST"])
+    app.add_api_route("/api/chat/stream", chat_stream, methods=["POST"])
+
+# 🔹 Prometheus scrape endpoint
+metrics.gauge("llm_queue_depth_interactive", lambda: llm_scheduler.stats()["queue_depth"]["interactive"],
+              "LLM calls waiting for admission (interactive)")
+metrics.gauge("llm_queue_depth_background", lambda: llm_scheduler.stats()["queue_depth"]["background"],
+              "LLM calls waiting for admission (background)")
+metrics.gauge("llm_in_flight", lambda: llm_pool_stats.snapshot()["in_flight"], "Groq HTTP requests in flight")
+metrics.gauge("mongo_connections_checked_out", lambda: mongo_client.pool_metrics.snapshot()["checked_out"],
+              "Mongo connections in use")
+metrics.gauge("compaction_backlog", lambda: compaction_worker.stats()["backlog"], "Chats queued for compaction")
+metrics.gauge("insight_batch_pending", lambda: insight_batcher.stats()["pending"], "Interactions waiting for a batch")
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
 @app.get("/debug/routes")
 def debug_routes():
-    return {"routes": ["health", "api/register", "api/chat/init", "api/chat"]}
\ No newline at end of file
+    return {"routes": ["health", "api/register", "api/register/bulk", "api/chat/init", "api/chat", "api/chat/stream", "debug/stats", "metrics"]}
+
+@app.get("/debug/stats")
+def debug_stats():
+    return {
+        "context_cache": context_cache.stats(),
+        "compaction": compaction_worker.stats(),
+        "insight_batcher": insight_batcher.stats(),
+        "query_router": query_router.stats(),
+        "response_cache": response_cache.stats(),
+        "idempotency": idempotency_cache.stats(),
+        "llm_scheduler": llm_scheduler.stats(),
+        "team_status": team_status.stats(),
+        "memory_index": memory_index.stats(),
+        "pools": {
+            "mongo": mongo_client.pool_metrics.snapshot(),
+            "llm": llm_pool_stats.snapshot()
+        },
+        "latency": metrics.snapshot()
+    }
\ No newline at end of file
@@ -1,11 +1,52 @@
 from datetime import datetime
 try:
-    from backend.mongo_client import db
+    from backend.mongo_client import db, get_client
 except ImportError:
-    from mongo_client import db
-from bson import ObjectId
+    from mongo_client import db, get_client
+from services.context_cache import context_cache
+from services.member_directory import member_directory
+from services.team_status import team_status
 import secrets
 
+def build_team_doc(team_name: str, data: dict, timestamp: datetime) -> dict:
+    return {
+        "team_name": team_name,
+        "problem_statement": data.get("problem_statement", ""),
+        "hackathon": {
+            "start_time": timestamp,
+            "duration_hours": data.get("duration_hours", 24)
+        },
+        "created_at": timestamp
+    }
+
+def build_member_docs(team_name: str, data: dict, timestamp: datetime):
+    """
+    Returns (member_doc, chat_doc) for a new member with a fresh chat token.
+    """
+    # Generate unique chat token
+    chat_token = secrets.token_urlsafe(16)
+
+    member_doc = {
+        "token": chat_token,
+        "team_name": team_name,
+        "name": data.get("name", ""),
+        "role": data.get("role", "Team Member"),
+        "email": data.get("email", ""), # Storing email/gmail
+        "phone": data.get("phone", ""),
+        "skills": data.get("skills", []),
+        "joined_at": timestamp,
+        "last_active_at": timestamp
+    }
+    chat_doc = {
+        "token": chat_token,
+        "member_name": data.get("name", ""),
+        "messages": [], # Raw chat logs
+        "message_count": 0, # Maintained by $inc on append, resynced on compaction
+        "compaction_seq": 0, # Number of windows compacted so far
+        "last_updated": timestamp
+    }
+    return member_doc, chat_doc
+
 def save_memory(team_name: str, mem_type: str, data: dict):
     if db is None:
         print("❌ Error: Database not connected. Cannot save memory.")
@@ -16,49 +57,27 @@ def save_memory(team_name: str, mem_type: str, data: dict):
     # 1. TEAM Collection
     if mem_type.upper() == "TEAM":
         collection = db["teams"]
-        team_doc = {
-            "team_name": team_name,
-            "problem_statement": data.get("problem_statement", ""),
-            "hackathon": {
-                "start_time": timestamp,
-                "duration_hours": data.get("duration_hours", 24)
-            },
-            "created_at": timestamp
-        }
+        team_doc = build_team_doc(team_name, data, timestamp)
         result = collection.insert_one(team_doc)
+        context_cache.invalidate_team(team_name)
+        team_status.upsert_team(team_doc)
         return result.inserted_id
         
     # 2. MEMBER Collection (Profile Only)
     elif mem_type.upper() == "MEMBER":
         collection = db["members"]
-        # Generate unique chat token
-        chat_token = secrets.token_urlsafe(16)
-        
-        member_doc = {
-            "token": chat_token,
-            "team_name": team_name,
-            "name": data.get("name", ""),
-            "role": data.get("role", "Team Member"),
-            "email": data.get("email", ""), # Storing email/gmail
-            "phone": data.get("phone", ""),
-            "skills": data.get("skills", []),
-            "joined_at": timestamp,
-            "last_active_at": timestamp
-        }
+        member_doc, chat_doc = build_member_docs(team_name, data, timestamp)
         collection.insert_one(member_doc)
 
         # Initialize empty Member Chat
-        db["member_chat"].insert_one({
-            "token": chat_token,
-            "member_name": data.get("name", ""),
-            "messages": [], # Raw chat logs
-            "last_updated": timestamp
-        })
+        db["member_chat"].insert_one(chat_doc)
+        member_directory.refresh_team(team_name)
+        team_status.add_member(member_doc)
 
         # Initialize empty Goal (Optional, or created later)
         # We can create a default goal if provided
         
-        return chat_token
+        return member_doc["token"]
     
     # 3. GOALS Collection
     elif mem_type.upper() == "GOAL":
@@ -72,6 +91,8 @@ def save_memory(team_name: str, mem_type: str, data: dict):
             "created_at": timestamp
         }
         result = collection.insert_one(goal_doc)
+        context_cache.invalidate(goal_doc["token"])
+        team_status.add_goal(goal_doc["token"], goal_doc["goal_text"])
         return result.inserted_id
 
     # 4. INSTRUCTION Collection
@@ -85,6 +106,11 @@ def save_memory(team_name: str, mem_type: str, data: dict):
             "created_at": timestamp
         }
         result = collection.insert_one(instruction_doc)
+        # "all" instructions reach every member, so drop every cached context
+        if instruction_doc["target_member_token"] == "all":
+            context_cache.clear()
+        else:
+            context_cache.invalidate(instruction_doc["target_member_token"])
         return result.inserted_id
 
     # Reference to Generic Memory
@@ -97,4 +123,60 @@ def save_memory(team_name: str, mem_type: str, data: dict):
             "created_at": timestamp
         }
         result = collection.insert_one(doc)
-        return result.inserted_id
\ No newline at end of file
+        return result.inserted_id
+
+def save_teams_bulk(registrations: list):
+    """
+    Registers many teams at once.
+    `registrations` is a list of {"team_name", "problem_statement", "duration_hours", "members": [dict]}.
+    All documents are built in memory and written with one insert_many
+    (ordered=False) per collection, inside a transaction when the deployment
+    supports it. Returns [{"team_name", "members": [{"name", "role", "token"}]}].
+    """
+    if db is None:
+        print("❌ Error: Database not connected. Cannot save memory.")
+        return None
+
+    timestamp = datetime.utcnow()
+    team_docs, member_docs, chat_docs, results = [], [], [], []
+    team_members = {}
+
+    for reg in registrations:
+        team_name = reg["team_name"]
+        team_docs.append(build_team_doc(team_name, reg, timestamp))
+        tokens = []
+        for member in reg.get("members", []):
+            member_doc, chat_doc = build_member_docs(team_name, member, timestamp)
+            member_docs.append(member_doc)
+            chat_docs.append(chat_doc)
+            team_members.setdefault(team_name, []).append(member_doc)
+            tokens.append({"name": member_doc["name"], "role": member_doc["role"], "token": member_doc["token"]})
+        results.append({"team_name": team_name, "members": tokens})
+
+    if not team_docs:
+        return results
+
+    def write(session=None):
+        db["teams"].insert_many(team_docs, ordered=False, session=session)
+        if member_docs:
+            db["members"].insert_many(member_docs, ordered=False, session=session)
+            db["member_chat"].insert_many(chat_docs, ordered=False, session=session)
+
+    from pymongo.errors import OperationFailure
+
+    try:
+        with get_client().start_session() as session:
+            with session.start_transaction():
+                write(session)
+    except OperationFailure as e:
+        # Standalone mongod (local dev) has no transactions: code 20 / IllegalOperation
+        if e.code != 20 and "Transaction numbers" not in str(e):
+            raise
+        write()
+
+    for reg in registrations:
+        context_cache.invalidate_team(reg["team_name"])
+        member_directory.refresh_team(reg["team_name"], team_members.get(reg["team_name"], []))
+    team_status.put_teams(team_docs, member_docs)
+    print(f"[MEMORY] Registered {len(team_docs)} teams / {len(member_docs)} members in bulk.")
+    return results
@@ -1,20 +1,163 @@
-from pymongo import MongoClient
 import os
+import threading
 
-# Get MongoDB URI from environment variable
-MONGO_URI = os.getenv("MONGO_URI")
-
-if not MONGO_URI:
-    raise ValueError("MONGO_URI environment variable is required")
-
-try:
-    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
-    db = client["jarvis_memory"]  # Single database for all memory
-    
-    # Test connection
-    client.admin.command('ping')
-    print("✅ Connected to MongoDB successfully")
-except Exception as e:
-    print(f"❌ MongoDB connection failed: {e}")
-    client = None
-    db = None
\ No newline at end of file
+# pymongo / motor are imported on first use (see get_client) so that a cold
+# start only pays for them when the first request actually needs the DB.
+
+# Connection pool settings
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+DB_NAME = "jarvis_memory"  # Single database for all memory
+
+
+def _mongo_uri() -> str:
+    # Get MongoDB URI from environment variable
+    uri = os.getenv("MONGO_URI")
+    if not uri:
+        raise ValueError("MONGO_URI environment variable is required")
+    return uri
+
+
+class PoolMetrics:
+    """Connection pool utilization, fed by pymongo's CMAP events."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open_connections = 0
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+
+    def created(self):
+        with self._lock:
+            self.open_connections += 1
+
+    def closed(self):
+        with self._lock:
+            self.open_connections -= 1
+
+    def checked_out_one(self):
+        with self._lock:
+            self.checked_out += 1
+            self.checkouts += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+
+    def checked_in_one(self):
+        with self._lock:
+            self.checked_out -= 1
+
+    def check_out_failed(self):
+        with self._lock:
+            self.checkout_failures += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "open_connections": self.open_connections,
+                "checked_out": self.checked_out,
+                "peak_checked_out": self.peak_checked_out,
+                "max_pool_size": MONGO_MAX_POOL_SIZE,
+                "utilization": round(self.checked_out / MONGO_MAX_POOL_SIZE, 4) if MONGO_MAX_POOL_SIZE else 0.0,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+def _pool_listener():
+    from pymongo import monitoring
+
+    class PoolListener(monitoring.ConnectionPoolListener):
+        def connection_created(self, event): pool_metrics.created()
+        def connection_closed(self, event): pool_metrics.closed()
+        def connection_checked_out(self, event): pool_metrics.checked_out_one()
+        def connection_checked_in(self, event): pool_metrics.checked_in_one()
+        def connection_check_out_failed(self, event): pool_metrics.check_out_failed()
+        # Remaining CMAP events are not needed for utilization
+        def pool_created(self, event): pass
+        def pool_ready(self, event): pass
+        def pool_cleared(self, event): pass
+        def pool_closed(self, event): pass
+        def connection_ready(self, event): pass
+        def connection_check_out_started(self, event): pass
+
+    return PoolListener()
+
+
+client = None
+_lock = threading.Lock()
+
+def get_client():
+    """
+    Shared MongoClient, created on first use. MongoClient connects in the
+    background, so this never blocks on network I/O either.
+    """
+    global client
+    if client is None:
+        with _lock:
+            if client is None:
+                from pymongo import MongoClient
+                client = MongoClient(
+                    _mongo_uri(),
+                    serverSelectionTimeoutMS=5000,
+                    maxPoolSize=MONGO_MAX_POOL_SIZE,
+                    minPoolSize=MONGO_MIN_POOL_SIZE,
+                    event_listeners=[_pool_listener()]
+                )
+    return client
+
+
+class _LazyDatabase:
+    """
+    Stands in for the `jarvis_memory` Database so modules can keep doing
+    `from mongo_client import db` at import time without connecting.
+    """
+    def __getattr__(self, name):
+        return getattr(get_client()[DB_NAME], name)
+
+    def __getitem__(self, name):
+        return get_client()[DB_NAME][name]
+
+
+db = _LazyDatabase()
+
+
+def warm_up():
+    """Creates the client and pings the server off the request path (FastAPI startup)."""
+    def ping():
+        try:
+            get_client().admin.command('ping')
+            print("✅ Connected to MongoDB successfully")
+        except Exception as e:
+            print(f"❌ MongoDB connection failed: {e}")
+
+    threading.Thread(target=ping, name="mongo-warm-up", daemon=True).start()
+
+
+def close():
+    """Closes the sync and async clients (FastAPI shutdown)."""
+    if client is not None:
+        client.close()
+    if async_client is not None:
+        async_client.close()
+
+
+# Async client for the async request pipeline (JARVIS_ASYNC_MODE=1).
+# Created on first use so the sync deployment never imports motor.
+async_client = None
+async_db = None
+
+def get_async_db():
+    global async_client, async_db
+    if async_db is None:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        async_client = AsyncIOMotorClient(
+            _mongo_uri(),
+            serverSelectionTimeoutMS=5000,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE
+        )
+        async_db = async_client[DB_NAME]
+    return async_db
@@ -0,0 +1,85 @@
+"""
+Background chat compaction.
+
+Summarizing the oldest chat window costs a second LLM call, so it no longer
+runs inside /api/chat. append_chat_history only enqueues the token here and
+a small pool of daemon threads does the summarize-and-trim work.
+A token is queued at most once at a time, so the same window is never
+picked up by two workers.
+"""
+import os
+import queue
+import threading
+
+from services.metrics import metrics
+
+
+class CompactionWorker:
+    def __init__(self, num_workers: int = 2):
+        self.num_workers = num_workers
+        self._queue = queue.Queue()
+        self._pending = set()  # tokens queued or being compacted
+        self._lock = threading.Lock()
+        self._threads = []
+        self.enqueued = 0
+        self.completed = 0
+        self.failed = 0
+
+    def submit(self, token: str, job) -> bool:
+        """
+        Queues `job` (a no-arg callable) for `token`.
+        Returns False if a compaction for that token is already pending.
+        """
+        with self._lock:
+            if token in self._pending:
+                return False
+            self._pending.add(token)
+            self.enqueued += 1
+            self._ensure_started()
+        self._queue.put((token, job))
+        return True
+
+    def _ensure_started(self):
+        # Called with self._lock held
+        if self._threads:
+            return
+        for i in range(self.num_workers):
+            t = threading.Thread(target=self._run, name=f"compaction-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _run(self):
+        while True:
+            token, job = self._queue.get()
+            try:
+                with metrics.span("background_compaction"):
+                    job()
+                with self._lock:
+                    self.completed += 1
+            except Exception as e:
+                print(f"❌ Compaction Error ({token}): {e}")
+                with self._lock:
+                    self.failed += 1
+            finally:
+                with self._lock:
+                    self._pending.discard(token)
+                self._queue.task_done()
+
+    def join(self):
+        """Blocks until every queued compaction has finished (used by scripts/shutdown)."""
+        self._queue.join()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backlog": len(self._pending),
+                "queued": self._queue.qsize(),
+                "workers": len(self._threads),
+                "enqueued": self.enqueued,
+                "completed": self.completed,
+                "failed": self.failed
+            }
+
+
+# Shared instance (Global)
+compaction_worker = CompactionWorker(num_workers=int(os.getenv("JARVIS_COMPACTION_WORKERS", "2")))
@@ -0,0 +1,134 @@
+"""
+In-process LRU + TTL cache for member contexts, keyed by token.
+
+Team, profile, instructions and summary rarely change between two chat
+turns, so MemoryService.get_user_context serves them from here. Every write
+path that touches one of those pieces updates or invalidates the entry so
+reads stay consistent.
+
+A read that misses loads from Mongo outside the lock; a write landing during
+that load would otherwise be overwritten by the reader's put of the older
+context. Every write bumps the token's generation (clear / invalidate_team
+bump a global epoch), and a put carrying the generation seen at the miss is
+dropped if it changed in between.
+"""
+import os
+import copy
+import time
+import threading
+from collections import OrderedDict
+
+
+class ContextCache:
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # token -> (expires_at, context)
+        self._generations = {}  # token -> number of writes seen
+        self._epoch = 0  # bumped by clear / invalidate_team
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale_puts = 0
+
+    def _bump(self, token: str):
+        # Called with self._lock held
+        self._generations[token] = self._generations.get(token, 0) + 1
+
+    def generation(self, token: str):
+        """Snapshot to take on a miss, before loading, and hand back to put()."""
+        with self._lock:
+            return self._epoch, self._generations.get(token, 0)
+
+    def get(self, token: str):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, context = entry
+            if expires_at < time.monotonic():
+                del self._entries[token]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return copy.deepcopy(context)
+
+    def put(self, token: str, context: dict, generation=None):
+        """Stores a loaded context; a no-op if a write happened since `generation` was taken."""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != (self._epoch, self._generations.get(token, 0)):
+                self.stale_puts += 1
+                return
+            self._entries[token] = (time.monotonic() + self.ttl_seconds, copy.deepcopy(context))
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def update(self, token: str, **fields):
+        """Write-through: patch fields of a cached context in place (no-op if not cached)."""
+        with self._lock:
+            self._bump(token)
+            entry = self._entries.get(token)
+            if entry is None:
+                return
+            entry[1].update(copy.deepcopy(fields))
+
+    def append(self, token: str, field: str, value, keep: int):
+        """Write-through for bounded lists: append `value` to `field`, keep the last `keep` items."""
+        with self._lock:
+            self._bump(token)
+            entry = self._entries.get(token)
+            if entry is None:
+                return
+            entry[1][field] = (entry[1].get(field, []) + [copy.deepcopy(value)])[-keep:]
+
+    def invalidate(self, token: str):
+        with self._lock:
+            self._bump(token)
+            if self._entries.pop(token, None) is not None:
+                self.invalidations += 1
+
+    def invalidate_team(self, team_name: str):
+        with self._lock:
+            # Tokens of the team that are being loaded right now are not known here
+            self._epoch += 1
+            stale = [t for t, (_, ctx) in self._entries.items()
+                     if ctx["member"].get("team_name") == team_name]
+            for token in stale:
+                del self._entries[token]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "stale_puts": self.stale_puts
+            }
+
+
+# Shared instance (Global). Size 0 disables caching.
+context_cache = ContextCache(
+    max_entries=int(os.getenv("JARVIS_CONTEXT_CACHE_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("JARVIS_CONTEXT_CACHE_TTL", "300"))
+)
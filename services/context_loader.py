@@ -0,0 +1,163 @@
+"""
+Single round-trip context assembly for a member token.
+
+Instead of sequential queries (members, teams, member_chat, Active_goals,
+instruction_team, member_summary_rollup / member_chat_summery,
+member_insights) we run one aggregation on `members` and pull everything
+else in with `$lookup` sub-pipelines.
+"""
+
+import os
+from datetime import datetime
+
+RECENT_CHAT_LIMIT = 10
+# Most recent behavioral insights injected into the prompt
+INSIGHTS_PER_MEMBER = int(os.getenv("JARVIS_INSIGHTS_PER_MEMBER", "5"))
+
+
+def build_context_pipeline(token: str) -> list:
+    """
+    Aggregation pipeline that returns the member document with all the
+    related collections joined in under underscore-prefixed fields.
+    The token is known up front, so every lookup except the team one is an
+    uncorrelated sub-pipeline that can use the collection's token index.
+    """
+    return [
+        {"$match": {"token": token}},
+        {"$limit": 1},
+
+        # 1. Team (joined on team_name)
+        {"$lookup": {
+            "from": "teams",
+            "localField": "team_name",
+            "foreignField": "team_name",
+            "as": "_team"
+        }},
+
+        # 2. Recent Chat History (tail only, never the whole array)
+        {"$lookup": {
+            "from": "member_chat",
+            "pipeline": [
+                {"$match": {"token": token}},
+                {"$limit": 1},
+                {"$project": {"_id": 0, "messages": {"$slice": ["$messages", -RECENT_CHAT_LIMIT]},
+                              "welcome_message": 1}}
+            ],
+            "as": "_chat"
+        }},
+
+        # 3. Active Goals
+        {"$lookup": {
+            "from": "Active_goals",
+            "pipeline": [
+                {"$match": {"token": token, "status": "active"}},
+                {"$project": {"_id": 0, "goal_text": 1}}
+            ],
+            "as": "_goals"
+        }},
+
+        # 4. Instructions (Targeted + All)
+        {"$lookup": {
+            "from": "instruction_team",
+            "pipeline": [
+                {"$match": {
+                    "$or": [
+                        {"target_member_token": token},
+                        {"target_member_token": "all"}
+                    ],
+                    "active": True
+                }},
+                {"$project": {"_id": 0, "instruction_text": 1}}
+            ],
+            "as": "_instructions"
+        }},
+
+        # 5. Latest Summary: the rolling rollup (one small doc) or the latest per-window summary
+        {"$lookup": {
+            "from": "member_summary_rollup",
+            "pipeline": [
+                {"$match": {"token": token}},
+                {"$limit": 1},
+                {"$project": {"_id": 0, "summary_text": 1, "day": 1, "timestamp": 1}}
+            ],
+            "as": "_rollup"
+        }},
+        {"$lookup": {
+            "from": "member_chat_summery",
+            "pipeline": [
+                {"$match": {"token": token}},
+                {"$sort": {"timestamp": -1}},
+                {"$limit": 1},
+                {"$project": {"_id": 0, "summary_text": 1, "timestamp": 1}}
+            ],
+            "as": "_summary"
+        }},
+
+        # 6. Latest Behavioral Insights (served by the {token, created_at, insight_text} index)
+        {"$lookup": {
+            "from": "member_insights",
+            "pipeline": [
+                {"$match": {"token": token}},
+                {"$sort": {"created_at": -1}},
+                {"$limit": INSIGHTS_PER_MEMBER},
+                {"$project": {"_id": 0, "insight_text": 1}}
+            ],
+            "as": "_insights"
+        }}
+    ]
+
+
+def assemble_context(doc: dict) -> dict:
+    """
+    Turns the aggregation result into the dict shape that
+    MemoryService.get_user_context has always returned.
+    """
+    team_docs = doc.pop("_team", [])
+    chat_docs = doc.pop("_chat", [])
+    goal_docs = doc.pop("_goals", [])
+    instruction_docs = doc.pop("_instructions", [])
+    summary_docs = doc.pop("_rollup", []) + doc.pop("_summary", [])
+    insight_docs = doc.pop("_insights", [])
+
+    team = team_docs[0] if team_docs else {"team_name": "Unknown", "problem_statement": "Unknown"}
+    recent_chat = chat_docs[0].get("messages", []) if chat_docs else []
+    # Whichever was written last (the summary mode can be switched)
+    summary_docs.sort(key=lambda d: d.get("timestamp") or datetime.min, reverse=True)
+    latest_summary = summary_docs[0]["summary_text"] if summary_docs else "No previous summary."
+    # A rollup's text embeds that day's summary, which is also indexed for retrieval
+    summary_day = summary_docs[0].get("day") if summary_docs else None
+
+    return {
+        "member": doc,
+        "team": team,
+        "chat_history": recent_chat,
+        "active_goals": [g["goal_text"] for g in goal_docs],
+        "instructions": [i["instruction_text"] for i in instruction_docs],
+        "latest_summary": latest_summary,
+        "summary_day": summary_day,
+        # Newest first from the index; prompts read them oldest -> newest
+        "insights": [i["insight_text"] for i in reversed(insight_docs)],
+        # Precomputed at registration (MemoryService.save_welcomes); None if not ready
+        "welcome_message": chat_docs[0].get("welcome_message") if chat_docs else None
+    }
+
+
+def load_user_context(db, token: str):
+    """
+    Fetches the full member context in one round trip.
+    Returns None if the token does not belong to a member.
+    """
+    docs = list(db.members.aggregate(build_context_pipeline(token)))
+    if not docs:
+        return None
+    return assemble_context(docs[0])
+
+
+async def aload_user_context(async_db, token: str):
+    """
+    Same as load_user_context, for the async (Motor) database handle.
+    """
+    docs = await async_db.members.aggregate(build_context_pipeline(token)).to_list(length=1)
+    if not docs:
+        return None
+    return assemble_context(docs[0])
@@ -0,0 +1,199 @@
+"""
+Idempotency for /api/chat retries.
+
+Mobile clients retry on timeout while the original request is still waiting
+on the LLM. Requests carrying the same (token, client_message_id) are
+coalesced: the first one runs the chat turn, concurrent duplicates wait for
+its result, and late retries within the TTL get the stored response back.
+Failed turns are not stored, so a retry after an error runs again. If the
+leader is cancelled (client disconnect, shutdown), a waiting duplicate
+takes over and runs the turn itself.
+"""
+import os
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+
+
+class _InFlight:
+    """Result slot shared by the leader and the duplicates waiting on it."""
+    def __init__(self):
+        self.done = threading.Event()
+        self.future = None  # asyncio.Future for the async pipeline
+        self.result = None
+        self.error = None
+        self.abandoned = False  # leader was cancelled before producing a result
+
+
+class IdempotencyCache:
+    def __init__(self, max_entries: int = 4096, ttl_seconds: float = 120):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._completed = OrderedDict()  # key -> (expires_at, result)
+        self._in_flight = {}  # key -> _InFlight
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+        self.replayed = 0
+        self.failed = 0
+        self.abandoned = 0
+
+    @staticmethod
+    def key(token: str, client_message_id):
+        """Returns the idempotency key, or None if the client sent no message id."""
+        if not client_message_id:
+            return None
+        return f"{token}|{client_message_id}"
+
+    def _lookup(self, key: str):
+        """
+        Called with self._lock held.
+        Returns ("replay", result), ("wait", slot) or ("lead", slot).
+        """
+        entry = self._completed.get(key)
+        if entry:
+            if entry[0] > time.time():
+                self._completed.move_to_end(key)
+                self.replayed += 1
+                return "replay", entry[1]
+            del self._completed[key]
+
+        slot = self._in_flight.get(key)
+        if slot is not None:
+            self.coalesced += 1
+            return "wait", slot
+
+        slot = _InFlight()
+        self._in_flight[key] = slot
+        self.executed += 1
+        return "lead", slot
+
+    def _finish(self, key: str, slot: _InFlight, result, error, finished: bool, cacheable):
+        """
+        Releases the key and wakes the duplicates. `finished` is False when
+        the leader neither returned nor raised an Exception (cancelled).
+        """
+        try:
+            with self._lock:
+                self._in_flight.pop(key, None)
+                if error is not None:
+                    self.failed += 1
+                elif not finished:
+                    self.abandoned += 1
+                elif self.max_entries > 0 and cacheable(result):
+                    self._completed[key] = (time.time() + self.ttl_seconds, result)
+                    self._completed.move_to_end(key)
+                    while len(self._completed) > self.max_entries:
+                        self._completed.popitem(last=False)
+        finally:
+            slot.result, slot.error = result, error
+            slot.abandoned = error is None and not finished
+            slot.done.set()
+
+    def _take_over(self):
+        """A duplicate whose leader was abandoned: it runs the turn instead of sharing one."""
+        with self._lock:
+            self.coalesced -= 1
+
+    def run(self, key, fn, cacheable=lambda result: True):
+        """
+        Runs `fn()` once per key. Duplicates block until the leader finishes
+        and get its result (or its exception). `cacheable(result)` decides
+        whether late retries may replay the result.
+        """
+        if key is None:
+            return fn()
+
+        while True:
+            with self._lock:
+                role, value = self._lookup(key)
+            if role == "replay":
+                return value
+            if role == "lead":
+                break
+            value.done.wait()
+            if value.abandoned:
+                self._take_over()
+                continue
+            if value.error is not None:
+                raise value.error
+            return value.result
+
+        result, error, finished = None, None, False
+        try:
+            result = fn()
+            finished = True
+            return result
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._finish(key, value, result, error, finished, cacheable)
+
+    async def arun(self, key, coro_fn, cacheable=lambda result: True):
+        """Async twin of run: duplicates await the leader instead of blocking a thread."""
+        if key is None:
+            return await coro_fn()
+
+        while True:
+            with self._lock:
+                role, value = self._lookup(key)
+                if role == "lead":
+                    value.future = asyncio.get_running_loop().create_future()
+            if role == "replay":
+                return value
+            if role == "lead":
+                break
+            if value.future is None:
+                # Leader is a sync request on the threadpool
+                await asyncio.to_thread(value.done.wait)
+            else:
+                try:
+                    await asyncio.shield(value.future)
+                except Exception:
+                    pass  # re-raised from the slot below
+            if value.abandoned:
+                self._take_over()
+                continue
+            if value.error is not None:
+                raise value.error
+            return value.result
+
+        result, error, finished = None, None, False
+        try:
+            result = await coro_fn()
+            finished = True
+            return result
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            try:
+                self._finish(key, value, result, error, finished, cacheable)
+            finally:
+                if error is not None:
+                    value.future.set_exception(error)
+                    value.future.exception()  # mark retrieved when nobody was waiting
+                else:
+                    value.future.set_result(result)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": len(self._in_flight),
+                "stored": len(self._completed),
+                "executed": self.executed,
+                "coalesced": self.coalesced,
+                "replayed": self.replayed,
+                "failed": self.failed,
+                "abandoned": self.abandoned,
+                "llm_calls_saved": self.coalesced + self.replayed
+            }
+
+
+# Shared instance (Global). Size 0 disables replay of completed turns.
+idempotency_cache = IdempotencyCache(
+    max_entries=int(os.getenv("JARVIS_IDEMPOTENCY_CACHE_SIZE", "4096")),
+    ttl_seconds=float(os.getenv("JARVIS_IDEMPOTENCY_TTL", "120"))
+)
@@ -0,0 +1,137 @@
+"""
+Index bootstrap for all Jarvis collections.
+
+ensure_indexes() is idempotent (create_index is a no-op when the index
+already exists) and runs at startup. check_indexes() runs explain() on each
+hot query and reports any that would still do a COLLSCAN.
+
+    python -m services.indexes            # ensure indexes
+    python -m services.indexes --check    # ensure, then fail on any COLLSCAN
+"""
+import os
+import sys
+from pymongo import ASCENDING, DESCENDING
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+try:
+    from backend.mongo_client import db
+except ImportError:
+    from mongo_client import db
+
+INSIGHT_TTL_SECONDS = int(float(os.getenv("JARVIS_INSIGHT_TTL_DAYS", "7")) * 86400)
+
+# (collection, keys, options)
+INDEX_SPECS = [
+    ("members", [("token", ASCENDING)], {"unique": True, "name": "token_unique"}),
+    # Team rosters for member_directory
+    ("members", [("team_name", ASCENDING)], {"name": "team_name"}),
+    ("member_chat", [("token", ASCENDING)], {"unique": True, "name": "token_unique"}),
+    ("Active_goals", [("token", ASCENDING), ("status", ASCENDING)], {"name": "token_status"}),
+    ("instruction_team", [("target_member_token", ASCENDING), ("active", ASCENDING)], {"name": "target_active"}),
+    ("member_chat_summery", [("token", ASCENDING), ("timestamp", DESCENDING)], {"name": "token_latest"}),
+    # One summary per compacted window (see MemoryService.compact_chat)
+    ("member_chat_summery", [("token", ASCENDING), ("window_seq", ASCENDING)],
+     {"unique": True, "partialFilterExpression": {"window_seq": {"$exists": True}}, "name": "token_window_unique"}),
+    ("manager_chat_summery", [("manager_id", ASCENDING), ("window_seq", ASCENDING)],
+     {"unique": True, "partialFilterExpression": {"window_seq": {"$exists": True}}, "name": "manager_window_unique"}),
+    # Rolling summaries (JARVIS_SUMMARY_MODE=rolling)
+    ("member_summary_rollup", [("token", ASCENDING)], {"unique": True, "name": "token_unique"}),
+    ("member_daily_summary", [("token", ASCENDING), ("day", ASCENDING)], {"unique": True, "name": "token_day_unique"}),
+    ("teams", [("team_name", ASCENDING)], {"name": "team_name"}),
+    # Retrieval index over summaries / insights (services/memory_index.py)
+    ("memory_index", [("team_name", ASCENDING), ("key", ASCENDING)], {"unique": True, "name": "team_key_unique"}),
+    ("memory_index", [("team_name", ASCENDING), ("created_at", ASCENDING)], {"name": "team_created"}),
+    ("memory_index", [("expires_at", ASCENDING)], {"expireAfterSeconds": 0, "name": "memory_ttl"}),
+    # Materialized team status (services/team_status.py)
+    ("team_status", [("team_name", ASCENDING)], {"unique": True, "name": "team_name_unique"}),
+    ("team_status", [("member_tokens", ASCENDING)], {"name": "member_tokens"}),
+    ("manager_chat", [("manager_id", ASCENDING)], {"unique": True, "name": "manager_id_unique"}),
+    # Covers the context loader's insight read
+    ("member_insights", [("token", ASCENDING), ("created_at", DESCENDING), ("insight_text", ASCENDING)],
+     {"name": "token_recent_insights"}),
+    ("member_insights", [("created_at", ASCENDING)],
+     {"expireAfterSeconds": INSIGHT_TTL_SECONDS, "name": "insights_ttl"}),
+]
+
+# Hot queries checked by check_indexes(): (label, collection, filter, sort)
+PROBE = "explain-probe"
+HOT_QUERIES = [
+    ("member by token", "members", {"token": PROBE}, None),
+    ("team roster", "members", {"team_name": PROBE}, None),
+    ("chat by token", "member_chat", {"token": PROBE}, None),
+    ("active goals", "Active_goals", {"token": PROBE, "status": "active"}, None),
+    ("instructions", "instruction_team",
+     {"$or": [{"target_member_token": PROBE}, {"target_member_token": "all"}], "active": True}, None),
+    ("latest summary", "member_chat_summery", {"token": PROBE}, [("timestamp", DESCENDING)]),
+    ("summary rollup", "member_summary_rollup", {"token": PROBE}, None),
+    ("team by name", "teams", {"team_name": PROBE}, None),
+    ("team status", "team_status", {"team_name": PROBE}, None),
+    ("team status by member", "team_status", {"member_tokens": PROBE}, None),
+    ("team memories", "memory_index", {"team_name": PROBE}, [("created_at", DESCENDING)]),
+    ("manager chat", "manager_chat", {"manager_id": "MANAGER_MAIN"}, None),
+    ("recent insights", "member_insights", {"token": PROBE}, [("created_at", DESCENDING)]),
+]
+
+
+def ensure_indexes(database=None) -> list:
+    """
+    Creates every index in INDEX_SPECS. Returns the names of indexes that
+    could not be created (e.g. unique token with existing duplicates).
+    """
+    database = database if database is not None else db
+    if database is None:
+        print("❌ Error: Database not connected. Cannot ensure indexes.")
+        return []
+
+    failed = []
+    for collection, keys, options in INDEX_SPECS:
+        try:
+            database[collection].create_index(keys, **options)
+        except Exception as e:
+            print(f"⚠️ Index {collection}.{options.get('name')} failed: {e}")
+            failed.append(f"{collection}.{options.get('name')}")
+    print(f"[INDEXES] Ensured {len(INDEX_SPECS) - len(failed)}/{len(INDEX_SPECS)} indexes.")
+    return failed
+
+
+def _stages(plan: dict):
+    """Yields every stage name in an explain plan tree."""
+    if not isinstance(plan, dict):
+        return
+    if "stage" in plan:
+        yield plan["stage"]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _stages(child)
+
+
+def check_indexes(database=None) -> list:
+    """
+    Runs explain() on each hot query. Returns the labels of queries whose
+    winning plan contains a COLLSCAN (empty list means all good).
+    """
+    database = database if database is not None else db
+    if database is None:
+        raise Exception("Database not connected")
+
+    collscans = []
+    for label, collection, query, sort in HOT_QUERIES:
+        cursor = database[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+        if "COLLSCAN" in set(_stages(plan)):
+            collscans.append(label)
+            print(f"❌ [INDEXES] COLLSCAN: {label} ({collection})")
+        else:
+            print(f"✅ [INDEXES] {label} ({collection})")
+    return collscans
+
+
+if __name__ == "__main__":
+    ensure_indexes()
+    if "--check" in sys.argv:
+        sys.exit(1 if check_indexes() else 0)
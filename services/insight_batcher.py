@@ -0,0 +1,89 @@
+"""
+Batched insight extraction for the Insight Loop.
+
+Instead of one analyze_behavior LLM call per chat turn, interactions are
+collected for a short window (or until max_batch items) and handed to a
+handler that extracts all insights in one request. At most max_pending
+interactions wait; when the handler falls behind the oldest are dropped.
+"""
+import os
+import time
+import threading
+
+from services.metrics import metrics, log_event
+
+
+class InsightBatcher:
+    def __init__(self, handler, max_batch: int = 16, window_seconds: float = 2.0, max_pending: int = None):
+        self.handler = handler  # called with a list of {"token", "user_message", "ai_response"}
+        self.max_batch = max_batch
+        self.window_seconds = window_seconds
+        self.max_pending = max_pending if max_pending is not None else 10 * max_batch
+        self._items = []
+        self._first_at = None
+        self._cond = threading.Condition()
+        self._thread = None
+        self.submitted = 0
+        self.batches = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def submit(self, token: str, user_message: str, ai_response: str):
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="insight-batcher", daemon=True)
+                self._thread.start()
+            if not self._items:
+                self._first_at = time.monotonic()
+            self._items.append({"token": token, "user_message": user_message, "ai_response": ai_response})
+            self.submitted += 1
+            if len(self._items) > self.max_pending:
+                overflow = len(self._items) - self.max_pending
+                del self._items[:overflow]
+                self.dropped += overflow
+            self._cond.notify()
+
+    def _take_batch(self) -> list:
+        # Waits until the batch is full or the window since its first item has passed
+        with self._cond:
+            while True:
+                if self._items:
+                    remaining = self._first_at + self.window_seconds - time.monotonic()
+                    if len(self._items) >= self.max_batch or remaining <= 0:
+                        batch, self._items = self._items[:self.max_batch], self._items[self.max_batch:]
+                        self._first_at = time.monotonic() if self._items else None
+                        return batch
+                    self._cond.wait(remaining)
+                else:
+                    self._cond.wait()
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            try:
+                with metrics.span("background_insight_batch", size=len(batch)):
+                    self.handler(batch)
+                with self._cond:
+                    self.batches += 1
+            except Exception as e:
+                log_event("insight_batch_dropped", size=len(batch), error=str(e))
+                with self._cond:
+                    self.failed += 1
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "pending": len(self._items),
+                "submitted": self.submitted,
+                "batches": self.batches,
+                "failed": self.failed,
+                "dropped_pending": self.dropped,
+                "max_batch": self.max_batch,
+                "window_seconds": self.window_seconds
+            }
+
+
+INSIGHT_BATCHING = os.getenv("JARVIS_INSIGHT_BATCHING", "1") == "1"
+INSIGHT_BATCH_SIZE = int(os.getenv("JARVIS_INSIGHT_BATCH_SIZE", "16"))
+INSIGHT_BATCH_WINDOW = float(os.getenv("JARVIS_INSIGHT_BATCH_WINDOW", "2.0"))
+INSIGHT_MAX_PENDING = int(os.getenv("JARVIS_INSIGHT_MAX_PENDING", str(10 * INSIGHT_BATCH_SIZE)))
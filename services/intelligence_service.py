@@ -1,51 +1,45 @@
 import os
-from groq import Groq
+import json
 from dotenv import load_dotenv
 
-load_dotenv()
-
-class IntelligenceService:
-    def __init__(self):
-        api_key = os.getenv("GROQ_API_KEY")
-        if not api_key:
-            print("⚠️ WARNING: GROQ_API_KEY not found. AI features will fail.")
-            self.client = None
-        else:
-            self.client = Groq(api_key=api_key)
-            
-    def generate_response(self, user_message: str, context: dict) -> str:
-        """
-        Generates the helpful response for the user.
-        Uses: Hackathon Info + Member Profile + Past Behavior Insights.
-        """
-        if not self.client: return "AI Error: API Key missing."
+from services.llm_client import get_groq_client, get_async_groq_client
+from services.prompt_builder import PromptTemplate, Section, prompt_builder, count_tokens
+from services.metrics import metrics, log_event
+from services.response_cache import response_cache, cache_key
+from services.llm_scheduler import llm_scheduler, INTERACTIVE, BACKGROUND, LLMShedError, is_rate_limited
+from services.memory_index import memory_index, day_summary_key
 
-        member = context["member"]
-        team = context["team"]
-        insights = context["insights"]
-        
-        # Format insights as a bulleted list
-        insights_text = "\n".join([f"- {i}" for i in insights]) if insights else "No prior behavioral data."
-        
-        # Get recent chat history (last 5 messages)
-        recent_history = member.get("chat_history", [])[-5:]
-        history_text = "\n".join([f"{msg['role'].upper()}: {msg['message']}" for msg in recent_history])
+load_dotenv()
 
-        prompt = f"""
+# Prompt templates (parsed once; sections are filled by prompt_builder within the token budget)
+RESPONSE_TEMPLATE = PromptTemplate("""
 You are Jarvis, an elite AI hackathon coordinator.
 
 === CURRENT CONTEXT ===
-User: {member.get('name')} ({member.get('role')})
-Team: {team.get('team_name')}
-Problem Statement: {team.get('problem_statement')}
-Deadline Duration: {team.get('hackathon', {}).get('duration_hours', 24)}h
+User: {name} ({role})
+Team: {team_name}
+Problem Statement: {problem_statement}
+Deadline Duration: {duration_hours}h
+
+=== ACTIVE GOALS ===
+{goals}
+
+=== MANAGER INSTRUCTIONS ===
+{instructions}
+
+=== EARLIER CONVERSATION (SUMMARY) ===
+{latest_summary}
 
 === USER BEHAVIOR & WORK HISTORY ===
 (What the user has been working on recently)
-{insights_text}
+{insights}
+
+=== RELEVANT MEMORIES ===
+(Earlier summaries and insights from the team related to this message)
+{memories}
 
 === RECENT CONVERSATION ===
-{history_text}
+{history}
 
 === NEW MESSAGE ===
 USER: {user_message}
@@ -53,33 +47,12 @@ USER: {user_message}
 === INSTRUCTIONS ===
 1. Respond naturally and helpfully.
 2. Use the 'User Behavior' context to be specific (e.g., if they were debugging earlier, ask if it's fixed).
-3. Keep it concise (max 70 words).
-4. Be motivating but technical.
-"""
-        
-        try:
-            response = self.client.chat.completions.create(
-                model="llama-3.1-8b-instant",
-                messages=[
-                    {"role": "system", "content": "You are Jarvis. Be helpful, concise, and context-aware."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=150
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            print(f"❌ AI Gen Error: {e}")
-            return "I'm having trouble connecting to my brain right now. Please try again."
-
-    def analyze_behavior(self, user_message: str, ai_response: str, context: dict) -> str:
-        """
-        The 'Insight Loop'. Analyzes the specific User Request + AI Response pair.
-        Extracts: What is the user working on? What is their state?
-        """
-        if not self.client: return None
+3. Follow the manager instructions and keep the active goals in mind.
+4. Keep it concise (max 70 words).
+5. Be motivating but technical.
+""")
 
-        prompt = f"""
+ANALYSIS_TEMPLATE = PromptTemplate("""
 Analyze this interaction to extract a 'Behavioral Insight' for the database.
 This insight will be used to understand the user's progress in the next turn.
 
@@ -88,8 +61,8 @@ USER: {user_message}
 AI: {ai_response}
 
 === CONTEXT ===
-Role: {context['member'].get('role')}
-Problem: {context['team'].get('problem_statement')}
+Role: {role}
+Problem: {problem_statement}
 
 === TASK ===
 Summarize the user's current status/work in ONE short sentence.
@@ -100,9 +73,276 @@ Examples:
 - "User is brainstorming UI ideas."
 
 OUTPUT ONLY THE SENTENCE. NO MARKDOWN.
-"""
+""")
+
+SUMMARY_TEMPLATE = PromptTemplate("""
+Summarize this conversation segment for future context.
+Focus on:
+- Key decisions made.
+- Tasks completed or assigned.
+- User preferences or important facts.
+
+=== CONVERSATION ===
+{conversation}
+
+OUTPUT A SINGLE PARAGRAPH SUMMARY.
+""")
+
+# Incremental summaries: the previous summary is folded together with only the new material
+ROLLING_SUMMARY_TEMPLATE = PromptTemplate("""
+Update the running summary of this member's conversation with Jarvis.
+Keep what still matters from the previous summary, add what is new, and drop
+details that have been superseded.
+Focus on:
+- Key decisions made.
+- Tasks completed or assigned.
+- User preferences or important facts.
+
+=== PREVIOUS SUMMARY ===
+{previous_summary}
+
+=== NEW MATERIAL ===
+{new_material}
+
+OUTPUT A SINGLE PARAGRAPH SUMMARY OF AT MOST {max_words} WORDS.
+""")
+ROLLING_SUMMARY_MAX_WORDS = int(os.getenv("JARVIS_ROLLING_SUMMARY_WORDS", "120"))
+
+def team_of(context: dict):
+    return context.get("team", {}).get("team_name")
+
+class IntelligenceService:
+    def __init__(self):
+        if not os.getenv("GROQ_API_KEY"):
+            log_event("config_warning", warning="GROQ_API_KEY not found. AI features will fail.")
+
+    # Shared, pooled clients (see llm_client); created in the app lifespan or on first use
+    @property
+    def client(self):
+        return get_groq_client()
+
+    @property
+    def async_client(self):
+        return get_async_groq_client()
+
+    @staticmethod
+    def _retrieval_query(user_message: str, context: dict) -> dict:
+        """
+        memory_index.search arguments for older material related to this message.
+        What is already in the prompt is skipped, including the day summary
+        embedded in a rolling latest_summary.
+        """
+        summary_day = context.get("summary_day")
+        return {
+            "team_name": team_of(context),
+            "query": user_message,
+            "exclude": [context.get("latest_summary")] + list(context.get("insights", [])),
+            "exclude_keys": [day_summary_key(context["member"].get("token"), summary_day)] if summary_day else []
+        }
+
+    def _retrieve(self, user_message: str, context: dict) -> list:
+        with metrics.span("retrieval"):
+            return memory_index.search(**self._retrieval_query(user_message, context))
+
+    async def _aretrieve(self, user_message: str, context: dict) -> list:
+        """Async twin of _retrieve: a team's first load runs off the event loop."""
+        with metrics.span("retrieval"):
+            return await memory_index.asearch(**self._retrieval_query(user_message, context))
+
+    def _response_messages(self, user_message: str, context: dict, memories: list) -> list:
+        """
+        Builds the chat messages for generate_response / agenerate_response.
+        `memories` are the retrieved related memories (_retrieve / _aretrieve).
+        """
+        member = context["member"]
+        team = context["team"]
+
+        built = prompt_builder.build(
+            RESPONSE_TEMPLATE,
+            fixed={
+                "name": member.get("name"),
+                "role": member.get("role"),
+                "team_name": team.get("team_name"),
+                "problem_statement": team.get("problem_statement"),
+                "duration_hours": team.get("hackathon", {}).get("duration_hours", 24),
+                "user_message": user_message
+            },
+            sections=[
+                Section("goals", [f"- {g}" for g in context.get("active_goals", [])], priority=1,
+                        empty="No active goals."),
+                Section("instructions", [f"- {i}" for i in context.get("instructions", [])], priority=2,
+                        empty="No instructions."),
+                Section("latest_summary", [context.get("latest_summary")], priority=3, truncate=True,
+                        empty="No previous summary."),
+                Section("insights", [f"- {i}" for i in context.get("insights", [])], priority=4, newest_first=True,
+                        empty="No prior behavioral data."),
+                Section("history", [f"{m['role'].upper()}: {m['message']}" for m in context.get("chat_history", [])],
+                        priority=5, newest_first=True, empty="(No previous messages.)"),
+                Section("memories", [f"- ({m['member_name']}, {m['kind']}) {m['text']}" for m in memories],
+                        priority=6, empty="No related memories.")
+            ],
+            name="response"
+        )
+        prompt = built.text
+
+        return [
+            {"role": "system", "content": "You are Jarvis. Be helpful, concise, and context-aware."},
+            {"role": "user", "content": prompt}
+        ]
+
+    def _cache_lookup(self, user_message: str, context: dict, welcome: bool):
+        """
+        Returns (key, cached_reply). key is None for context-sensitive messages,
+        which are never cached; cached_reply is None on a miss.
+        """
+        key = cache_key(user_message, context, welcome)
+        if key is None:
+            response_cache.skip()
+            return None, None
+        return key, response_cache.get(key)
+
+    def generate_response(self, user_message: str, context: dict, welcome: bool = False) -> str:
+        """
+        Generates the helpful response for the user.
+        Uses: Hackathon Info + Member Profile + Past Behavior Insights.
+        """
+        if not self.client: return "AI Error: API Key missing."
+
+        key, cached = self._cache_lookup(user_message, context, welcome)
+        if cached is not None:
+            return cached
+
+        try:
+            # Built before the call: prompt assembly and retrieval are not LLM time, nor redone on a retry
+            messages = self._response_messages(user_message, context, self._retrieve(user_message, context))
+            response = llm_scheduler.call(lambda: self.client.chat.completions.create(
+                model="llama-3.1-8b-instant",
+                messages=messages,
+                temperature=0.7,
+                max_tokens=150
+            ), INTERACTIVE, team_of(context), name="response")
+            reply = response.choices[0].message.content
+            if key:
+                response_cache.put(key, reply)
+            return reply
+        except Exception as e:
+            log_event("llm_response_error", team_name=team_of(context), error=str(e))
+            return "I'm having trouble connecting to my brain right now. Please try again."
+
+    async def agenerate_response(self, user_message: str, context: dict, welcome: bool = False) -> str:
+        """
+        Async twin of generate_response, using the AsyncGroq client.
+        """
+        if not self.async_client: return "AI Error: API Key missing."
+
+        key, cached = self._cache_lookup(user_message, context, welcome)
+        if cached is not None:
+            return cached
+
         try:
-            response = self.client.chat.completions.create(
+            messages = self._response_messages(user_message, context, await self._aretrieve(user_message, context))
+            response = await llm_scheduler.acall(lambda: self.async_client.chat.completions.create(
+                model="llama-3.1-8b-instant",
+                messages=messages,
+                temperature=0.7,
+                max_tokens=150
+            ), INTERACTIVE, team_of(context), name="response")
+            reply = response.choices[0].message.content
+            if key:
+                response_cache.put(key, reply)
+            return reply
+        except Exception as e:
+            log_event("llm_response_error", team_name=team_of(context), error=str(e))
+            return "I'm having trouble connecting to my brain right now. Please try again."
+
+    def stream_response(self, user_message: str, context: dict, welcome: bool = False):
+        """
+        Streaming version of generate_response.
+        Yields text chunks as Groq emits them (stream=True).
+        """
+        if not self.client:
+            yield "AI Error: API Key missing."
+            return
+
+        key, cached = self._cache_lookup(user_message, context, welcome)
+        if cached is not None:
+            yield cached
+            return
+
+        try:
+            messages = self._response_messages(user_message, context, self._retrieve(user_message, context))
+            stream = llm_scheduler.call(lambda: self.client.chat.completions.create(
+                model="llama-3.1-8b-instant",
+                messages=messages,
+                temperature=0.7,
+                max_tokens=150,
+                stream=True
+            ), INTERACTIVE, team_of(context), name="response_stream")
+            parts = []
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    yield delta
+            # Streams carry no usage block; estimate the completion size locally
+            metrics.record_llm_usage("response_stream", None, count_tokens("".join(parts)))
+            if key and parts:
+                response_cache.put(key, "".join(parts))
+        except Exception as e:
+            log_event("llm_stream_error", team_name=team_of(context), error=str(e))
+            yield "I'm having trouble connecting to my brain right now. Please try again."
+
+    async def astream_response(self, user_message: str, context: dict, welcome: bool = False):
+        """
+        Async twin of stream_response, using the AsyncGroq client.
+        """
+        if not self.async_client:
+            yield "AI Error: API Key missing."
+            return
+
+        key, cached = self._cache_lookup(user_message, context, welcome)
+        if cached is not None:
+            yield cached
+            return
+
+        try:
+            messages = self._response_messages(user_message, context, await self._aretrieve(user_message, context))
+            stream = await llm_scheduler.acall(lambda: self.async_client.chat.completions.create(
+                model="llama-3.1-8b-instant",
+                messages=messages,
+                temperature=0.7,
+                max_tokens=150,
+                stream=True
+            ), INTERACTIVE, team_of(context), name="response_stream")
+            parts = []
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    yield delta
+            # Streams carry no usage block; estimate the completion size locally
+            metrics.record_llm_usage("response_stream", None, count_tokens("".join(parts)))
+            if key and parts:
+                response_cache.put(key, "".join(parts))
+        except Exception as e:
+            log_event("llm_stream_error", team_name=team_of(context), error=str(e))
+            yield "I'm having trouble connecting to my brain right now. Please try again."
+
+    def analyze_behavior(self, user_message: str, ai_response: str, context: dict) -> str:
+        """
+        The 'Insight Loop'. Analyzes the specific User Request + AI Response pair.
+        Extracts: What is the user working on? What is their state?
+        """
+        if not self.client: return None
+
+        prompt = ANALYSIS_TEMPLATE.render({
+            "user_message": user_message,
+            "ai_response": ai_response,
+            "role": context['member'].get('role'),
+            "problem_statement": context['team'].get('problem_statement')
+        })
+        try:
+            response = llm_scheduler.call(lambda: self.client.chat.completions.create(
                 model="llama-3.1-8b-instant",
                 messages=[
                     {"role": "system", "content": "Extract user status. brief."},
@@ -110,41 +350,191 @@ OUTPUT ONLY THE SENTENCE. NO MARKDOWN.
                 ],
                 temperature=0.3, # Lower temperature for factual extraction
                 max_tokens=50
-            )
+            ), BACKGROUND, team_of(context), name="analysis")
             return response.choices[0].message.content.strip()
         except Exception as e:
-            print(f"❌ Analysis Error: {e}")
+            log_event("llm_analysis_error", team_name=team_of(context), error=str(e))
             return None
 
-    def summarize_chat(self, messages: list) -> str:
+    def analyze_behavior_batch(self, interactions: list) -> dict:
         """
-        Summarizes a fast-moving chat history into a concise memory.
+        Batched Insight Loop: one structured-output LLM call for many interactions.
+        Each interaction is {"token", "user_message", "ai_response", "context"}.
+        Returns {token: insight}; tokens the model skipped are simply missing.
+        Returns None if the call failed. LLMShedError and 429s propagate, so the
+        caller drops the batch instead of retrying it turn by turn.
         """
-        if not self.client: return "Summary unavailable (No AI)."
+        if not self.client or not interactions: return {}
+
+        # Short ids keep the prompt small and stop the model from mangling tokens
+        by_id = {}
+        blocks = []
+        for interaction in interactions:
+            token = interaction["token"]
+            uid = next((k for k, t in by_id.items() if t == token), None)
+            if uid is None:
+                uid = f"u{len(by_id) + 1}"
+                by_id[uid] = token
+            ctx = interaction["context"]
+            blocks.append(
+                f"[{uid}] Role: {ctx['member'].get('role')} | Problem: {ctx['team'].get('problem_statement')}\n"
+                f"USER: {interaction['user_message']}\n"
+                f"AI: {interaction['ai_response']}"
+            )
+        interactions_text = "\n\n".join(blocks)
 
-        text_block = "\\n".join([f"{m['role']}: {m['message']}" for m in messages])
-        
         prompt = f"""
-        Summarize this conversation segment for future context.
-        Focus on:
-        - Key decisions made.
-        - Tasks completed or assigned.
-        - User preferences or important facts.
-        
-        === CONVERSATION ===
-        {text_block}
-        
-        OUTPUT A SINGLE PARAGRAPH SUMMARY.
+Analyze these interactions to extract one 'Behavioral Insight' per user id for the database.
+Each insight will be used to understand that user's progress in their next turn.
+
+=== INTERACTIONS ===
+{interactions_text}
+
+=== TASK ===
+For each user id, summarize the user's current status/work in ONE short sentence.
+If a user id has several interactions, describe the latest state.
+Examples:
+- "User is implementing the login schema."
+- "User is stuck on a CORS error."
+
+OUTPUT JSON ONLY:
+{{"insights": {{"u1": "sentence", "u2": "sentence"}}}}
+"""
+        try:
+            # Batches span teams, so only the key bucket applies
+            response = llm_scheduler.call(lambda: self.client.chat.completions.create(
+                model="llama-3.1-8b-instant",
+                messages=[
+                    {"role": "system", "content": "Extract user status per id. brief. JSON only."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.3,
+                max_tokens=50 * len(by_id) + 50,
+                response_format={"type": "json_object"}
+            ), BACKGROUND, name="analysis_batch")
+            result = json.loads(response.choices[0].message.content).get("insights", {})
+            return {by_id[uid]: text.strip() for uid, text in result.items()
+                    if uid in by_id and isinstance(text, str) and text.strip()}
+        except LLMShedError:
+            raise
+        except Exception as e:
+            if is_rate_limited(e):
+                raise
+            log_event("llm_analysis_batch_error", interactions=len(interactions), error=str(e))
+            return None
+
+    def generate_welcomes(self, team: dict, members: list) -> dict:
+        """
+        Welcome messages for a freshly registered team in one structured-output call.
+        `team` is the registration ({"team_name", "problem_statement", "duration_hours"}),
+        `members` is [{"token", "name", "role"}]. Returns {token: welcome};
+        members the model skipped are simply missing (they get a live welcome).
+        """
+        if not self.client or not members: return {}
+
+        by_id = {f"m{i + 1}": m["token"] for i, m in enumerate(members)}
+        roster = "\n".join(f"[m{i + 1}] {m['name']} ({m['role']})" for i, m in enumerate(members))
+
+        prompt = f"""
+You are Jarvis, an elite AI hackathon coordinator.
+Write a welcome message for each member of this newly registered team.
+
+=== TEAM ===
+Team: {team.get("team_name")}
+Problem Statement: {team.get("problem_statement")}
+Deadline Duration: {team.get("duration_hours", 24)}h
+
+=== MEMBERS ===
+{roster}
+
+=== TASK ===
+For each member id, WELCOME the member to the team by name, relate the problem
+statement to their role, and suggest a first step.
+Keep each message concise (max 70 words), motivating but technical.
+
+OUTPUT JSON ONLY:
+{{"welcomes": {{"m1": "message", "m2": "message"}}}}
+"""
+        try:
+            response = llm_scheduler.call(lambda: self.client.chat.completions.create(
+                model="llama-3.1-8b-instant",
+                messages=[
+                    {"role": "system", "content": "You are Jarvis. Welcome each member. JSON only."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.7,
+                max_tokens=120 * len(by_id) + 50,
+                response_format={"type": "json_object"}
+            ), BACKGROUND, team.get("team_name"), name="welcome_batch")
+            result = json.loads(response.choices[0].message.content).get("welcomes", {})
+            return {by_id[mid]: text.strip() for mid, text in result.items()
+                    if mid in by_id and isinstance(text, str) and text.strip()}
+        except Exception as e:
+            log_event("llm_welcome_batch_error", team_name=team.get("team_name"), error=str(e))
+            return {}
+
+    def summarize_chat(self, messages: list, team_name: str = None) -> str:
+        """
+        Summarizes a fast-moving chat history into a concise memory.
+        Raises LLMShedError if the scheduler drops the call, so compaction
+        keeps the messages instead of storing a failed summary.
         """
+        if not self.client: return "Summary unavailable (No AI)."
+
+        built = prompt_builder.build(
+            SUMMARY_TEMPLATE,
+            fixed={},
+            sections=[Section("conversation", [f"{m['role']}: {m['message']}" for m in messages], priority=1,
+                                     fit_each=True)],
+            name="summary"
+        )
+        prompt = built.text
         
         try:
-            response = self.client.chat.completions.create(
+            response = llm_scheduler.call(lambda: self.client.chat.completions.create(
                 model="llama-3.1-8b-instant",
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.3,
                 max_tokens=200
-            )
+            ), BACKGROUND, team_name, name="summary")
             return response.choices[0].message.content.strip()
+        except LLMShedError:
+            raise
         except Exception as e:
-            print(f"❌ Summary Error: {e}")
+            log_event("llm_summary_error", team_name=team_name, error=str(e))
             return "Failed to generate summary."
+
+    def fold_summary(self, previous_summary: str, new_material: list, team_name: str = None) -> str:
+        """
+        Incremental summarization: folds `new_material` (lines of chat, or a
+        finished day's summary) into `previous_summary`. Input and output are
+        both bounded, so the cost per call stays constant as history grows.
+        Raises LLMShedError like summarize_chat.
+        """
+        if not self.client: return previous_summary or "Summary unavailable (No AI)."
+
+        built = prompt_builder.build(
+            ROLLING_SUMMARY_TEMPLATE,
+            fixed={"max_words": ROLLING_SUMMARY_MAX_WORDS},
+            sections=[
+                Section("new_material", new_material, priority=1, fit_each=True),
+                Section("previous_summary", [previous_summary], priority=2, truncate=True,
+                        empty="No previous summary.")
+            ],
+            name="rolling_summary"
+        )
+
+        try:
+            response = llm_scheduler.call(lambda: self.client.chat.completions.create(
+                model="llama-3.1-8b-instant",
+                messages=[{"role": "user", "content": built.text}],
+                temperature=0.3,
+                max_tokens=2 * ROLLING_SUMMARY_MAX_WORDS
+            ), BACKGROUND, team_name, name="rolling_summary")
+            return response.choices[0].message.content.strip()
+        except LLMShedError:
+            raise
+        except Exception as e:
+            log_event("llm_rolling_summary_error", team_name=team_name, error=str(e))
+            # Keep the old summary rather than replacing it with an error message
+            return previous_summary or "Failed to generate summary."
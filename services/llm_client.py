@@ -0,0 +1,144 @@
+"""
+Shared Groq clients.
+
+IntelligenceService and every MemorySelector used to build their own Groq
+client, each with its own HTTP connection pool. These getters hand out one
+sync and one async client per process, backed by keep-alive pools
+(optionally HTTP/2) and instrumented for pool-utilization metrics.
+groq and httpx are imported on first use to keep cold starts short.
+"""
+import os
+import threading
+
+LLM_MAX_CONNECTIONS = int(os.getenv("JARVIS_LLM_MAX_CONNECTIONS", "50"))
+LLM_MAX_KEEPALIVE = int(os.getenv("JARVIS_LLM_MAX_KEEPALIVE", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("JARVIS_LLM_KEEPALIVE_EXPIRY", "30"))
+LLM_HTTP2 = os.getenv("JARVIS_LLM_HTTP2", "0") == "1"
+
+
+class PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.errors = 0
+
+    def started(self):
+        with self._lock:
+            self.in_flight += 1
+            self.requests += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def finished(self, failed: bool):
+        with self._lock:
+            self.in_flight -= 1
+            if failed:
+                self.errors += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "max_connections": LLM_MAX_CONNECTIONS,
+                "utilization": round(self.in_flight / LLM_MAX_CONNECTIONS, 4) if LLM_MAX_CONNECTIONS else 0.0,
+                "requests": self.requests,
+                "errors": self.errors
+            }
+
+
+pool_stats = PoolStats()
+
+
+def _http2_enabled() -> bool:
+    if not LLM_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401  (httpx needs it for HTTP/2)
+        return True
+    except ImportError:
+        print("⚠️ JARVIS_LLM_HTTP2=1 but the 'h2' package is not installed. Using HTTP/1.1.")
+        return False
+
+
+def _http_client(is_async: bool):
+    """Keep-alive httpx client whose transport reports to pool_stats."""
+    import httpx
+
+    limits = httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_KEEPALIVE,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY
+    )
+
+    if is_async:
+        class AsyncCountingTransport(httpx.AsyncHTTPTransport):
+            async def handle_async_request(self, request):
+                pool_stats.started()
+                failed = True
+                try:
+                    response = await super().handle_async_request(request)
+                    failed = False
+                    return response
+                finally:
+                    pool_stats.finished(failed)
+
+        return httpx.AsyncClient(transport=AsyncCountingTransport(limits=limits, http2=_http2_enabled()))
+
+    class CountingTransport(httpx.HTTPTransport):
+        def handle_request(self, request):
+            pool_stats.started()
+            failed = True
+            try:
+                response = super().handle_request(request)
+                failed = False
+                return response
+            finally:
+                pool_stats.finished(failed)
+
+    return httpx.Client(transport=CountingTransport(limits=limits, http2=_http2_enabled()))
+
+
+_lock = threading.Lock()
+_client = None
+_async_client = None
+
+
+def get_groq_client():
+    """Shared sync Groq client, or None if GROQ_API_KEY is not set."""
+    global _client
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key:
+        return None
+    with _lock:
+        if _client is None:
+            from groq import Groq
+            # Retries and 429 backoff are handled by llm_scheduler
+            _client = Groq(api_key=api_key, http_client=_http_client(is_async=False), max_retries=0)
+        return _client
+
+
+def get_async_groq_client():
+    """Shared AsyncGroq client, or None if GROQ_API_KEY is not set."""
+    global _async_client
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key:
+        return None
+    with _lock:
+        if _async_client is None:
+            from groq import AsyncGroq
+            _async_client = AsyncGroq(api_key=api_key, http_client=_http_client(is_async=True), max_retries=0)
+        return _async_client
+
+
+async def close_clients():
+    """Closes the shared HTTP pools (FastAPI shutdown)."""
+    global _client, _async_client
+    with _lock:
+        client, async_client = _client, _async_client
+        _client, _async_client = None, None
+    if client is not None:
+        client.close()
+    if async_client is not None:
+        await async_client.close()
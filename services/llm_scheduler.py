@@ -0,0 +1,274 @@
+"""
+LLM call scheduler.
+
+Every Groq call (chat replies, insight extraction, summaries, routing) shares
+one API key. Calls go through here so that:
+- token buckets cap requests per key (JARVIS_LLM_RPM) and per team
+  (JARVIS_LLM_TEAM_RPM). Both are off (0) by default; set them a little
+  below the provider limit of the deployment's Groq plan;
+- interactive calls are admitted ahead of background ones, and background
+  calls leave a reserve of the key budget for users;
+- a 429 pauses the whole key for Retry-After (or exponential backoff with
+  full jitter) before retrying;
+- background calls are shed (LLMShedError) when their queue is too deep
+  or they would wait too long (including a 429 cooldown longer than their
+  max wait).
+The Groq clients are built with max_retries=0 so retries happen only here.
+"""
+import os
+import time
+import random
+import asyncio
+import threading
+
+from services.metrics import metrics
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+# 0 disables a bucket (the default: only 429s from the provider slow us down)
+LLM_RPM = float(os.getenv("JARVIS_LLM_RPM", "0"))
+LLM_TEAM_RPM = float(os.getenv("JARVIS_LLM_TEAM_RPM", "0"))
+# Share of the key bucket that background calls may not use
+BACKGROUND_RESERVE = float(os.getenv("JARVIS_LLM_BACKGROUND_RESERVE", "0.3"))
+MAX_BACKGROUND_QUEUE = int(os.getenv("JARVIS_LLM_MAX_BACKGROUND_QUEUE", "20"))
+MAX_WAIT = {
+    INTERACTIVE: float(os.getenv("JARVIS_LLM_INTERACTIVE_MAX_WAIT", "15")),
+    BACKGROUND: float(os.getenv("JARVIS_LLM_BACKGROUND_MAX_WAIT", "30"))
+}
+MAX_RETRIES = {INTERACTIVE: 2, BACKGROUND: 1}
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 20.0
+POLL_SECONDS = 0.05
+
+
+class LLMShedError(Exception):
+    """A background LLM call was dropped to protect interactive traffic."""
+
+
+class LLMBusyError(Exception):
+    """An interactive LLM call could not be admitted within its max wait."""
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute: float, burst: float = None):
+        self.rate = rate_per_minute / 60.0
+        # Default burst: 10 seconds' worth of requests
+        self.capacity = burst if burst is not None else max(1.0, rate_per_minute / 6.0)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * max(self.rate, 0.0))
+        self._updated = now
+
+    def delay(self, now: float, floor: float = 0.0) -> float:
+        """Seconds until one token is available above `floor` (0 if available now)."""
+        if self.rate <= 0:
+            return 0.0  # rpm <= 0 disables the limit
+        self._refill(now)
+        missing = 1.0 + floor - self.tokens
+        if missing <= 0:
+            return 0.0
+        return missing / self.rate
+
+    def take(self):
+        self.tokens -= 1.0
+
+    def drain(self):
+        self.tokens = min(self.tokens, 0.0)
+
+
+def is_rate_limited(error: Exception) -> bool:
+    return getattr(error, "status_code", None) == 429
+
+
+def retry_after(error: Exception):
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def record_usage(name: str, response):
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        metrics.record_llm_usage(name, getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None))
+
+
+def backoff_delay(attempt: int) -> float:
+    # Full jitter: spreads retries from many workers over the whole window
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+
+class LLMScheduler:
+    def __init__(self, rpm: float = LLM_RPM, team_rpm: float = LLM_TEAM_RPM):
+        self.key_bucket = TokenBucket(rpm)
+        self.team_rpm = team_rpm
+        self._team_buckets = {}
+        self._lock = threading.Lock()
+        self._cooldown_until = 0.0
+        self.waiting = {INTERACTIVE: 0, BACKGROUND: 0}
+        self.peak_waiting = {INTERACTIVE: 0, BACKGROUND: 0}
+        self.admitted = {INTERACTIVE: 0, BACKGROUND: 0}
+        self.shed = 0
+        self.timed_out = 0
+        self.rate_limited = 0
+        self.retries = 0
+
+    def _team_bucket(self, team: str):
+        # Called with self._lock held
+        if not team or self.team_rpm <= 0:
+            return None
+        bucket = self._team_buckets.get(team)
+        if bucket is None:
+            bucket = self._team_buckets[team] = TokenBucket(self.team_rpm)
+        return bucket
+
+    def _try_admit(self, priority: str, team: str, waited: float):
+        """
+        One admission attempt. Returns 0 when admitted, otherwise the delay
+        before the next attempt. Raises LLMShedError / LLMBusyError.
+        """
+        with self._lock:
+            now = time.monotonic()
+            delay = max(0.0, self._cooldown_until - now)
+            if priority == BACKGROUND:
+                # Background calls wait out a 429 cooldown like any other delay (shed below if too long)
+                if not delay and self.waiting[INTERACTIVE]:
+                    delay = POLL_SECONDS
+                floor = self.key_bucket.capacity * BACKGROUND_RESERVE
+            else:
+                floor = 0.0
+
+            team_bucket = self._team_bucket(team)
+            if not delay:
+                delay = max(self.key_bucket.delay(now, floor),
+                            team_bucket.delay(now) if team_bucket else 0.0)
+            if not delay:
+                self.key_bucket.take()
+                if team_bucket:
+                    team_bucket.take()
+                self.admitted[priority] += 1
+                return 0.0
+
+            if waited + delay > MAX_WAIT[priority]:
+                if priority == BACKGROUND:
+                    self.shed += 1
+                    raise LLMShedError(f"background LLM call would wait {waited + delay:.1f}s")
+                self.timed_out += 1
+                raise LLMBusyError(f"LLM busy for {waited + delay:.1f}s")
+            return min(delay, 1.0)
+
+    def _enter(self, priority: str):
+        with self._lock:
+            if priority == BACKGROUND and self.waiting[BACKGROUND] >= MAX_BACKGROUND_QUEUE:
+                self.shed += 1
+                raise LLMShedError("background LLM queue is full")
+            self.waiting[priority] += 1
+            self.peak_waiting[priority] = max(self.peak_waiting[priority], self.waiting[priority])
+
+    def _leave(self, priority: str, waited: float):
+        with self._lock:
+            self.waiting[priority] -= 1
+        metrics.observe(f"llm_wait_{priority}_seconds", waited)
+
+    def acquire(self, priority: str = INTERACTIVE, team: str = None):
+        """Blocks until the call may be sent (sync callers)."""
+        self._enter(priority)
+        started = time.monotonic()
+        try:
+            while True:
+                delay = self._try_admit(priority, team, time.monotonic() - started)
+                if not delay:
+                    return
+                time.sleep(delay)
+        finally:
+            self._leave(priority, time.monotonic() - started)
+
+    async def aacquire(self, priority: str = INTERACTIVE, team: str = None):
+        """Async twin of acquire."""
+        self._enter(priority)
+        started = time.monotonic()
+        try:
+            while True:
+                delay = self._try_admit(priority, team, time.monotonic() - started)
+                if not delay:
+                    return
+                await asyncio.sleep(delay)
+        finally:
+            self._leave(priority, time.monotonic() - started)
+
+    def _on_rate_limited(self, error: Exception, attempt: int) -> float:
+        """Pauses the key after a 429 and returns how long to wait before retrying."""
+        pause = retry_after(error)
+        if pause is None:
+            pause = backoff_delay(attempt)
+        with self._lock:
+            self.rate_limited += 1
+            self._cooldown_until = max(self._cooldown_until, time.monotonic() + pause)
+            self.key_bucket.drain()
+        return pause
+
+    def call(self, fn, priority: str = INTERACTIVE, team: str = None, name: str = "call"):
+        """
+        Runs `fn()` (one Groq request) once admitted, retrying 429s.
+        Other errors, LLMShedError and LLMBusyError propagate to the caller.
+        The request itself is timed as the `llm_<name>` span, and its token
+        usage recorded when the response carries one (not for streams).
+        """
+        attempt = 0
+        while True:
+            self.acquire(priority, team)
+            try:
+                with metrics.span(f"llm_{name}", priority=priority, team=team, attempt=attempt):
+                    result = fn()
+                record_usage(name, result)
+                return result
+            except Exception as e:
+                if not is_rate_limited(e) or attempt >= MAX_RETRIES[priority]:
+                    raise
+                self._on_rate_limited(e, attempt)
+                attempt += 1
+                with self._lock:
+                    self.retries += 1
+
+    async def acall(self, coro_fn, priority: str = INTERACTIVE, team: str = None, name: str = "call"):
+        """Async twin of call; `coro_fn()` returns the awaitable Groq request."""
+        attempt = 0
+        while True:
+            await self.aacquire(priority, team)
+            try:
+                with metrics.span(f"llm_{name}", priority=priority, team=team, attempt=attempt):
+                    result = await coro_fn()
+                record_usage(name, result)
+                return result
+            except Exception as e:
+                if not is_rate_limited(e) or attempt >= MAX_RETRIES[priority]:
+                    raise
+                self._on_rate_limited(e, attempt)
+                attempt += 1
+                with self._lock:
+                    self.retries += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "queue_depth": dict(self.waiting),
+                "peak_queue_depth": dict(self.peak_waiting),
+                "admitted": dict(self.admitted),
+                "shed_background": self.shed,
+                "interactive_timeouts": self.timed_out,
+                "rate_limited": self.rate_limited,
+                "retries": self.retries,
+                "cooldown_seconds": round(max(0.0, self._cooldown_until - now), 3),
+                "key_tokens": round(self.key_bucket.tokens, 2),
+                "teams": len(self._team_buckets)
+            }
+
+
+# Shared instance (Global)
+llm_scheduler = LLMScheduler()
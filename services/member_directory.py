@@ -0,0 +1,93 @@
+"""
+In-memory, team-scoped member directory.
+
+Resolves "target_member_name" from a manager query to a member of one team
+without a regex scan over the whole members collection. Each team roster is
+loaded once with an indexed {team_name} query and refreshed on registration.
+"""
+import os
+import re
+import time
+import difflib
+import threading
+try:
+    from backend.mongo_client import db
+except ImportError:
+    from mongo_client import db
+
+MEMBER_FIELDS = {"_id": 0, "token": 1, "name": 1, "role": 1, "skills": 1}
+
+
+def normalize_name(name: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", (name or "").lower()).split())
+
+
+class TeamRoster:
+    def __init__(self, members: list):
+        self.members = members
+        self.by_name = {}   # normalized full name -> member
+        self.by_first = {}  # normalized first name -> [members]
+        for member in members:
+            full = normalize_name(member.get("name"))
+            if not full:
+                continue
+            self.by_name.setdefault(full, member)
+            self.by_first.setdefault(full.split()[0], []).append(member)
+
+    def resolve(self, name: str, cutoff: float = 0.75):
+        """
+        Exact full name -> unique first name -> unique prefix -> fuzzy match.
+        Returns the member dict, or None when nothing (or more than one member) matches.
+        """
+        query = normalize_name(name)
+        if not query:
+            return None
+        if query in self.by_name:
+            return self.by_name[query]
+        first = self.by_first.get(query.split()[0], [])
+        if len(first) == 1:
+            return first[0]
+        prefixed = [m for full, m in self.by_name.items() if full.startswith(query)]
+        if len(prefixed) == 1:
+            return prefixed[0]
+        close = difflib.get_close_matches(query, list(self.by_name) + list(self.by_first), n=1, cutoff=cutoff)
+        if close:
+            match = close[0]
+            if match in self.by_name:
+                return self.by_name[match]
+            # A shared first name ("Alex Kim" / "Alex Roy") does not pick anyone
+            return self.by_first[match][0] if len(self.by_first[match]) == 1 else None
+        return None
+
+
+class MemberDirectory:
+    def __init__(self, ttl_seconds: float = 300):
+        self.ttl_seconds = ttl_seconds
+        self._rosters = {}  # team_name -> (loaded_at, TeamRoster)
+        self._lock = threading.Lock()
+
+    def roster(self, team_name: str) -> TeamRoster:
+        with self._lock:
+            entry = self._rosters.get(team_name)
+        if entry and entry[0] + self.ttl_seconds > time.monotonic():
+            return entry[1]
+        if db is None:
+            return TeamRoster([])
+        members = list(db.members.find({"team_name": team_name}, MEMBER_FIELDS))
+        return self.refresh_team(team_name, members)
+
+    def refresh_team(self, team_name: str, members: list = None) -> TeamRoster:
+        """Replaces a team's roster (reloading it from Mongo if `members` is not given)."""
+        if members is None:
+            members = list(db.members.find({"team_name": team_name}, MEMBER_FIELDS)) if db is not None else []
+        roster = TeamRoster([{k: m.get(k) for k in ("token", "name", "role", "skills")} for m in members])
+        with self._lock:
+            self._rosters[team_name] = (time.monotonic(), roster)
+        return roster
+
+    def resolve(self, team_name: str, name: str):
+        return self.roster(team_name).resolve(name)
+
+
+# Shared instance (Global)
+member_directory = MemberDirectory(ttl_seconds=float(os.getenv("JARVIS_DIRECTORY_TTL", "300")))
@@ -0,0 +1,229 @@
+"""
+Local retrieval over chat summaries and insights, one index per team.
+
+Texts are turned into hashed TF-IDF vectors (terms hashed with crc32 into
+a fixed number of buckets, so nothing has to be fitted up front) and
+searched with cosine similarity. Pure Python and CPU-only: a team holds a
+few hundred memories, so a search is a few milliseconds.
+
+Memories are added as they are written (summaries, insights) and persisted
+to the `memory_index` collection with their term counts; a team's index is
+loaded from there (newest MAX_MEMORIES_PER_TEAM, one indexed read) the first
+time it is searched in a process. Replacing a memory (same key, e.g. a day
+summary that grows during the day) updates it in place. Persisted memories
+expire through a TTL index on expires_at: insights with member_insights
+(JARVIS_INSIGHT_TTL_DAYS), summaries after JARVIS_MEMORY_TTL_DAYS.
+
+Each team's index has its own lock, so searches of different teams run in
+parallel; the async pipeline uses asearch, which loads a team off the event
+loop.
+"""
+import os
+import re
+import sys
+import math
+import zlib
+import heapq
+import asyncio
+import threading
+from collections import Counter, OrderedDict
+from datetime import datetime, timezone, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+try:
+    from backend.mongo_client import db
+except ImportError:
+    from mongo_client import db
+
+from services.metrics import log_event
+
+RETRIEVAL_ENABLED = os.getenv("JARVIS_RETRIEVAL", "1") == "1"
+RETRIEVAL_TOP_K = int(os.getenv("JARVIS_RETRIEVAL_TOP_K", "3"))
+RETRIEVAL_MIN_SCORE = float(os.getenv("JARVIS_RETRIEVAL_MIN_SCORE", "0.1"))
+HASH_BUCKETS = 1 << 18
+MAX_MEMORIES_PER_TEAM = 2000
+# Same retention as member_insights (services/indexes.py)
+TTL_SECONDS = {
+    "insight": float(os.getenv("JARVIS_INSIGHT_TTL_DAYS", "7")) * 86400,
+    "summary": float(os.getenv("JARVIS_MEMORY_TTL_DAYS", "30")) * 86400
+}
+
+WORD = re.compile(r"[a-z0-9][a-z0-9_+#.-]*")
+STOPWORDS = frozenset("""
+a an and are as at be been but by can could did do does doing for from had has have he her his how i if in
+into is it its just me my no not of on or our she so than that the their them then there these they this
+to up us was we were what when where which who why will with would you your user jarvis ai
+""".split())
+
+
+def day_summary_key(token: str, day: str) -> str:
+    """Key of a member's per-day summary (rolling mode), replaced as the day grows."""
+    return f"{token}:d{day}"
+
+
+def terms(text: str) -> Counter:
+    """Hashed term counts: unigrams plus adjacent bigrams (keeps short phrases like 'login page')."""
+    words = [w.strip(".-") for w in WORD.findall((text or "").lower())]
+    words = [w for w in words if w and w not in STOPWORDS]
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    return Counter(zlib.crc32(g.encode("utf-8")) % HASH_BUCKETS for g in grams)
+
+
+class TeamIndex:
+    """In-memory index of one team's memories (callers hold `lock`)."""
+    def __init__(self):
+        self.memories = OrderedDict()  # key -> memory dict (oldest first)
+        self.df = Counter()            # bucket -> number of memories containing it
+        self.lock = threading.Lock()
+
+    def put(self, memory: dict):
+        old = self.memories.pop(memory["key"], None)
+        if old is not None:
+            self.df.subtract(old["terms"].keys())
+        # Document side is log-tf, normalized once; idf is applied on the query side
+        weights = {b: 1 + math.log(c) for b, c in memory["terms"].items()}
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        memory["vector"] = {b: w / norm for b, w in weights.items()}
+        self.memories[memory["key"]] = memory
+        self.df.update(memory["terms"].keys())
+        while len(self.memories) > MAX_MEMORIES_PER_TEAM:
+            _, dropped = self.memories.popitem(last=False)
+            self.df.subtract(dropped["terms"].keys())
+
+    def _query_vector(self, query: str) -> dict:
+        n = len(self.memories)
+        weights = {b: (1 + math.log(c)) * (math.log((n + 1) / (self.df.get(b, 0) + 1)) + 1)
+                   for b, c in terms(query).items()}
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        return {b: w / norm for b, w in weights.items()}
+
+    def search(self, query: str, k: int, kinds=None, token: str = None, exclude=(), exclude_keys=()) -> list:
+        q = self._query_vector(query)
+        if not q:
+            return []
+        scored = []
+        for memory in self.memories.values():
+            if kinds and memory["kind"] not in kinds:
+                continue
+            if token and memory["token"] != token:
+                continue
+            if memory["text"] in exclude or memory["key"] in exclude_keys:
+                continue
+            vector = memory["vector"]
+            score = sum(w * vector.get(b, 0.0) for b, w in q.items())
+            if score > 0:
+                scored.append((score, memory["key"], memory))
+        return [
+            {"text": m["text"], "kind": m["kind"], "member_name": m.get("member_name"), "token": m["token"],
+             "score": round(score, 4)}
+            for score, _, m in heapq.nlargest(k, scored, key=lambda x: x[0])
+        ]
+
+
+class MemoryIndex:
+    def __init__(self, max_teams: int = 256):
+        self.max_teams = max_teams
+        self._teams = OrderedDict()  # team_name -> TeamIndex
+        self._lock = threading.Lock()
+        self.searches = 0
+        self.loads = 0
+        self.added = 0
+
+    def _team(self, team_name: str) -> TeamIndex:
+        with self._lock:
+            index = self._teams.get(team_name)
+            if index is not None:
+                self._teams.move_to_end(team_name)
+                return index
+
+        # Load outside the lock; a concurrent loader for the same team just wins or loses the race
+        index = TeamIndex()
+        cursor = (db.memory_index.find({"team_name": team_name}, {"_id": 0})
+                  .sort("created_at", -1).limit(MAX_MEMORIES_PER_TEAM))
+        for doc in reversed(list(cursor)):
+            doc["terms"] = Counter({int(b): c for b, c in doc["terms"].items()})
+            index.put(doc)
+
+        with self._lock:
+            self.loads += 1
+            index = self._teams.setdefault(team_name, index)
+            self._teams.move_to_end(team_name)
+            while len(self._teams) > self.max_teams:
+                self._teams.popitem(last=False)
+        return index
+
+    def add(self, team_name: str, key: str, token: str, member_name: str, kind: str, text: str):
+        """Indexes (or replaces) one memory and persists it."""
+        self.add_many(team_name, [{"key": key, "token": token, "member_name": member_name, "kind": kind, "text": text}])
+
+    def add_many(self, team_name: str, items: list):
+        """items: [{"key", "token", "member_name", "kind", "text"}]"""
+        if not RETRIEVAL_ENABLED or not team_name or not items:
+            return
+        from pymongo import ReplaceOne
+
+        now = datetime.now(timezone.utc)
+        memories = [dict(item, team_name=team_name, terms=terms(item["text"]), created_at=now,
+                         expires_at=now + timedelta(seconds=TTL_SECONDS.get(item["kind"], TTL_SECONDS["summary"])))
+                    for item in items if item.get("text")]
+        try:
+            db.memory_index.bulk_write([
+                ReplaceOne({"team_name": team_name, "key": m["key"]},
+                           dict(m, terms={str(b): c for b, c in m["terms"].items()}), upsert=True)
+                for m in memories
+            ], ordered=False)
+        except Exception as e:
+            log_event("memory_index_write_failed", team_name=team_name, error=str(e))
+            return
+
+        with self._lock:
+            self.added += len(memories)
+            # Not loaded yet: the first search will read these back from Mongo
+            index = self._teams.get(team_name)
+        if index is not None:
+            with index.lock:
+                for memory in memories:
+                    index.put(memory)
+
+    def search(self, team_name: str, query: str, k: int = RETRIEVAL_TOP_K, kinds=None, token: str = None,
+               exclude=(), exclude_keys=(), min_score: float = RETRIEVAL_MIN_SCORE) -> list:
+        """
+        Top-k memories of `team_name` most similar to `query`
+        ([{"text", "kind", "member_name", "token", "score"}]).
+        `kinds` / `token` narrow the candidates; memories whose text is in
+        `exclude` or whose key is in `exclude_keys` are skipped.
+        """
+        if not RETRIEVAL_ENABLED or not team_name or not query:
+            return []
+        index = self._team(team_name)
+        with index.lock:
+            hits = index.search(query, k, kinds=kinds, token=token, exclude=set(exclude),
+                                exclude_keys=set(exclude_keys))
+        with self._lock:
+            self.searches += 1
+        return [h for h in hits if h["score"] >= min_score]
+
+    async def asearch(self, team_name: str, query: str, **kwargs) -> list:
+        """Async twin of search: a team that is not loaded yet is read on a worker thread."""
+        if not RETRIEVAL_ENABLED or not team_name or not query:
+            return []
+        with self._lock:
+            loaded = team_name in self._teams
+        if not loaded:
+            await asyncio.to_thread(self._team, team_name)
+        return self.search(team_name, query, **kwargs)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "teams_loaded": len(self._teams),
+                "memories": sum(len(t.memories) for t in self._teams.values()),
+                "loads": self.loads,
+                "searches": self.searches,
+                "added": self.added
+            }
+
+
+# Shared instance (Global)
+memory_index = MemoryIndex()
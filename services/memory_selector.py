@@ -1,28 +1,186 @@
-import os
+import re
 import json
 from datetime import datetime, timezone
-from groq import Groq
 try:
     from backend.mongo_client import db
 except ImportError:
     from mongo_client import db
 
+from services.query_router import query_router
+from services.llm_client import get_groq_client
+from services.llm_scheduler import llm_scheduler, INTERACTIVE, BACKGROUND
+from services.member_directory import member_directory
+from services.team_status import team_status
+from services.memory_index import memory_index
+
 class MemorySelector:
     """
     The 'Brain' of the AI Project Manager.
     Decides which memory collections are relevant for a given query.
     """
     def __init__(self):
-        self.groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+        # Shared, pooled client (see llm_client)
+        self.groq_client = get_groq_client()
 
-    def get_relevant_context(self, user_query: str, current_goal: str = None) -> dict:
+    def get_relevant_context(self, user_query: str, current_goal: str = None, team_name: str = None) -> dict:
         """
         Analyzes the query and fetches relevant data from MongoDB.
+        With `team_name`, every lookup is scoped to that team and member names
+        are resolved in memory against the team roster (member_directory).
         """
         print(f"🧠 [SELECTOR] Analyzing query: {user_query}")
 
-        # 1. LLM Decision: Which collections to query?
-        # We give it the schema summary and ask for a JSON selection.
+        if db is None:
+            return {"error": "Database disconnected"}
+
+        roster = member_directory.roster(team_name) if team_name else None
+        known_names = [m["name"] for m in roster.members] if roster else None
+
+        # 1. Decision: Which collections to query?
+        # Local rules answer the common cases; the LLM is asked only when they are unsure.
+        decision = query_router.route(
+            user_query, lambda: self._ask_llm(user_query, current_goal, team_name, INTERACTIVE),
+            known_names=known_names, team=team_name,
+            shadow_decide=lambda: self._ask_llm(user_query, current_goal, team_name, BACKGROUND)
+        )
+        print(f"🧠 [SELECTOR] Decision: {decision}")
+
+        # Team-scoped questions are served from the materialized team_status doc (one indexed read)
+        if team_name:
+            status = team_status.get(team_name)
+            if status:
+                return self._context_from_status(status, decision, roster, user_query)
+
+        context = {}
+
+        # 2. Execute Queries based on decision
+
+        # Team Details
+        if decision.get("needs_team_details"):
+            team_query = {"team_name": team_name} if team_name else {}
+            team = db.teams.find_one(team_query, sort=[("created_at", -1)])
+            context["team"] = team if team else "No team found."
+
+        # Resolve the targeted member once (in memory when team-scoped)
+        target = decision.get("target_member_name")
+        if not (target and isinstance(target, str) and target.lower() != "null"):
+            target = None
+
+        mem = None
+        if target and roster:
+            mem = roster.resolve(target)
+        elif target:
+            mem = db.members.find_one(
+                {"name": {"$regex": re.escape(target), "$options": "i"}},
+                {"_id": 0, "token": 1, "name": 1, "role": 1, "skills": 1}
+            )
+        team_tokens = [m["token"] for m in roster.members] if roster else None
+
+        # Members (Targeted or All)
+        if decision.get("needs_members"):
+            if target:
+                context["members"] = [mem] if mem else []
+            elif roster:
+                context["members"] = list(roster.members)
+            else:
+                context["members"] = list(db.members.find({}, {"_id": 0, "token": 1, "name": 1, "role": 1, "skills": 1}))
+
+        # Active Goals
+        if decision.get("needs_active_goals"):
+            goal_query = {"status": "active"}
+            if team_tokens is not None:
+                goal_query["token"] = {"$in": team_tokens}
+            goals = list(db.Active_goals.find(goal_query, {"_id": 0, "member_name": 1, "goal_text": 1, "time_start": 1}))
+            context["active_goals"] = goals
+
+        # Chat Logs (Only if specific member targeted, to avoid overflow)
+        if decision.get("needs_chat_logs") and mem:
+            chat = db.member_chat.find_one({"token": mem["token"]}, {"messages": {"$slice": -5}}) # Last 5
+            context["chat_logs"] = chat.get("messages") if chat else []
+
+        # Summaries
+        if decision.get("needs_summaries"):
+            # If target, get theirs. If not, get recent 5 from the team (or anyone).
+            if mem:
+                q = {"token": mem["token"]}
+            elif team_tokens is not None:
+                q = {"token": {"$in": team_tokens}}
+            else:
+                q = {}
+            summaries = list(db.member_chat_summery.find(q, {"_id": 0, "member_name": 1, "summary_text": 1, "timestamp": 1}).sort("timestamp", -1).limit(5))
+            # Rolling mode (the default) keeps one rollup per member instead of per-window docs
+            rollups = list(db.member_summary_rollup.find(q, {"_id": 0, "token": 1, "summary_text": 1, "timestamp": 1}).sort("timestamp", -1).limit(5))
+            if rollups:
+                names = {m["token"]: m["name"] for m in db.members.find(
+                    {"token": {"$in": [r["token"] for r in rollups]}}, {"_id": 0, "token": 1, "name": 1})}
+                summaries += [dict(r, member_name=names.get(r["token"], "Unknown")) for r in rollups]
+            summaries.sort(key=lambda d: d.get("timestamp") or datetime.min, reverse=True)
+            context["summaries"] = [
+                {"member_name": d.get("member_name"), "summary_text": d["summary_text"]} for d in summaries[:5]
+            ]
+
+        return context
+
+    def _context_from_status(self, status: dict, decision: dict, roster, user_query: str = None) -> dict:
+        """
+        Same keys as the per-collection path, built from one team_status doc.
+        Only a targeted member's raw chat log still needs its own read.
+        Summaries are the ones most related to the query (memory_index),
+        falling back to each member's latest.
+        """
+        context = {}
+        members = status.get("members", {})
+
+        target = decision.get("target_member_name")
+        if not (target and isinstance(target, str) and target.lower() != "null"):
+            target = None
+        mem = roster.resolve(target) if target and roster else None
+        if target:
+            selected = {mem["token"]: members[mem["token"]]} if mem and mem["token"] in members else {}
+        else:
+            selected = members
+
+        if decision.get("needs_team_details"):
+            context["team"] = dict(status.get("team", {}), team_name=status["team_name"])
+
+        if decision.get("needs_members"):
+            context["members"] = [
+                {"token": token, "name": m["name"], "role": m["role"], "skills": m.get("skills", []),
+                 "last_active_at": m.get("last_active_at"), "latest_insight": m.get("latest_insight")}
+                for token, m in selected.items()
+            ]
+
+        if decision.get("needs_active_goals"):
+            context["active_goals"] = [
+                {"member_name": m["name"], "goal_text": goal}
+                for m in selected.values() for goal in m.get("active_goals", [])
+            ]
+
+        if decision.get("needs_chat_logs") and mem:
+            chat = db.member_chat.find_one({"token": mem["token"]}, {"messages": {"$slice": -5}}) # Last 5
+            context["chat_logs"] = chat.get("messages") if chat else []
+
+        if decision.get("needs_summaries"):
+            if target and not mem:
+                hits = []
+            else:
+                hits = memory_index.search(status["team_name"], user_query, k=5, kinds=("summary",),
+                                           token=mem["token"] if mem else None)
+            context["summaries"] = [
+                {"member_name": h["member_name"], "summary_text": h["text"]} for h in hits
+            ] or [
+                {"member_name": m["name"], "summary_text": m["latest_summary"]}
+                for m in selected.values() if m.get("latest_summary")
+            ][:5]
+
+        return context
+
+    def _ask_llm(self, user_query: str, current_goal: str, team_name: str, priority: str) -> dict:
+        """
+        LLM routing decision (slow path).
+        We give it the schema summary and ask for a JSON selection; raises on
+        failure (query_router falls back without memoizing).
+        """
         prompt = f"""
         You are the Memory Selector for an AI Project Manager.
         Your job is to decide which database collections are needed to answer the user's query.
@@ -47,63 +205,11 @@ class MemorySelector:
             "needs_summaries": boolean
         }}
         """
-        
-        try:
-            response = self.groq_client.chat.completions.create(
-                model="llama-3.1-8b-instant",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.1,
-                response_format={"type": "json_object"}
-            )
-            decision = json.loads(response.choices[0].message.content)
-            print(f"🧠 [SELECTOR] Decision: {decision}")
-        except Exception as e:
-            print(f"❌ [SELECTOR] Error deciding memory: {e}")
-            # Fallback: Fetch everything if uncertain
-            decision = {
-                "needs_members": True, "needs_active_goals": True, "needs_team_details": True, 
-                "needs_chat_logs": False, "needs_summaries": False, "target_member_name": None
-            }
-
-        context = {}
-
-        # 2. Execute Queries based on decision
-        if db is None:
-            return {"error": "Database disconnected"}
 
-        # Team Details
-        if decision.get("needs_team_details"):
-            team = db.teams.find_one({}, sort=[("created_at", -1)])
-            context["team"] = team if team else "No team found."
-
-        # Members (Targeted or All)
-        target = decision.get("target_member_name")
-        member_query = {}
-        if target and isinstance(target, str) and target.lower() != "null":
-            member_query["name"] = {"$regex": target, "$options": "i"}
-        
-        if decision.get("needs_members"):
-            members = list(db.members.find(member_query, {"_id": 0, "token": 1, "name": 1, "role": 1, "skills": 1}))
-            context["members"] = members
-
-        # Active Goals
-        if decision.get("needs_active_goals"):
-            goals = list(db.Active_goals.find({"status": "active"}, {"_id": 0, "member_name": 1, "goal_text": 1, "time_start": 1}))
-            context["active_goals"] = goals
-
-        # Chat Logs (Only if specific member targeted, to avoid overflow)
-        if decision.get("needs_chat_logs") and target:
-             # Find token first
-             mem = db.members.find_one(member_query)
-             if mem:
-                 chat = db.member_chat.find_one({"token": mem["token"]}, {"messages": {"$slice": -5}}) # Last 5
-                 context["chat_logs"] = chat.get("messages") if chat else []
-
-        # Summaries
-        if decision.get("needs_summaries"):
-             # If target, get theirs. If not, get recent 5 from anyone.
-             q = {"token": mem["token"]} if target and 'mem' in locals() and mem else {}
-             summaries = list(db.member_chat_summery.find(q, {"_id": 0, "member_name": 1, "summary_text": 1}).sort("timestamp", -1).limit(5))
-             context["summaries"] = summaries
-
-        return context
+        response = llm_scheduler.call(lambda: self.groq_client.chat.completions.create(
+            model="llama-3.1-8b-instant",
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.1,
+            response_format={"type": "json_object"}
+        ), priority, team_name, name="routing")
+        return json.loads(response.choices[0].message.content)
@@ -1,4 +1,5 @@
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
+from functools import partial
 import sys
 import os
 
@@ -7,9 +8,110 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 # Conditional import to handle both package and direct execution
 try:
-    from backend.mongo_client import db
+    from backend.mongo_client import db, get_async_db
 except ImportError:
-    from mongo_client import db
+    from mongo_client import db, get_async_db
+
+from services.context_loader import load_user_context, aload_user_context, INSIGHTS_PER_MEMBER
+from services.context_cache import context_cache
+from services.compaction_worker import compaction_worker
+from services.llm_scheduler import LLMShedError
+from services.metrics import metrics, log_event
+from services.team_status import team_status
+from services.memory_index import memory_index, day_summary_key
+
+# Chat compaction: once a member has COMPACTION_THRESHOLD messages,
+# the oldest COMPACTION_WINDOW are summarized and removed.
+COMPACTION_THRESHOLD = 20
+COMPACTION_WINDOW = 10
+
+# pymongo.ReturnDocument.AFTER, without importing pymongo at module load (cold start)
+RETURN_AFTER = True
+
+
+# "rolling": each compaction folds the window into one bounded running summary
+# (plus a per-day rollup). "window": one independent summary doc per window.
+SUMMARY_MODE = os.getenv("JARVIS_SUMMARY_MODE", "rolling")
+
+# A compaction claim expires after this long, so a crashed worker cannot block a chat forever
+COMPACTION_LEASE_SECONDS = int(os.getenv("JARVIS_COMPACTION_LEASE_SECONDS", "120"))
+
+
+def _seq_filter(seq: int) -> dict:
+    # Documents created before compaction_seq existed count as seq 0
+    return {"compaction_seq": seq} if seq else {"compaction_seq": {"$in": [0, None]}}
+
+
+def _claim_oldest_window(collection, key_filter: dict):
+    """
+    Atomically claims the oldest COMPACTION_WINDOW messages of a chat that is
+    over threshold and not already being compacted (a lease field acts as the
+    lock). Returns (compaction_seq, window) or None.
+    """
+    now = datetime.now(timezone.utc)
+    claimed = collection.find_one_and_update(
+        dict(key_filter, **{
+            f"messages.{COMPACTION_THRESHOLD - 1}": {"$exists": True},
+            "$or": [
+                {"compaction_lease_until": None},
+                {"compaction_lease_until": {"$lt": now}}
+            ]
+        }),
+        {"$set": {"compaction_lease_until": now + timedelta(seconds=COMPACTION_LEASE_SECONDS)}},
+        projection={"_id": 0, "compaction_seq": 1, "messages": {"$slice": COMPACTION_WINDOW}},
+        return_document=RETURN_AFTER
+    )
+    if not claimed:
+        return None
+    return claimed.get("compaction_seq") or 0, claimed.get("messages", [])
+
+
+def _trim_claimed_window(collection, key_filter: dict, seq: int) -> bool:
+    """
+    Removes the window claimed at `seq`, bumps compaction_seq, resyncs
+    message_count and releases the lease, in one pipeline update.
+    Appends only ever $push to the end, so nothing newer than the window is
+    touched. Returns False if another worker already trimmed this window.
+    """
+    result = collection.update_one(dict(key_filter, **_seq_filter(seq)), [
+        {"$set": {"messages": {"$slice": [
+            "$messages", COMPACTION_WINDOW, {"$add": [{"$size": "$messages"}, 1]}
+        ]}}},
+        {"$set": {
+            "message_count": {"$size": "$messages"},
+            "compaction_seq": seq + 1,
+            "compaction_lease_until": None
+        }}
+    ])
+    return result.modified_count == 1
+
+
+def _release_lease(collection, key_filter: dict):
+    collection.update_one(key_filter, {"$set": {"compaction_lease_until": None}})
+
+
+def _save_window_summary(collection, doc: dict) -> bool:
+    """
+    Stores a summary keyed by (owner, window_seq). Upserting with
+    $setOnInsert makes retries and racing workers write it at most once.
+    Returns True if this call inserted it.
+    """
+    from pymongo.errors import DuplicateKeyError
+
+    key = {k: doc[k] for k in ("token", "manager_id", "window_seq") if k in doc}
+    try:
+        result = collection.update_one(key, {"$setOnInsert": doc}, upsert=True)
+        return result.upserted_id is not None
+    except DuplicateKeyError:
+        return False
+
+
+def compose_rollup_text(rolling_summary: str, day_summary: str) -> str:
+    """The single summary string the context loader and prompts read."""
+    if rolling_summary and day_summary:
+        return f"{rolling_summary}\nToday: {day_summary}"
+    return rolling_summary or day_summary or "No previous summary."
+
 
 class MemoryService:
     @staticmethod
@@ -22,52 +124,24 @@ class MemoryService:
         4. Active Goals (Active_goals)
         5. Manager Instructions (instruction_team)
         6. Chat Summaries (member_chat_summery)
+
+        All six are fetched in a single aggregation (see context_loader)
+        and kept in the per-token context_cache until a write touches them.
         """
         if db is None:
             raise Exception("Database not connected")
 
-        # 1. Get Member Profile
-        member = db.members.find_one({"token": token})
-        if not member: return None
-        
-        # 2. Get Team
-        team = db.teams.find_one({"team_name": member["team_name"]})
-        if not team: team = {"team_name": "Unknown", "problem_statement": "Unknown"}
-
-        # 3. Get Recent Chat History (Last 10 messages from member_chat)
-        chat_doc = db.member_chat.find_one({"token": token})
-        recent_chat = chat_doc.get("messages", [])[-10:] if chat_doc else []
-
-        # 4. Get Active Goals
-        goals_cursor = db.Active_goals.find({"token": token, "status": "active"})
-        active_goals = [g["goal_text"] for g in goals_cursor]
+        cached = context_cache.get(token)
+        if cached is not None:
+            return cached
 
-        # 5. Get Instructions (Targeted + All)
-        instructions_cursor = db.instruction_team.find({
-            "$or": [
-                {"target_member_token": token},
-                {"target_member_token": "all"}
-            ],
-            "active": True
-        })
-        instructions = [i["instruction_text"] for i in instructions_cursor]
-
-        # 6. Get Latest Summary (Context)
-        summary_doc = db.member_chat_summery.find_one(
-            {"token": token},
-            sort=[("timestamp", -1)]
-        )
-        latest_summary = summary_doc["summary_text"] if summary_doc else "No previous summary."
-
-        return {
-            "member": member,
-            "team": team,
-            "chat_history": recent_chat,
-            "active_goals": active_goals,
-            "instructions": instructions,
-            "latest_summary": latest_summary,
-            "insights": []
-        }
+        # Taken before the load: a write that lands during it keeps this context out of the cache
+        generation = context_cache.generation(token)
+        with metrics.span("db_load_context"):
+            context = load_user_context(db, token)
+        if context:
+            context_cache.put(token, context, generation)
+        return context
 
     @staticmethod
     def append_chat_history(token: str, user_msg: str, ai_msg: str, ai_service=None):
@@ -75,11 +149,11 @@ class MemoryService:
         Appends to member_chat.
         Logic:
         1. Add new messages.
-        2. if total > 20 (10 turns):
-           - Take oldest 10 messages (5 turns).
-           - Summarize them using AI.
-           - Store summary in member_chat_summery.
-           - Remove them from member_chat.
+        2. if total >= 20 (10 turns):
+           - Queue the token on the background compaction worker, which
+             summarizes the oldest 10 messages (5 turns) into
+             member_chat_summery and removes them from member_chat.
+           - The reply is returned right away; no LLM call happens here.
         """
         if db is None: return
 
@@ -90,62 +164,220 @@ class MemoryService:
             {"role": "jarvis", "message": ai_msg, "timestamp": timestamp}
         ]
 
-        # Update member_chat
-        db.member_chat.update_one(
-            {"token": token},
-            {
-                "$push": {"messages": {"$each": entry}},
-                "$set": {"last_updated": timestamp}
-            },
-            upsert=True
-        )
-        
-        # Check for Summarization Trigger
-        chat_doc = db.member_chat.find_one({"token": token})
-        messages = chat_doc.get("messages", [])
-        msg_count = len(messages)
-        
-        # Trigger if we have more than 20 messages (10 turns).
-        # We want to keep the "Last 5" (10 msgs), so we summarize everything before that.
-        if msg_count >= 20 and ai_service:
-            # We want to keep the NEWEST 10 messages (5 turns).
-            # So we summarize the OLDEST (Total - 10) messages.
-            # But the user said "when all new 5 conversations added... summarize that all 5".
-            # So let's extract the FIRST 10 messages (Oldest 5 turns).
-            
-            msgs_to_summarize = messages[:10]
-            msgs_to_keep = messages[10:]
-            
-            MemoryService.generate_and_save_summary(token, msgs_to_summarize, ai_service)
-            
-            # Replace the array with just the kept messages
-            db.member_chat.update_one(
+        # Update member_chat and read back only the tail + counter (single round trip)
+        with metrics.span("db_append_chat"):
+            chat_doc = db.member_chat.find_one_and_update(
                 {"token": token},
-                {"$set": {"messages": msgs_to_keep}}
+                {
+                    "$push": {"messages": {"$each": entry}},
+                    "$inc": {"message_count": len(entry)},
+                    "$set": {"last_updated": timestamp}
+                },
+                projection={"_id": 0, "message_count": 1, "messages": {"$slice": -10}},
+                upsert=True,
+                return_document=RETURN_AFTER
             )
-            print(f"[MEMORY] Cleaned up chat. Kept {len(msgs_to_keep)} messages.")
-            return msgs_to_keep
+        messages = chat_doc.get("messages", [])
+        msg_count = chat_doc.get("message_count", 0)
+        
+        # Trigger if we have 20+ messages (10 turns).
+        # We keep the NEWEST messages and summarize the OLDEST 10 (5 turns) in the background.
+        if msg_count >= COMPACTION_THRESHOLD and ai_service:
+            compaction_worker.submit(token, partial(MemoryService.compact_chat, token, ai_service))
 
         # Return the updated history (last 10 items) for the UI
+        context_cache.update(token, chat_history=messages[-10:])
+        team_status.touch(token, timestamp)
         return messages[-10:]
 
     @staticmethod
-    def generate_and_save_summary(token: str, messages: list, ai_service):
+    async def aget_user_context(token: str):
+        """
+        Async twin of get_user_context (Motor client, same cache).
+        """
+        if db is None:
+            raise Exception("Database not connected")
+
+        cached = context_cache.get(token)
+        if cached is not None:
+            return cached
+
+        # Taken before the load: a write that lands during it keeps this context out of the cache
+        generation = context_cache.generation(token)
+        with metrics.span("db_load_context"):
+            context = await aload_user_context(get_async_db(), token)
+        if context:
+            context_cache.put(token, context, generation)
+        return context
+
+    @staticmethod
+    async def aappend_chat_history(token: str, user_msg: str, ai_msg: str, ai_service=None):
+        """
+        Async twin of append_chat_history (Motor client).
+        Compaction still runs on the background compaction worker.
+        """
+        if db is None: return
+
+        timestamp = datetime.now(timezone.utc)
+
+        entry = [
+            {"role": "user", "message": user_msg, "timestamp": timestamp},
+            {"role": "jarvis", "message": ai_msg, "timestamp": timestamp}
+        ]
+
+        with metrics.span("db_append_chat"):
+            chat_doc = await get_async_db().member_chat.find_one_and_update(
+                {"token": token},
+                {
+                    "$push": {"messages": {"$each": entry}},
+                    "$inc": {"message_count": len(entry)},
+                    "$set": {"last_updated": timestamp}
+                },
+                projection={"_id": 0, "message_count": 1, "messages": {"$slice": -10}},
+                upsert=True,
+                return_document=RETURN_AFTER
+            )
+        messages = chat_doc.get("messages", [])
+
+        if chat_doc.get("message_count", 0) >= COMPACTION_THRESHOLD and ai_service:
+            compaction_worker.submit(token, partial(MemoryService.compact_chat, token, ai_service))
+
+        context_cache.update(token, chat_history=messages)
+        await team_status.atouch(token, timestamp)
+        return messages
+
+    @staticmethod
+    def compact_chat(token: str, ai_service):
+        """
+        Runs on the compaction worker.
+        Safe under parallel appends and parallel workers (other processes too):
+        1. Claim the oldest window with a lease (only one claimant at a time).
+        2. Summarize it and store the summary keyed by compaction_seq (at most once).
+        3. Trim exactly that window, conditional on compaction_seq, and release.
+        Repeats while the chat is still over threshold.
+        """
+        if db is None: return
+
+        while True:
+            claimed = _claim_oldest_window(db.member_chat, {"token": token})
+            if not claimed:
+                return
+            seq, msgs_to_summarize = claimed
+
+            try:
+                MemoryService.generate_and_save_summary(token, msgs_to_summarize, ai_service, window_seq=seq)
+            except LLMShedError as e:
+                # LLM is saturated; keep the messages and retry on a later append
+                _release_lease(db.member_chat, {"token": token})
+                log_event("compaction_deferred", token=token, reason=str(e))
+                return
+
+            if not _trim_claimed_window(db.member_chat, {"token": token}, seq):
+                log_event("compaction_skipped", token=token, window_seq=seq, reason="already compacted elsewhere")
+                return
+            log_event("compaction_done", token=token, window_seq=seq, removed=len(msgs_to_summarize))
+
+    @staticmethod
+    def generate_and_save_summary(token: str, messages: list, ai_service, window_seq: int = None):
         """
         Generates a summary of the provided messages and saves to member_chat_summery.
+        With `window_seq`, the summary is stored at most once per compacted window.
+        In rolling mode, compacted windows are folded into the rollup instead.
         """
-        summary_text = ai_service.summarize_chat(messages)
-        
         member = db.members.find_one({"token": token})
         member_name = member.get("name", "Unknown") if member else "Unknown"
+        team_name = member.get("team_name") if member else None
+
+        if SUMMARY_MODE == "rolling" and window_seq is not None:
+            MemoryService.fold_into_rollup(token, messages, ai_service, window_seq, team_name, member_name)
+            return
 
-        db.member_chat_summery.insert_one({
+        summary_text = ai_service.summarize_chat(messages, team_name=team_name)
+
+        summary_doc = {
             "token": token,
             "member_name": member_name,
             "summary_text": summary_text,
             "timestamp": datetime.now(timezone.utc)
-        })
-        print(f"[MEMORY] Summary Generated for {member_name}")
+        }
+        if window_seq is None:
+            db.member_chat_summery.insert_one(summary_doc)
+        else:
+            summary_doc["window_seq"] = window_seq
+            if not _save_window_summary(db.member_chat_summery, summary_doc):
+                log_event("summary_skipped", token=token, window_seq=window_seq, reason="already saved")
+                return
+        context_cache.update(token, latest_summary=summary_text, summary_day=None)
+        team_status.set_summary(token, summary_text)
+        key = f"{token}:w{window_seq}" if window_seq is not None else f"{token}:s{summary_doc['timestamp'].isoformat()}"
+        memory_index.add(team_name, key, token, member_name, "summary", summary_text)
+        log_event("summary_saved", token=token, window_seq=window_seq)
+
+    @staticmethod
+    def fold_into_rollup(token: str, messages: list, ai_service, window_seq: int, team_name: str = None,
+                         member_name: str = None):
+        """
+        Incremental summary (member_summary_rollup, one doc per member):
+        - day_summary: today's windows, each folded into it as it is compacted
+        - rolling_summary: all earlier days; a finished day is folded in once,
+          on the first compaction of the next day
+        Finished and current days are also kept in member_daily_summary.
+        Every LLM call sees one bounded summary plus one window (or one day),
+        so the cost per compaction stays constant.
+        """
+        from pymongo.errors import DuplicateKeyError
+
+        rollup = db.member_summary_rollup.find_one({"token": token}) or {}
+        if rollup.get("window_seq", -1) >= window_seq:
+            log_event("summary_skipped", token=token, window_seq=window_seq, reason="already folded")
+            return
+
+        rolling = rollup.get("rolling_summary")
+        if not rollup:
+            # Seed from the latest per-window summary written before rolling mode
+            legacy = db.member_chat_summery.find_one({"token": token}, sort=[("timestamp", -1)])
+            rolling = legacy.get("summary_text") if legacy else None
+
+        now = datetime.now(timezone.utc)
+        today = now.date().isoformat()
+        day_summary = rollup.get("day_summary")
+        if rollup.get("day") and rollup["day"] != today and day_summary:
+            rolling = ai_service.fold_summary(rolling, [f"Day {rollup['day']}: {day_summary}"], team_name=team_name)
+            day_summary = None
+
+        lines = [f"{m['role']}: {m['message']}" for m in messages]
+        day_summary = ai_service.fold_summary(day_summary, lines, team_name=team_name)
+        summary_text = compose_rollup_text(rolling, day_summary)
+
+        try:
+            result = db.member_summary_rollup.update_one(
+                {"token": token, "$or": [{"window_seq": {"$lt": window_seq}}, {"window_seq": None}]},
+                {"$set": {
+                    "rolling_summary": rolling,
+                    "day": today,
+                    "day_summary": day_summary,
+                    "summary_text": summary_text,
+                    "window_seq": window_seq,
+                    "timestamp": now
+                }},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            result = None  # another worker folded this window first
+        if result is None or (not result.modified_count and result.upserted_id is None):
+            log_event("summary_skipped", token=token, window_seq=window_seq, reason="already folded")
+            return
+
+        db.member_daily_summary.update_one(
+            {"token": token, "day": today},
+            {"$set": {"summary_text": day_summary, "timestamp": now}, "$inc": {"windows": 1}},
+            upsert=True
+        )
+        context_cache.update(token, latest_summary=summary_text, summary_day=today)
+        team_status.set_summary(token, summary_text)
+        # Retrieval works on per-day summaries (replaced in place as the day grows)
+        memory_index.add(team_name, day_summary_key(token, today), token, member_name, "summary", day_summary)
+        log_event("summary_folded", token=token, window_seq=window_seq)
 
     @staticmethod
     def append_manager_chat_history(user_msg: str, ai_msg: str, ai_service=None):
@@ -173,45 +405,114 @@ class MemoryService:
         # Using a fixed "token" or "id" for manager makes it consistent.
         manager_id = "MANAGER_MAIN"
 
-        db.manager_chat.update_one(
-            {"manager_id": manager_id},
-            {
-                "$push": {"messages": {"$each": entry}},
-                "$set": {"last_updated": timestamp}
-            },
-            upsert=True
-        )
-        
-        # Check for Summarization Trigger
-        chat_doc = db.manager_chat.find_one({"manager_id": manager_id})
-        messages = chat_doc.get("messages", [])
-        msg_count = len(messages)
-        
-        if msg_count >= 20 and ai_service:
-            msgs_to_summarize = messages[:10]
-            msgs_to_keep = messages[10:]
-            
-            # Generate Summary
-            summary_text = ai_service.summarize_chat(msgs_to_summarize)
-            
-            # Save Summary
-            db.manager_chat_summery.insert_one({
-                "manager_id": manager_id,
-                "summary_text": summary_text,
-                "timestamp": datetime.now(timezone.utc)
-            })
-            print(f"[MEMORY] Manager Chat Summarized.")
-            
-            # Cleanup
-            db.manager_chat.update_one(
+        with metrics.span("db_append_manager_chat"):
+            chat_doc = db.manager_chat.find_one_and_update(
                 {"manager_id": manager_id},
-                {"$set": {"messages": msgs_to_keep}}
+                {
+                    "$push": {"messages": {"$each": entry}},
+                    "$inc": {"message_count": len(entry)},
+                    "$set": {"last_updated": timestamp}
+                },
+                projection={"_id": 0, "message_count": 1, "messages": {"$slice": -10}},
+                upsert=True,
+                return_document=RETURN_AFTER
             )
-            return msgs_to_keep
+        messages = chat_doc.get("messages", [])
+        msg_count = chat_doc.get("message_count", 0)
+        
+        # Check for Summarization Trigger (counter only; the array is read just when needed)
+        if msg_count >= COMPACTION_THRESHOLD and ai_service:
+            claimed = _claim_oldest_window(db.manager_chat, {"manager_id": manager_id})
+            if claimed:
+                seq, msgs_to_summarize = claimed
+                
+                # Generate Summary (inline: this one still runs on the request path)
+                try:
+                    with metrics.span("inline_summarization"):
+                        summary_text = ai_service.summarize_chat(msgs_to_summarize)
+                except LLMShedError as e:
+                    summary_text = None
+                    _release_lease(db.manager_chat, {"manager_id": manager_id})
+                    log_event("compaction_deferred", manager_id=manager_id, reason=str(e))
 
-        return messages[-10:]
+                if summary_text is not None:
+                    # Save Summary (at most once per window)
+                    _save_window_summary(db.manager_chat_summery, {
+                        "manager_id": manager_id,
+                        "window_seq": seq,
+                        "summary_text": summary_text,
+                        "timestamp": datetime.now(timezone.utc)
+                    })
+                    log_event("compaction_done", manager_id=manager_id, window_seq=seq, removed=len(msgs_to_summarize))
+                    
+                    # Cleanup
+                    _trim_claimed_window(db.manager_chat, {"manager_id": manager_id}, seq)
+
+        return messages
 
     @staticmethod
     def save_insight(token: str, insight_text: str):
-        # Deprecated or mapped to generic insights if needed
-        pass
+        MemoryService.save_insights({token: insight_text})
+
+    @staticmethod
+    def save_insights(insights: dict):
+        """
+        Saves behavioral insights ({token: insight_text}) to member_insights
+        with one unordered bulk write. The collection is bounded by a TTL index
+        (see services/indexes.py), and the context loader reads the newest few per token.
+        """
+        if db is None or not insights: return
+        from pymongo import InsertOne
+
+        timestamp = datetime.now(timezone.utc)
+        with metrics.span("db_save_insights"):
+            db.member_insights.bulk_write([
+                InsertOne({"token": token, "insight_text": text, "created_at": timestamp})
+                for token, text in insights.items()
+            ], ordered=False)
+
+        for token, text in insights.items():
+            context_cache.append(token, "insights", text, keep=INSIGHTS_PER_MEMBER)
+        team_status.set_insights(insights)
+        MemoryService.index_insights(insights, timestamp)
+
+    @staticmethod
+    def index_insights(insights: dict, timestamp: datetime):
+        """Adds insights to their teams' retrieval indexes (one members read per batch)."""
+        by_team = {}
+        for member in db.members.find({"token": {"$in": list(insights)}}, {"_id": 0, "token": 1, "name": 1, "team_name": 1}):
+            by_team.setdefault(member.get("team_name"), []).append({
+                "key": f"{member['token']}:i{timestamp.isoformat()}",
+                "token": member["token"],
+                "member_name": member.get("name"),
+                "kind": "insight",
+                "text": insights[member["token"]]
+            })
+        for team_name, items in by_team.items():
+            memory_index.add_many(team_name, items)
+
+    @staticmethod
+    def save_welcomes(welcomes: dict):
+        """
+        Stores precomputed welcome messages ({token: text}) on the members'
+        chat docs with one unordered bulk write. Members who already chatted
+        (e.g. got a live welcome before the batch finished) are skipped.
+        The bulk result does not say which docs matched, so cached contexts
+        are only patched when all of them did; otherwise they are invalidated.
+        """
+        if db is None or not welcomes: return
+        from pymongo import UpdateOne
+
+        timestamp = datetime.now(timezone.utc)
+        result = db.member_chat.bulk_write([
+            UpdateOne({"token": token, "message_count": 0},
+                      {"$set": {"welcome_message": text, "welcome_created_at": timestamp}})
+            for token, text in welcomes.items()
+        ], ordered=False)
+
+        all_matched = result.matched_count == len(welcomes)
+        for token, text in welcomes.items():
+            if all_matched:
+                context_cache.update(token, welcome_message=text)
+            else:
+                context_cache.invalidate(token)
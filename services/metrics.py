@@ -0,0 +1,224 @@
+"""
+Lightweight in-process metrics.
+
+Histograms use fixed, Prometheus-style cumulative buckets so they are cheap
+to update on the request path and are exported as-is on /metrics.
+
+Instrumentation:
+- metrics.span("name") times a block into the `name_seconds` histogram
+  (and `name_errors_total` when it raises). With JARVIS_METRICS=0 it
+  returns a shared no-op context manager.
+- request_id_var carries the current request id (set by the HTTP
+  middleware); log_event writes one JSON line per event when
+  JARVIS_JSON_LOGS=1.
+"""
+import os
+import re
+import json
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import nullcontext
+
+METRICS_ENABLED = os.getenv("JARVIS_METRICS", "1") == "1"
+JSON_LOGS = os.getenv("JARVIS_JSON_LOGS", "0") == "1"
+PROMETHEUS_PREFIX = "jarvis_"
+
+# Seconds; covers DB reads (ms) up to slow LLM calls (tens of seconds)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Prompt / completion sizes
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+
+request_id_var = contextvars.ContextVar("request_id", default=None)
+_NO_SPAN = nullcontext()
+
+
+def log_event(event: str, **fields):
+    """One structured log line (JSON when JARVIS_JSON_LOGS=1, else a plain print)."""
+    request_id = request_id_var.get()
+    if JSON_LOGS:
+        record = {"ts": round(time.time(), 3), "event": event}
+        if request_id:
+            record["request_id"] = request_id
+        record.update(fields)
+        print(json.dumps(record, default=str), flush=True)
+    else:
+        details = " ".join(f"{k}={v}" for k, v in fields.items())
+        print(f"[{event}]{f' ({request_id})' if request_id else ''} {details}")
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str = "", buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[idx] += 1
+            self._sum += value
+            self._count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation."""
+        with self._lock:
+            if not self._count:
+                return 0.0
+            rank = q * self._count
+            seen = 0
+            for idx, n in enumerate(self._counts):
+                seen += n
+                if seen >= rank:
+                    return self.buckets[idx] if idx < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def state(self):
+        """(per-bucket counts incl. +Inf, sum, count) for export."""
+        with self._lock:
+            return list(self._counts), self._sum, self._count
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            count, total = self._count, self._sum
+        return {
+            "count": count,
+            "avg": round(total / count, 4) if count else 0.0,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99)
+        }
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str = ""):
+        self.name = name
+        self.help_text = help_text
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+class _Span:
+    __slots__ = ("registry", "name", "fields", "started")
+
+    def __init__(self, registry, name: str, fields: dict):
+        self.registry = registry
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        self.registry.observe(f"{self.name}_seconds", elapsed)
+        if exc_type is not None:
+            self.registry.counter(f"{self.name}_errors_total").inc()
+        if JSON_LOGS:
+            log_event("span", span=self.name, duration_ms=round(elapsed * 1000, 2),
+                      error=exc_type.__name__ if exc_type else None, **self.fields)
+        return False
+
+
+def _prometheus_name(name: str) -> str:
+    return PROMETHEUS_PREFIX + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}  # name -> (help_text, callback)
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, help_text: str = "", buckets=DEFAULT_BUCKETS) -> Histogram:
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = Histogram(name, help_text, buckets)
+            return self._histograms[name]
+
+    def counter(self, name: str, help_text: str = "") -> Counter:
+        with self._lock:
+            if name not in self._counters:
+                self._counters[name] = Counter(name, help_text)
+            return self._counters[name]
+
+    def gauge(self, name: str, callback, help_text: str = ""):
+        """Registers a gauge read at export time (e.g. queue depth from a stats() dict)."""
+        with self._lock:
+            self._gauges[name] = (help_text, callback)
+
+    def observe(self, name: str, value: float):
+        self.histogram(name).observe(value)
+
+    def span(self, name: str, **fields):
+        """Times a block: `with metrics.span("db_load_context"): ...`"""
+        if not METRICS_ENABLED:
+            return _NO_SPAN
+        return _Span(self, name, fields)
+
+    def record_llm_usage(self, name: str, prompt_tokens, completion_tokens):
+        """Token counts for one LLM call (from the API's usage, or estimated for streams)."""
+        if not METRICS_ENABLED:
+            return
+        for kind, tokens in (("prompt", prompt_tokens), ("completion", completion_tokens)):
+            if tokens is None:
+                continue
+            self.histogram(f"llm_{name}_{kind}_tokens", buckets=TOKEN_BUCKETS).observe(tokens)
+            self.counter(f"llm_{kind}_tokens_total").inc(tokens)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            histograms = list(self._histograms.values())
+        return {h.name: h.snapshot() for h in histograms}
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            histograms = list(self._histograms.values())
+            counters = list(self._counters.values())
+            gauges = list(self._gauges.items())
+
+        lines = []
+        for h in histograms:
+            name = _prometheus_name(h.name)
+            counts, total, count = h.state()
+            lines.append(f"# HELP {name} {h.help_text or h.name}")
+            lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, n in zip(list(h.buckets) + ["+Inf"], counts):
+                cumulative += n
+                lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f"{name}_sum {total}")
+            lines.append(f"{name}_count {count}")
+
+        for c in counters:
+            name = _prometheus_name(c.name)
+            lines.append(f"# HELP {name} {c.help_text or c.name}")
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {c.value}")
+
+        for raw_name, (help_text, callback) in gauges:
+            name = _prometheus_name(raw_name)
+            try:
+                value = float(callback())
+            except Exception:
+                continue
+            lines.append(f"# HELP {name} {help_text or raw_name}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+# Shared instance (Global)
+metrics = MetricsRegistry()
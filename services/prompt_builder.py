@@ -0,0 +1,156 @@
+"""
+Prompt assembly with precompiled templates and a token budget.
+
+Templates are parsed once at import time. Context sections (goals,
+instructions, summary, insights, history...) are filled in priority order
+until the token budget is used up, and per-section token usage is reported
+so we can see what drives prompt size (and LLM latency).
+
+Token counts are a local estimate (no tokenizer download, no network):
+roughly one token per short word or punctuation mark, more for long words.
+"""
+import os
+import re
+from string import Formatter
+
+from services.metrics import metrics, TOKEN_BUCKETS
+
+DEFAULT_TOKEN_BUDGET = int(os.getenv("JARVIS_PROMPT_TOKEN_BUDGET", "1200"))
+
+_PIECES = re.compile(r"\w+|[^\w\s]")
+
+
+def count_tokens(text: str) -> int:
+    return sum(1 + len(piece) // 6 for piece in _PIECES.findall(text or ""))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cuts `text` at a word boundary so it fits in `max_tokens` (including the trailing "…")."""
+    words, used = [], 1
+    for word in (text or "").split():
+        cost = count_tokens(word)
+        if used + cost > max_tokens:
+            break
+        words.append(word)
+        used += cost
+    return " ".join(words) + (" …" if len(words) < len((text or "").split()) else "")
+
+
+def _fit_each(items: list, budget: int) -> list:
+    """
+    Caps every item at the same token limit, as high as `budget` allows, so
+    short items stay whole and only the longest ones get cut.
+    """
+    cap, left = None, budget
+    costs = sorted(count_tokens(item) for item in items)
+    for n, cost in enumerate(costs):
+        if cost * (len(costs) - n) > left:
+            cap = left // (len(costs) - n)
+            break
+        left -= cost
+    if cap is None:
+        return list(items)
+    fitted = [item if count_tokens(item) <= cap else truncate_to_tokens(item, cap) for item in items]
+    return [item for item in fitted if item.strip(" …")]
+
+
+class PromptTemplate:
+    """
+    A str.format-style template parsed once into literal/field segments.
+    """
+    def __init__(self, text: str):
+        self.segments = [(literal, field) for literal, field, _, _ in Formatter().parse(text)]
+        self.fields = [field for _, field in self.segments if field]
+        self.literal_tokens = count_tokens("".join(literal for literal, _ in self.segments))
+
+    def render(self, values: dict) -> str:
+        parts = []
+        for literal, field in self.segments:
+            parts.append(literal)
+            if field:
+                parts.append(str(values[field]))
+        return "".join(parts)
+
+
+class Section:
+    """
+    A budgeted block of the prompt.
+    - items: strings, in display order
+    - newest_first: fill from the end of `items` (chat history), else from the start
+    - truncate: if the first item alone does not fit, cut it down instead of dropping it
+    - fit_each: shorten the longest items so every item gets in (summaries), instead of
+      stopping at the first item that does not fit
+    - empty: text used when nothing fits / there are no items
+    """
+    def __init__(self, name: str, items: list, priority: int, newest_first: bool = False,
+                 truncate: bool = False, fit_each: bool = False, empty: str = "None.", joiner: str = "\n"):
+        self.name = name
+        self.items = [i for i in items if i]
+        self.priority = priority
+        self.newest_first = newest_first
+        self.truncate = truncate
+        self.fit_each = fit_each
+        self.empty = empty
+        self.joiner = joiner
+
+
+class BuiltPrompt:
+    def __init__(self, text: str, usage: dict):
+        self.text = text
+        self.usage = usage  # section -> tokens, plus "template" and "fixed"
+        self.total_tokens = sum(usage.values())
+
+
+class PromptBuilder:
+    def __init__(self, token_budget: int = DEFAULT_TOKEN_BUDGET):
+        self.token_budget = token_budget
+
+    def build(self, template: PromptTemplate, fixed: dict, sections: list, name: str = "prompt") -> BuiltPrompt:
+        """
+        Renders `template` with the always-included `fixed` values and the
+        `sections` that fit in the budget (lowest priority number first).
+        """
+        with metrics.span("prompt_build", prompt=name):
+            return self._build(template, fixed, sections, name)
+
+    def _build(self, template: PromptTemplate, fixed: dict, sections: list, name: str) -> BuiltPrompt:
+        usage = {
+            "template": template.literal_tokens,
+            "fixed": sum(count_tokens(str(v)) for v in fixed.values())
+        }
+        remaining = self.token_budget - usage["template"] - usage["fixed"]
+        values = dict(fixed)
+
+        for section in sorted(sections, key=lambda s: s.priority):
+            if section.fit_each:
+                chosen = _fit_each(section.items, remaining)
+                used = sum(count_tokens(item) for item in chosen)
+                values[section.name] = section.joiner.join(chosen) if chosen else section.empty
+                usage[section.name] = used
+                remaining -= used
+                continue
+            chosen, used = [], 0
+            ordered = list(reversed(section.items)) if section.newest_first else section.items
+            for item in ordered:
+                cost = count_tokens(item)
+                if used + cost > remaining:
+                    if not chosen and section.truncate and remaining - used > 8:
+                        item = truncate_to_tokens(item, remaining - used)
+                        chosen.append(item)
+                        used += count_tokens(item)
+                    break
+                chosen.append(item)
+                used += cost
+            if section.newest_first:
+                chosen.reverse()
+            values[section.name] = section.joiner.join(chosen) if chosen else section.empty
+            usage[section.name] = used
+            remaining -= used
+
+        for section_name, tokens in usage.items():
+            metrics.histogram(f"prompt_tokens_{name}_{section_name}", buckets=TOKEN_BUCKETS).observe(tokens)
+        return BuiltPrompt(template.render(values), usage)
+
+
+# Shared instance (Global)
+prompt_builder = PromptBuilder()
@@ -0,0 +1,260 @@
+"""
+Rule-based fast path for MemorySelector routing decisions.
+
+Common manager questions ("who is working on X", "what are the goals",
+"deadline?") are classified locally with keyword rules in microseconds.
+The LLM is only asked when the rules are not confident, and every decision
+is memoized per team and normalized query.
+
+To measure how often the confident rule decisions are right, a sample of
+them (JARVIS_ROUTER_SHADOW_RATE) is also sent to the LLM in the background
+and compared; that is the reported agreement_rate.
+"""
+import os
+import re
+import json
+import time
+import random
+import threading
+from collections import OrderedDict
+
+DECISION_KEYS = ("needs_members", "needs_chat_logs", "needs_active_goals", "needs_team_details", "needs_summaries")
+
+# (pattern, collections it needs)
+ROUTING_RULES = [
+    (re.compile(r"\bwho\b.*\b(working on|doing|assigned|handl\w*|responsible|owns?)\b"),
+     ("needs_members", "needs_active_goals")),
+    (re.compile(r"\b(goals?|tasks?|todos?|to do|working on|doing|up to|progress|status|blocked|stuck)\b"),
+     ("needs_active_goals",)),
+    (re.compile(r"\b(deadline|time left|hours? left|due|ends?|duration|problem statement|project|idea|team name)\b"),
+     ("needs_team_details",)),
+    (re.compile(r"\b(skills?|roles?|members?|who is|who are|email|phone|contact|team)\b"),
+     ("needs_members",)),
+    (re.compile(r"\b(said|say|chat|chats|conversation|talk\w*|messages?|asked)\b"),
+     ("needs_chat_logs",)),
+    (re.compile(r"\b(summary|summaries|summari[sz]e|so far|overall|recap|what happened|history)\b"),
+     ("needs_summaries",)),
+]
+
+# "what is Alice doing", "how is Bob", "Carol's progress", "about Dave"
+NAME_PATTERNS = [
+    re.compile(r"\b(?:is|was|did|does|has|about|for|from|with|ask|tell)\s+([A-Z][a-zA-Z]+)\b"),
+    re.compile(r"\b([A-Z][a-zA-Z]+)'s\b"),
+]
+NOT_NAMES = {"Jarvis", "The", "Team", "What", "Who", "How", "When", "Is", "Are", "Our", "My", "I",
+             "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday",
+             "Today", "Tomorrow", "Tonight", "January", "February", "March", "April", "June", "July",
+             "August", "September", "October", "November", "December"}
+
+CONFIDENT = 0.9
+UNSURE = 0.4
+
+# Used when the LLM routing call fails: fetch everything if uncertain (never memoized)
+FALLBACK_DECISION = {
+    "needs_members": True, "needs_active_goals": True, "needs_team_details": True,
+    "needs_chat_logs": False, "needs_summaries": False, "target_member_name": None
+}
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(re.sub(r"[^\w\s']", " ", query.lower()).split())
+
+
+def _name_like(query: str, start: int) -> bool:
+    """A capitalized word that does not start a sentence ("ask Will", not "Will we...")."""
+    before = query[:start].rstrip()
+    return query[start].isupper() and bool(before) and before[-1] not in ".!?:;\"'("
+
+
+def extract_member_name(query: str, known_names=None):
+    """
+    Finds the member a query is about, as (name, sure). Known names (e.g. a
+    team roster) win, but only count as sure when the query uses them like a
+    name: the full name, a capitalized word mid-sentence, or a NAME_PATTERNS
+    hit. A first name that may just be a word ("will", "Mark the goal...")
+    comes back unsure. Without a roster, falls back to capitalized-word patterns.
+    """
+    pattern_hits = [match.group(1) for pattern in NAME_PATTERNS for match in pattern.finditer(query)
+                    if match.group(1) not in NOT_NAMES]
+    if known_names:
+        lowered = normalize_query(query)
+        unsure = None
+        for name in known_names:
+            first = name.split()[0].lower() if name else ""
+            if not first:
+                continue
+            if " " in name.strip() and re.search(rf"\b{re.escape(normalize_query(name))}\b", lowered):
+                return name, True
+            if any(hit.lower() == first for hit in pattern_hits):
+                return name, True
+            for match in re.finditer(rf"\b{re.escape(first)}\b", query, re.IGNORECASE):
+                if _name_like(query, match.start()):
+                    return name, True
+                unsure = unsure or name
+        if unsure:
+            return unsure, False
+    if pattern_hits:
+        return pattern_hits[0], True
+    return None, False
+
+
+def classify(query: str, known_names=None):
+    """
+    Returns (decision, confidence). Confidence is low when no rule matched,
+    when chat logs are needed but no member could be identified, or when the
+    member name may just be an ordinary word.
+    """
+    normalized = normalize_query(query)
+    decision = {key: False for key in DECISION_KEYS}
+    matched = False
+    for pattern, needs in ROUTING_RULES:
+        if pattern.search(normalized):
+            matched = True
+            for key in needs:
+                decision[key] = True
+
+    target, sure = extract_member_name(query, known_names)
+    decision["target_member_name"] = target
+    if target:
+        decision["needs_members"] = True
+
+    if not matched:
+        return decision, 0.0
+    if decision["needs_chat_logs"] and not target:
+        return decision, UNSURE
+    if target and not sure:
+        return decision, UNSURE
+    return decision, CONFIDENT
+
+
+class QueryRouter:
+    def __init__(self, confidence_threshold: float = 0.8, memo_size: int = 512, log_path: str = None,
+                 shadow_rate: float = 0.0):
+        self.confidence_threshold = confidence_threshold
+        self.memo_size = memo_size
+        self.shadow_rate = shadow_rate
+        self.log_path = log_path  # optional JSONL of LLM decisions, for tuning rules later
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+        self.rule_decisions = 0
+        self.llm_decisions = 0
+        self.llm_failures = 0
+        self.memo_hits = 0
+        self.compared = 0
+        self.agreed = 0
+        self.shadow_compared = 0
+        self.shadow_agreed = 0
+        self.shadow_failed = 0
+        self.llm_seconds = 0.0
+
+    def route(self, query: str, llm_decide, known_names=None, team: str = None, shadow_decide=None) -> dict:
+        """
+        Returns a routing decision for `query`. `llm_decide` is a no-arg
+        callable returning the LLM's decision dict; it is only called when
+        the rules are not confident and the query is not memoized. If it
+        raises, FALLBACK_DECISION is returned and nothing is memoized.
+        Decisions are memoized per `team` (member names resolve against its
+        roster). `shadow_decide` is a no-arg callable used to check sampled
+        rule decisions off the request path; it should raise on failure
+        rather than return a fallback.
+        """
+        key = (team, normalize_query(query))
+        with self._lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                self.memo_hits += 1
+                return dict(self._memo[key])
+
+        decision, confidence = classify(query, known_names)
+        if confidence >= self.confidence_threshold:
+            with self._lock:
+                self.rule_decisions += 1
+            self._remember(key, decision)
+            if shadow_decide and random.random() < self.shadow_rate:
+                threading.Thread(target=self._shadow, args=(decision, shadow_decide),
+                                 name="router-shadow", daemon=True).start()
+            return decision
+
+        started = time.perf_counter()
+        try:
+            llm_decision = llm_decide()
+        except Exception as e:
+            print(f"❌ [ROUTER] LLM routing failed, using fallback: {e}")
+            with self._lock:
+                self.llm_failures += 1
+            return dict(FALLBACK_DECISION)
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            self.llm_decisions += 1
+            self.llm_seconds += elapsed
+            # Agreement of the (unconfident) rule guess with the LLM
+            if confidence > 0:
+                self.compared += 1
+                if self._agrees(decision, llm_decision):
+                    self.agreed += 1
+
+        if self.log_path:
+            self._log(query, llm_decision)
+        self._remember(key, llm_decision)
+        return llm_decision
+
+    @staticmethod
+    def _agrees(rule_decision: dict, llm_decision: dict) -> bool:
+        # Compared on the collection flags
+        return all(bool(llm_decision.get(k)) == rule_decision[k] for k in DECISION_KEYS)
+
+    def _shadow(self, decision: dict, shadow_decide):
+        """Checks one confident rule decision against the LLM (background thread)."""
+        try:
+            llm_decision = shadow_decide()
+        except Exception:
+            with self._lock:
+                self.shadow_failed += 1
+            return
+        with self._lock:
+            self.shadow_compared += 1
+            if self._agrees(decision, llm_decision):
+                self.shadow_agreed += 1
+
+    def _remember(self, key, decision: dict):
+        with self._lock:
+            self._memo[key] = dict(decision)
+            self._memo.move_to_end(key)
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+
+    def _log(self, query: str, decision: dict):
+        try:
+            with open(self.log_path, "a") as f:
+                f.write(json.dumps({"query": query, "decision": decision}) + "\n")
+        except OSError as e:
+            print(f"⚠️ [ROUTER] Could not log decision: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            avg_llm = self.llm_seconds / self.llm_decisions if self.llm_decisions else 0.0
+            return {
+                "rule_decisions": self.rule_decisions,
+                "llm_decisions": self.llm_decisions,
+                "llm_failures": self.llm_failures,
+                "memo_hits": self.memo_hits,
+                # Sampled confident rule decisions that the LLM agreed with
+                "agreement_rate": round(self.shadow_agreed / self.shadow_compared, 4)
+                if self.shadow_compared else None,
+                "shadow_compared": self.shadow_compared,
+                "shadow_failed": self.shadow_failed,
+                # Unconfident rule guesses (sent to the LLM anyway) that it agreed with
+                "unsure_agreement_rate": round(self.agreed / self.compared, 4) if self.compared else None,
+                "avg_llm_routing_ms": round(avg_llm * 1000, 1),
+                # Every rule or memo answer skipped one LLM routing call
+                "estimated_latency_saved_ms": round((self.rule_decisions + self.memo_hits) * avg_llm * 1000, 1)
+            }
+
+
+# Shared instance (Global)
+query_router = QueryRouter(
+    confidence_threshold=float(os.getenv("JARVIS_ROUTER_CONFIDENCE", "0.8")),
+    log_path=os.getenv("JARVIS_ROUTER_LOG"),
+    shadow_rate=float(os.getenv("JARVIS_ROUTER_SHADOW_RATE", "0.05"))
+)
@@ -0,0 +1,147 @@
+"""
+LLM response cache for near-identical chat messages.
+
+Keys are the normalized message plus a fingerprint of the context that
+actually shapes the answer: the member (the prompt carries their name),
+their active goals and manager instructions, team and deadline. Messages
+that depend on the conversation ("fix it", "what did I say earlier",
+anything personal) or on the clock ("how much time is left") are never
+cached. Entries live in a bounded in-memory LRU with TTL and can
+optionally be backed by a local SQLite file (JARVIS_RESPONSE_CACHE_PATH).
+"""
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Words that make a reply depend on the conversation or on the person asking
+CONTEXT_SENSITIVE = re.compile(
+    r"\b(it|that|this|these|those|again|above|previous|earlier|before|last|same|continue|"
+    r"i|i'm|im|me|my|mine|we|our|us|you said|still)\b"
+)
+# The answer changes as the hackathon clock runs
+TIME_SENSITIVE = re.compile(
+    r"\b(deadline|time|left|remaining|hours?|minutes?|now|today|tonight|tomorrow|when|late|soon|due)\b"
+)
+MAX_CACHEABLE_WORDS = 8
+
+
+def normalize_message(message: str) -> str:
+    return " ".join(re.sub(r"[^\w\s']", " ", (message or "").lower()).split())
+
+
+def context_fingerprint(context: dict) -> str:
+    member = context.get("member", {})
+    team = context.get("team", {})
+    parts = [
+        # Per member: replies greet them by name and follow their goals / instructions
+        member.get("token", ""),
+        member.get("name", ""),
+        member.get("role", ""),
+        team.get("team_name", ""),
+        str(team.get("hackathon", {}).get("duration_hours", "")),
+        "\n".join(context.get("active_goals", [])),
+        "\n".join(context.get("instructions", []))
+    ]
+    return "|".join(str(p) for p in parts)
+
+
+def cache_key(message: str, context: dict, welcome: bool = False):
+    """Returns the cache key, or None if this message must not be cached."""
+    normalized = normalize_message(message)
+    if not welcome:
+        if not normalized or len(normalized.split()) > MAX_CACHEABLE_WORDS:
+            return None
+        if CONTEXT_SENSITIVE.search(normalized) or TIME_SENSITIVE.search(normalized):
+            return None
+    raw = f"{'welcome' if welcome else 'chat'}|{normalized}|{context_fingerprint(context)}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 2048, ttl_seconds: float = 3600, disk_path: str = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, response)
+        self._lock = threading.Lock()
+        self._disk = None
+        if disk_path:
+            self._disk = sqlite3.connect(disk_path, check_same_thread=False)
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT, expires_at REAL)"
+            )
+            self._disk.commit()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.skipped = 0
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self._entries[key]
+
+            if self._disk is not None:
+                row = self._disk.execute(
+                    "SELECT response, expires_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row and row[1] > now:
+                    self._store(key, row[0], row[1])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, response: str):
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._store(key, response, expires_at)
+            if self._disk is not None:
+                self._disk.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, expires_at) VALUES (?, ?, ?)",
+                    (key, response, expires_at)
+                )
+                self._disk.commit()
+
+    def _store(self, key: str, response: str, expires_at: float):
+        # Called with self._lock held
+        self._entries[key] = (expires_at, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def skip(self):
+        with self._lock:
+            self.skipped += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "skipped_context_sensitive": self.skipped,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "llm_calls_avoided": self.hits
+            }
+
+
+# Shared instance (Global). Size 0 disables caching.
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("JARVIS_RESPONSE_CACHE_SIZE", "2048")),
+    ttl_seconds=float(os.getenv("JARVIS_RESPONSE_CACHE_TTL", "3600")),
+    disk_path=os.getenv("JARVIS_RESPONSE_CACHE_PATH")
+)
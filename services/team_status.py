@@ -0,0 +1,259 @@
+"""
+Materialized per-team status for manager queries.
+
+One `team_status` document per team holds what MemorySelector used to
+reassemble from teams, members, Active_goals, summaries and insights on
+every manager question:
+
+    {
+        "team_name", "team": {problem_statement, hackathon, ...},
+        "member_tokens": [...],          # multikey index: token -> team
+        "members": {token: {name, role, skills, active_goals, latest_summary,
+                            latest_insight, last_active_at}},
+        "last_active_at", "updated_at"
+    }
+
+It is kept up to date by the write paths (registration, save_memory,
+append_chat_history, summaries, insights) with small targeted updates and
+read with one indexed find_one. A missing document is rebuilt from the
+source collections on first read (or `python -m services.team_status --rebuild`).
+"""
+import os
+import sys
+import time
+import threading
+from datetime import datetime, timezone
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+try:
+    from backend.mongo_client import db, get_async_db
+except ImportError:
+    from mongo_client import db, get_async_db
+
+from services.metrics import log_event
+
+# last_active_at is written at most this often per member (chat is the hot path)
+ACTIVITY_RESOLUTION_SECONDS = float(os.getenv("JARVIS_TEAM_ACTIVITY_RESOLUTION", "60"))
+GOALS_PER_MEMBER = 20
+
+
+def member_entry(member_doc: dict) -> dict:
+    return {
+        "name": member_doc.get("name", ""),
+        "role": member_doc.get("role", "Team Member"),
+        "skills": member_doc.get("skills", []),
+        "active_goals": [],
+        "latest_summary": None,
+        "latest_insight": None,
+        "last_active_at": member_doc.get("last_active_at")
+    }
+
+
+def team_fields(team_doc: dict) -> dict:
+    return {k: v for k, v in team_doc.items() if k not in ("_id", "team_name")}
+
+
+class TeamStatusView:
+    def __init__(self):
+        self._last_touch = {}  # token -> monotonic time of the last last_active_at write
+        self._lock = threading.Lock()
+        self.reads = 0
+        self.rebuilds = 0
+        self.updates = 0
+        self.failed_updates = 0
+
+    def _update(self, filter_doc: dict, update: dict, upsert: bool = False):
+        """Best effort: a failed view update must not fail the write path it rides on."""
+        try:
+            db.team_status.update_one(filter_doc, update, upsert=upsert)
+            with self._lock:
+                self.updates += 1
+        except Exception as e:
+            log_event("team_status_update_failed", error=str(e))
+            with self._lock:
+                self.failed_updates += 1
+
+    # --- write paths ---
+
+    def put_teams(self, team_docs: list, member_docs: list):
+        """Full documents for freshly registered teams (save_teams_bulk)."""
+        if not team_docs:
+            return
+        from pymongo import ReplaceOne
+
+        members_by_team = {}
+        for member in member_docs:
+            members_by_team.setdefault(member["team_name"], []).append(member)
+
+        now = datetime.now(timezone.utc)
+        try:
+            db.team_status.bulk_write([
+                ReplaceOne({"team_name": t["team_name"]},
+                           self.build_doc(t, members_by_team.get(t["team_name"], []), now), upsert=True)
+                for t in team_docs
+            ], ordered=False)
+            with self._lock:
+                self.updates += len(team_docs)
+        except Exception as e:
+            log_event("team_status_update_failed", error=str(e))
+            with self._lock:
+                self.failed_updates += 1
+
+    def upsert_team(self, team_doc: dict):
+        self._update(
+            {"team_name": team_doc["team_name"]},
+            {
+                "$set": {"team": team_fields(team_doc), "updated_at": datetime.now(timezone.utc)},
+                "$setOnInsert": {"members": {}, "member_tokens": [], "last_active_at": None}
+            },
+            upsert=True
+        )
+
+    def add_member(self, member_doc: dict):
+        token = member_doc["token"]
+        self._update(
+            {"team_name": member_doc["team_name"]},
+            {
+                "$set": {f"members.{token}": member_entry(member_doc), "updated_at": datetime.now(timezone.utc)},
+                "$addToSet": {"member_tokens": token}
+            },
+            upsert=True
+        )
+
+    def add_goal(self, token: str, goal_text: str):
+        self._update(
+            {"member_tokens": token},
+            {
+                "$push": {f"members.{token}.active_goals": {"$each": [goal_text], "$slice": -GOALS_PER_MEMBER}},
+                "$set": {"updated_at": datetime.now(timezone.utc)}
+            }
+        )
+
+    def set_summary(self, token: str, summary_text: str):
+        self._update({"member_tokens": token}, {"$set": {
+            f"members.{token}.latest_summary": summary_text,
+            "updated_at": datetime.now(timezone.utc)
+        }})
+
+    def set_insights(self, insights: dict):
+        """{token: insight_text} from one insight batch."""
+        if not insights:
+            return
+        from pymongo import UpdateOne
+
+        now = datetime.now(timezone.utc)
+        try:
+            db.team_status.bulk_write([
+                UpdateOne({"member_tokens": token},
+                          {"$set": {f"members.{token}.latest_insight": text, "updated_at": now}})
+                for token, text in insights.items()
+            ], ordered=False)
+            with self._lock:
+                self.updates += len(insights)
+        except Exception as e:
+            log_event("team_status_update_failed", error=str(e))
+            with self._lock:
+                self.failed_updates += 1
+
+    def _activity_update(self, token: str, timestamp: datetime):
+        """Returns the last_active_at update, or None if this member was touched recently."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_touch.get(token, float("-inf")) < ACTIVITY_RESOLUTION_SECONDS:
+                return None
+            self._last_touch[token] = now
+        return {"$set": {f"members.{token}.last_active_at": timestamp, "last_active_at": timestamp}}
+
+    def touch(self, token: str, timestamp: datetime):
+        """Records chat activity (append_chat_history)."""
+        update = self._activity_update(token, timestamp)
+        if update is not None:
+            self._update({"member_tokens": token}, update)
+
+    async def atouch(self, token: str, timestamp: datetime):
+        """Async twin of touch (Motor client)."""
+        update = self._activity_update(token, timestamp)
+        if update is None:
+            return
+        try:
+            await get_async_db().team_status.update_one({"member_tokens": token}, update)
+            with self._lock:
+                self.updates += 1
+        except Exception as e:
+            log_event("team_status_update_failed", error=str(e))
+            with self._lock:
+                self.failed_updates += 1
+
+    # --- read path ---
+
+    def get(self, team_name: str):
+        """The team's status document (one indexed read), rebuilt if missing."""
+        with self._lock:
+            self.reads += 1
+        doc = db.team_status.find_one({"team_name": team_name}, {"_id": 0})
+        if doc is None:
+            doc = self.rebuild(team_name)
+        return doc
+
+    @staticmethod
+    def build_doc(team_doc: dict, member_docs: list, now: datetime) -> dict:
+        members = {m["token"]: member_entry(m) for m in member_docs}
+        activity = [m["last_active_at"] for m in members.values() if m["last_active_at"]]
+        return {
+            "team_name": team_doc["team_name"],
+            "team": team_fields(team_doc),
+            "member_tokens": list(members),
+            "members": members,
+            "last_active_at": max(activity) if activity else None,
+            "updated_at": now
+        }
+
+    def rebuild(self, team_name: str):
+        """Assembles the document from the source collections (backfill / repair)."""
+        team_doc = db.teams.find_one({"team_name": team_name}, sort=[("created_at", -1)])
+        member_docs = list(db.members.find({"team_name": team_name}))
+        if team_doc is None and not member_docs:
+            return None
+
+        doc = self.build_doc(team_doc or {"team_name": team_name}, member_docs, datetime.now(timezone.utc))
+        tokens = doc["member_tokens"]
+        for goal in db.Active_goals.find({"token": {"$in": tokens}, "status": "active"}, {"token": 1, "goal_text": 1}):
+            doc["members"][goal["token"]]["active_goals"].append(goal["goal_text"])
+        for token, member in doc["members"].items():
+            member["active_goals"] = member["active_goals"][-GOALS_PER_MEMBER:]
+            summary = (db.member_summary_rollup.find_one({"token": token}, {"summary_text": 1})
+                       or db.member_chat_summery.find_one({"token": token}, {"summary_text": 1},
+                                                          sort=[("timestamp", -1)]))
+            insight = db.member_insights.find_one({"token": token}, {"insight_text": 1}, sort=[("created_at", -1)])
+            member["latest_summary"] = summary.get("summary_text") if summary else None
+            member["latest_insight"] = insight.get("insight_text") if insight else None
+
+        db.team_status.replace_one({"team_name": team_name}, doc, upsert=True)
+        with self._lock:
+            self.rebuilds += 1
+        doc.pop("_id", None)
+        return doc
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "reads": self.reads,
+                "rebuilds": self.rebuilds,
+                "updates": self.updates,
+                "failed_updates": self.failed_updates
+            }
+
+
+# Shared instance (Global)
+team_status = TeamStatusView()
+
+
+if __name__ == "__main__":
+    if "--rebuild" in sys.argv:
+        names = db.teams.distinct("team_name")
+        for name in names:
+            team_status.rebuild(name)
+        print(f"Rebuilt team_status for {len(names)} teams.")
+    else:
+        print("Usage: python -m services.team_status --rebuild")
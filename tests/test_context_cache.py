@@ -0,0 +1,117 @@
+"""
+Context cache consistency: instruction writes must never be served stale.
+
+Mongo is replaced by an in-memory instruction_team collection and the
+context loader by a function reading from it, so these run without a server:
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import memory_store
+from services import memory_service
+from services.context_cache import ContextCache, context_cache
+from services.memory_service import MemoryService
+
+TOKEN = "member-token"
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = []
+
+    def insert_one(self, doc):
+        self.docs.append(dict(doc))
+        return mock.Mock(inserted_id=len(self.docs))
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.instruction_team = FakeCollection()
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
+class InstructionConsistencyTest(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeDatabase()
+        self.on_load = None  # runs in the middle of a load, after the snapshot is read
+        patches = [
+            mock.patch.object(memory_service, "db", self.db),
+            mock.patch.object(memory_store, "db", self.db),
+            mock.patch.object(memory_service, "load_user_context", self.load_user_context)
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        context_cache.clear()
+        self.addCleanup(context_cache.clear)
+
+    def load_user_context(self, db, token):
+        instructions = [d["instruction_text"] for d in db.instruction_team.docs
+                        if d["target_member_token"] in (token, "all") and d["active"]]
+        if self.on_load:
+            on_load, self.on_load = self.on_load, None
+            on_load()
+        return {"member": {"token": token, "team_name": "Team"}, "team": {"team_name": "Team"},
+                "instructions": instructions}
+
+    def instruct(self, text, target=TOKEN):
+        memory_store.save_memory("Team", "INSTRUCTION", {
+            "manager_token": "manager", "target_member_token": target, "instruction_text": text
+        })
+
+    def test_targeted_instruction_is_visible_after_write(self):
+        self.assertEqual(MemoryService.get_user_context(TOKEN)["instructions"], [])
+        self.instruct("Ship the demo")
+        self.assertEqual(MemoryService.get_user_context(TOKEN)["instructions"], ["Ship the demo"])
+
+    def test_team_wide_instruction_is_visible_after_write(self):
+        MemoryService.get_user_context(TOKEN)
+        self.instruct("Freeze features", target="all")
+        self.assertEqual(MemoryService.get_user_context(TOKEN)["instructions"], ["Freeze features"])
+
+    def test_write_during_load_is_not_overwritten_by_the_load(self):
+        # The reader snapshots Mongo, then the instruction lands before it caches its result
+        self.on_load = lambda: self.instruct("Ship the demo")
+        self.assertEqual(MemoryService.get_user_context(TOKEN)["instructions"], [])
+        self.assertEqual(MemoryService.get_user_context(TOKEN)["instructions"], ["Ship the demo"])
+
+    def test_team_wide_write_during_load_is_not_overwritten_by_the_load(self):
+        self.on_load = lambda: self.instruct("Freeze features", target="all")
+        MemoryService.get_user_context(TOKEN)
+        self.assertEqual(MemoryService.get_user_context(TOKEN)["instructions"], ["Freeze features"])
+
+
+class ContextCacheGenerationTest(unittest.TestCase):
+    def test_put_after_invalidate_is_dropped(self):
+        cache = ContextCache()
+        generation = cache.generation(TOKEN)
+        cache.invalidate(TOKEN)
+        cache.put(TOKEN, {"member": {}}, generation)
+        self.assertIsNone(cache.get(TOKEN))
+        self.assertEqual(cache.stats()["stale_puts"], 1)
+
+    def test_put_after_write_through_is_dropped(self):
+        cache = ContextCache()
+        generation = cache.generation(TOKEN)
+        cache.append(TOKEN, "insights", "new insight", keep=5)
+        cache.put(TOKEN, {"member": {}, "insights": []}, generation)
+        self.assertIsNone(cache.get(TOKEN))
+
+    def test_put_without_intervening_write_is_stored(self):
+        cache = ContextCache()
+        generation = cache.generation(TOKEN)
+        cache.invalidate("someone-else")
+        cache.put(TOKEN, {"member": {}}, generation)
+        self.assertEqual(cache.get(TOKEN), {"member": {}})
+
+
+if __name__ == "__main__":
+    unittest.main()
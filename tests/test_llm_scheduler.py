@@ -0,0 +1,105 @@
+"""
+LLM scheduler: interactive calls go first, background calls are shed rather
+than queued forever, and a 429's Retry-After is waited out before retrying.
+
+The Groq request is replaced by plain callables (raising a 429-shaped error
+where needed), so these run without network access:
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from services import llm_scheduler as scheduler_module
+from services.llm_scheduler import BACKGROUND, INTERACTIVE, LLMScheduler, LLMShedError, TokenBucket
+
+
+class RateLimitError(Exception):
+    """Shaped like the Groq SDK's 429 error."""
+    status_code = 429
+
+    def __init__(self, retry_after=None):
+        super().__init__("rate limited")
+        headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+        self.response = SimpleNamespace(headers=headers)
+
+
+class AdmissionOrderTest(unittest.TestCase):
+    def test_interactive_is_admitted_ahead_of_waiting_background(self):
+        scheduler = LLMScheduler(rpm=0)
+        scheduler.key_bucket = TokenBucket(600, burst=10)  # 10 tokens/s
+        scheduler.key_bucket.tokens = 0.0
+        order = []
+
+        def run(priority):
+            scheduler.call(lambda: order.append(priority), priority, name="test")
+
+        background = threading.Thread(target=run, args=(BACKGROUND,))
+        background.start()
+        time.sleep(0.02)  # the background call is queued first
+        interactive = threading.Thread(target=run, args=(INTERACTIVE,))
+        interactive.start()
+        background.join(5)
+        interactive.join(5)
+
+        self.assertEqual(order, [INTERACTIVE, BACKGROUND])
+
+
+class SheddingTest(unittest.TestCase):
+    def test_background_is_shed_when_queue_is_full(self):
+        scheduler = LLMScheduler(rpm=0)
+        with mock.patch.object(scheduler_module, "MAX_BACKGROUND_QUEUE", 0):
+            with self.assertRaises(LLMShedError):
+                scheduler.call(lambda: "never sent", BACKGROUND, name="test")
+        self.assertEqual(scheduler.stats()["shed_background"], 1)
+
+    def test_background_is_shed_when_cooldown_exceeds_its_max_wait(self):
+        scheduler = LLMScheduler(rpm=0)
+        calls = []
+
+        def limited():
+            calls.append(time.monotonic())
+            raise RateLimitError(retry_after=5)
+
+        max_wait = {INTERACTIVE: 15.0, BACKGROUND: 0.2}
+        with mock.patch.object(scheduler_module, "MAX_WAIT", max_wait):
+            started = time.monotonic()
+            with self.assertRaises(LLMShedError):
+                scheduler.call(limited, BACKGROUND, name="test")
+        self.assertEqual(len(calls), 1)
+        self.assertLess(time.monotonic() - started, 1.0)  # shed at once, not after the 5s cooldown
+
+
+class RetryAfterTest(unittest.TestCase):
+    def test_retry_waits_for_retry_after(self):
+        scheduler = LLMScheduler(rpm=0)
+        calls = []
+
+        def flaky():
+            calls.append(time.monotonic())
+            if len(calls) == 1:
+                raise RateLimitError(retry_after=0.3)
+            return "ok"
+
+        self.assertEqual(scheduler.call(flaky, INTERACTIVE, name="test"), "ok")
+        self.assertEqual(len(calls), 2)
+        self.assertGreaterEqual(calls[1] - calls[0], 0.3)
+        stats = scheduler.stats()
+        self.assertEqual((stats["rate_limited"], stats["retries"]), (1, 1))
+
+    def test_gives_up_after_max_retries(self):
+        scheduler = LLMScheduler(rpm=0)
+        with mock.patch.object(scheduler_module, "MAX_RETRIES", {INTERACTIVE: 1, BACKGROUND: 0}):
+            with self.assertRaises(RateLimitError):
+                scheduler.call(mock.Mock(side_effect=RateLimitError(retry_after=0)), INTERACTIVE, name="test")
+
+
+if __name__ == "__main__":
+    unittest.main()
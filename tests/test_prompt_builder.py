@@ -0,0 +1,41 @@
+"""
+Prompt budgeting for summaries: one oversized message must not push the
+messages after it out of the prompt.
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from services.prompt_builder import PromptBuilder, PromptTemplate, Section, count_tokens
+
+TEMPLATE = PromptTemplate("Summarize:\n{conversation}")
+
+
+class FitEachTest(unittest.TestCase):
+    def build(self, items, budget=200):
+        return PromptBuilder(budget).build(TEMPLATE, {}, [Section("conversation", items, priority=1, fit_each=True)])
+
+    def test_messages_after_a_long_one_are_kept(self):
+        items = ["q1", "a1", "word " * 2000, "a2", "q3 important decision", "a3"]
+        built = self.build(items)
+        for item in ["q1", "a1", "a2", "q3 important decision", "a3"]:
+            self.assertIn(f"\n{item}", built.text)
+        self.assertLessEqual(built.total_tokens, 200)
+
+    def test_only_the_longest_items_are_cut(self):
+        long_a, long_b = "alpha " * 300, "beta " * 300
+        built = self.build(["short", long_a, long_b])
+        self.assertIn("\nshort\n", built.text)
+        self.assertEqual(built.text.count("…"), 2)
+        self.assertLessEqual(built.usage["conversation"], 200 - count_tokens("Summarize:"))
+
+    def test_items_that_fit_are_untouched(self):
+        self.assertEqual(self.build(["a", "b"]).text, "Summarize:\na\nb")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+"""
+Rule routing: roster first names that are also ordinary words must not be
+routed confidently, and failed LLM decisions must not be memoized.
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from services.query_router import CONFIDENT, FALLBACK_DECISION, QueryRouter, classify
+
+ROSTER = ["Will Smith", "Mark Chen", "Alice Wong"]
+
+
+class NameExtractionTest(unittest.TestCase):
+    def test_common_words_are_not_confident_names(self):
+        for query in ["What will the team ship by the deadline?", "Mark the login goal as done"]:
+            _, confidence = classify(query, ROSTER)
+            self.assertLess(confidence, CONFIDENT, query)
+
+    def test_calendar_words_are_not_names(self):
+        decision, _ = classify("What is the deadline for Friday?")
+        self.assertIsNone(decision["target_member_name"])
+
+    def test_name_used_as_a_name_is_confident(self):
+        for query in ["How is Will doing?", "What is Alice doing?", "What did Mark Chen say?"]:
+            decision, confidence = classify(query, ROSTER)
+            self.assertEqual(confidence, CONFIDENT, query)
+            self.assertIn(decision["target_member_name"], ROSTER)
+
+
+class FallbackTest(unittest.TestCase):
+    def test_failed_llm_decision_is_not_memoized(self):
+        router = QueryRouter()
+
+        def fail():
+            raise RuntimeError("rate limited")
+
+        self.assertEqual(router.route("anything new", fail, team="Team"), FALLBACK_DECISION)
+        decision = {"needs_members": False, "needs_summaries": True}
+        self.assertEqual(router.route("anything new", lambda: decision, team="Team"), decision)
+        self.assertEqual(router.stats()["llm_failures"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()